@@ -4,34 +4,56 @@ import discord
 from discord.ui import View, Select
 from discord import SelectOption, Interaction
 from server_manager import ServerManager
+from admission import REJECT
+from games.base_game import describe_stop
 
 
 class InstanceSelect(Select):
-    def __init__(self, game: str, manager: ServerManager):
+    def __init__(self, game: str, manager: ServerManager, prewarmer=None):
         self.manager = manager
         self.game = game
+        self.prewarmer = prewarmer
         server = self.manager.get_server(game)
 
         options = [SelectOption(label=inst, value=inst) for inst in server.instances]
         super().__init__(placeholder="Choose an instance...", options=options)
 
     async def callback(self, interaction: Interaction):
-        server = self.manager.get_server(self.game)
         instance = self.values[0]
-        await interaction.response.edit_message(
-            content=f"⏳ Starting `{self.game}` instance `{instance}`...",
-            view=None
-        )
+        if self.prewarmer:
+            self.view.switch_prewarm(instance)
+        # Answer within Discord's three seconds; resuming a standby or placing on a node can take longer.
+        await interaction.response.edit_message(content=f"⏳ Starting `{self.game}` instance `{instance}`...", view=None)
         try:
-            await server.start_instance(instance, interaction)
+            decision = await self.manager.request_start(self.game, instance, interaction)
         except Exception as e:
-            await interaction.followup.send(f"❌ Failed to start `{instance}`: {e}", ephemeral=True)
+            await interaction.edit_original_response(content=f"❌ Failed to start `{instance}`: {e}")
+            return
+        if self.prewarmer and decision.verdict == REJECT:
+            self.prewarmer.cancel(self.game, instance)
+        await interaction.edit_original_response(content=decision.message(f"`{self.game}`", f"`{instance}`"))
 
 
 class InstanceView(View):
-    def __init__(self, game: str, manager: ServerManager):
+    def __init__(self, game: str, manager: ServerManager, prewarmer=None):
         super().__init__(timeout=60)
-        self.add_item(InstanceSelect(game, manager))
+        self.game = game
+        self.prewarmer = prewarmer
+        # Prewarm the instance most likely to be picked while the picker is open.
+        self.prewarming = prewarmer.likeliest(game) if prewarmer else None
+        if self.prewarming and not prewarmer.warm(game, self.prewarming):
+            self.prewarming = None
+        self.add_item(InstanceSelect(game, manager, prewarmer))
+
+    def switch_prewarm(self, instance: str):
+        if self.prewarming and self.prewarming != instance:
+            self.prewarmer.cancel(self.game, self.prewarming)
+        self.prewarming = None
+        self.prewarmer.warm(self.game, instance)
+
+    async def on_timeout(self):
+        if self.prewarming:
+            self.prewarmer.cancel(self.game, self.prewarming)
 
 class StopInstanceSelect(Select):
     def __init__(self, game: str, manager: ServerManager):
@@ -44,10 +66,19 @@ class StopInstanceSelect(Select):
     async def callback(self, interaction: Interaction):
         server = self.manager.get_server(self.game)
         instance = self.values[0]
-        if server.is_running:
-            server.stop_instance(instance)
+        if server.is_instance_running(instance):
+            await interaction.response.edit_message(
+                content=f"⏳ Stopping `{self.game}` instance `{instance}`...",
+                view=None
+            )
+            outcome = await server.stop_instance(
+                instance,
+                progress=lambda text: interaction.edit_original_response(content=text)
+            )
+            await interaction.edit_original_response(content=describe_stop(f"`{self.game}`", f"`{instance}`", outcome))
+        elif self.manager.cancel_restart(self.game, instance):
             await interaction.response.edit_message(
-                content=f"🛑 `{self.game}` instance `{instance}` stopped.",
+                content=f"🛑 Cancelled the automatic restart of `{self.game}` instance `{instance}`.",
                 view=None
             )
         else:
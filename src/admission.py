@@ -0,0 +1,114 @@
+# admission.py
+
+import psutil
+import asyncio
+
+from dataclasses import dataclass
+
+ACCEPT = "accept"
+QUEUE = "queue"
+REJECT = "reject"
+RESUME = "resume"
+
+# What a QUEUE or REJECT decision ran short of.
+MEMORY = "memory"
+CPU = "cpu"
+
+MB = 1024 * 1024
+
+# Seconds CPU usage is measured over for each admission decision, so it reflects the load right now.
+CPU_SAMPLE_SECONDS = 0.5
+
+
+@dataclass(frozen=True)
+class Decision:
+    verdict: str
+    reason: str = ""
+    resource: str = None
+    # Node the instance is placed on, None for the bot's own host.
+    node: str = None
+
+    @property
+    def accepted(self) -> bool:
+        return self.verdict in (ACCEPT, RESUME)
+
+    def message(self, game: str, instance: str) -> str:
+        if self.verdict == ACCEPT:
+            where = f" on node {self.node}" if self.node else ""
+            return f"⏳ Starting {game} instance {instance}{where}..."
+        if self.verdict == RESUME:
+            return f"♨️ {game} instance {instance} {self.reason}."
+        if self.verdict == QUEUE:
+            return f"🕒 {game} instance {instance} is queued: {self.reason}. It will start once resources free up."
+        return f"❌ Can't start {game} instance {instance}: {self.reason}."
+
+
+@dataclass(frozen=True)
+class HostStats:
+    """Memory and CPU of a host, as admission sees them."""
+    total_mb: float
+    available_mb: float
+    cores: int
+    cpu_busy: float
+
+    @classmethod
+    async def local(cls, cpu_sample: float = CPU_SAMPLE_SECONDS) -> "HostStats":
+        """This host's current figures, with CPU usage measured over `cpu_sample` seconds in a thread."""
+        cpu_busy = await asyncio.to_thread(psutil.cpu_percent, cpu_sample)
+        memory = psutil.virtual_memory()
+        return cls(memory.total / MB, memory.available / MB, psutil.cpu_count() or 1, cpu_busy)
+
+
+class AdmissionController:
+    """
+    Decides whether an instance may start, from its declared footprint and the host's live
+    available memory and CPU. Requests that can never fit on this host are rejected; requests
+    that don't fit right now are queued.
+    """
+
+    def __init__(self, memory_headroom_mb: int = 1024, cpu_busy_percent: float = 90.0):
+        self._memory_headroom_mb = memory_headroom_mb
+        self._cpu_busy_percent = cpu_busy_percent
+
+    def evaluate(self, footprint: dict, host: HostStats, reserved_mb: float = 0) -> Decision:
+        """
+        `host` is the figures of the host the instance would run on, and `reserved_mb` memory
+        promised to instances that are still booting and haven't grown to their footprint yet.
+        """
+        need_mb = footprint["memory_mb"]
+        total_mb = host.total_mb
+        if need_mb + self._memory_headroom_mb > total_mb:
+            return Decision(REJECT, f"it needs {need_mb} MB of RAM and the host only has {total_mb:.0f} MB", MEMORY)
+
+        free_mb = host.available_mb - reserved_mb - self._memory_headroom_mb
+        if need_mb > free_mb:
+            return Decision(QUEUE, f"it needs {need_mb} MB of RAM and only {max(free_mb, 0):.0f} MB is free", MEMORY)
+
+        cores = host.cores
+        need_cores = footprint["cpu_cores"]
+        if need_cores > cores:
+            return Decision(REJECT, f"it needs {need_cores:g} CPU cores and the host only has {cores}", CPU)
+
+        busy = host.cpu_busy
+        idle_cores = cores * (100 - busy) / 100
+        if busy >= self._cpu_busy_percent or need_cores > idle_cores:
+            return Decision(QUEUE, f"the CPU is busy ({busy:.0f}% used, {idle_cores:.1f} of {need_cores:g} needed cores idle)", CPU)
+
+        return Decision(ACCEPT, f"{need_mb} MB of {free_mb:.0f} MB free")
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Resident memory of a process and all of its children, in MB."""
+    try:
+        parent = psutil.Process(pid)
+        procs = [parent] + parent.children(recursive=True)
+    except psutil.Error:
+        return 0.0
+
+    total = 0
+    for proc in procs:
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / MB
@@ -0,0 +1,378 @@
+# backup.py
+
+import os
+import json
+import lzma
+import time
+import zlib
+import asyncio
+import hashlib
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from notifier import notifier
+from scheduler import scheduler
+
+BACKUP_ROOT = os.getenv("BACKUP_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backups"))
+
+# Chunks are stored with a one-byte tag naming their compression, so snapshots made with
+# different settings can share them.
+COMPRESSORS = {
+    "zlib": (b"z", lambda data: zlib.compress(data, 6)),
+    "lzma": (b"x", lambda data: lzma.compress(data, preset=6)),
+}
+DECOMPRESSORS = {
+    b"z": zlib.decompress,
+    b"x": lzma.decompress,
+}
+
+
+class SnapshotStore:
+    """
+    Content-addressed chunk store plus one JSON manifest per snapshot. A manifest maps every
+    file of the world to the hashes of its fixed-size chunks, so a snapshot only adds the chunks
+    that changed since the previous one and any snapshot can be restored on its own.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.chunk_dir = os.path.join(root, "chunks")
+        self.manifest_root = os.path.join(root, "manifests")
+
+    def manifest_dir(self, game: str, instance: str) -> str:
+        safe = instance.lower().replace(" ", "_")
+        return os.path.join(self.manifest_root, game, safe)
+
+    def snapshots(self, game: str, instance: str) -> list:
+        """Snapshot ids of an instance, newest first."""
+        try:
+            names = os.listdir(self.manifest_dir(game, instance))
+        except FileNotFoundError:
+            return []
+        return sorted((name[:-5] for name in names if name.endswith(".json")), reverse=True)
+
+    def load_manifest(self, game: str, instance: str, snapshot: str) -> dict:
+        with open(os.path.join(self.manifest_dir(game, instance), f"{snapshot}.json")) as f:
+            return json.load(f)
+
+    def latest_manifest(self, game: str, instance: str):
+        snapshots = self.snapshots(game, instance)
+        return self.load_manifest(game, instance, snapshots[0]) if snapshots else None
+
+    def new_id(self, game: str, instance: str) -> str:
+        """A snapshot id for now, unique for the instance and sorting after every earlier one."""
+        return _unique_stamp(lambda stamp: os.path.exists(os.path.join(self.manifest_dir(game, instance), f"{stamp}.json")))
+
+    def write_manifest(self, game: str, instance: str, manifest: dict):
+        directory = self.manifest_dir(game, instance)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{manifest['id']}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    def prune(self, game: str, instance: str, keep: int) -> int:
+        """Delete all but the `keep` newest snapshots of an instance, then unreferenced chunks."""
+        old = self.snapshots(game, instance)[keep:]
+        for snapshot in old:
+            os.remove(os.path.join(self.manifest_dir(game, instance), f"{snapshot}.json"))
+        if old:
+            self.collect_garbage()
+        return len(old)
+
+    def collect_garbage(self) -> int:
+        referenced = set()
+        for directory, _, names in os.walk(self.manifest_root):
+            for name in names:
+                if name.endswith(".json"):
+                    with open(os.path.join(directory, name)) as f:
+                        for entry in json.load(f)["files"].values():
+                            referenced.update(entry["chunks"])
+        removed = 0
+        for directory, _, names in os.walk(self.chunk_dir):
+            for name in names:
+                if name not in referenced:
+                    os.remove(os.path.join(directory, name))
+                    removed += 1
+        return removed
+
+
+def _unique_stamp(taken) -> str:
+    """The current time to the microsecond, with a counter appended while `taken(stamp)` says it's in use."""
+    base = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
+    stamp, suffix = base, 1
+    while taken(stamp):
+        stamp = f"{base}_{suffix}"
+        suffix += 1
+    return stamp
+
+
+def chunk_path(chunk_dir: str, digest: str) -> str:
+    return os.path.join(chunk_dir, digest[:2], digest)
+
+
+def _store_file(path: str, chunk_dir: str, chunk_size: int, compression: str) -> dict:
+    """Worker: hash a file chunk by chunk and store the chunks the store doesn't have yet."""
+    tag, compress = COMPRESSORS[compression]
+    chunks = []
+    new_chunks = new_bytes = stored_bytes = 0
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        while data := f.read(chunk_size):
+            digest = hashlib.sha256(data).hexdigest()
+            chunks.append(digest)
+            target = chunk_path(chunk_dir, digest)
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            packed = tag + compress(data)
+            temp = f"{target}.{os.getpid()}.tmp"
+            with open(temp, "wb") as out:
+                out.write(packed)
+            os.replace(temp, target)
+            new_chunks += 1
+            new_bytes += len(data)
+            stored_bytes += len(packed)
+    return {
+        "entry": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "mode": stat.st_mode & 0o7777, "chunks": chunks},
+        "new_chunks": new_chunks,
+        "new_bytes": new_bytes,
+        "stored_bytes": stored_bytes,
+    }
+
+
+def _restore_file(target: str, chunk_dir: str, entry: dict):
+    """Worker: rebuild one file from its chunks."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as out:
+        for digest in entry["chunks"]:
+            with open(chunk_path(chunk_dir, digest), "rb") as f:
+                packed = f.read()
+            out.write(DECOMPRESSORS[packed[:1]](packed[1:]))
+    os.chmod(target, entry["mode"])
+    os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+
+def _list_files(root: str) -> list:
+    files = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                files.append(os.path.relpath(path, root))
+    return files
+
+
+class BackupManager:
+    """
+    Incremental world backups for instances that set a `world_path`: after every graceful stop
+    and, with a `backup_interval`, periodically while players are online (with the game's saving
+    paused when it supports that). Hashing and compression run in a process pool and the rest
+    in threads, so the event loop is never blocked. Snapshots are restored with `restore`.
+    Optional instance keys: `backup_interval` (seconds), `backup_keep` (snapshots kept),
+    `backup_compression` ("zlib" or "lzma"). Worlds of instances on node agents live on the
+    node and aren't backed up from here.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    DEFAULT_KEEP = 20
+
+    def __init__(self, manager, root: str = BACKUP_ROOT, workers: int = None):
+        self._manager = manager
+        self.store = SnapshotStore(root)
+        self._workers = workers or min(4, os.cpu_count() or 1)
+        self._pool = None
+        # One backup, prune or restore at a time, so garbage collection never sees a half-made snapshot.
+        self._lock = asyncio.Lock()
+        self._schedules = {}
+        manager.add_start_listener(self._on_instance_start)
+        manager.add_exit_listener(self._on_instance_exit)
+        manager.add_stop_listener(self._on_instance_stop)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # forkserver: forking the bot itself would copy its threads and event loop state.
+            self._pool = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context("forkserver"))
+        return self._pool
+
+    def shutdown(self):
+        for timer in self._schedules.values():
+            timer.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _on_instance_start(self, server, runtime):
+        interval = runtime.config.get("backup_interval")
+        if interval and runtime.config.get("world_path") and runtime.node is None:
+            self._schedules[runtime.key] = scheduler.call_every(
+                interval, lambda: self._scheduled_backup(server, runtime), label=f"backup {runtime.key[0]}:{runtime.name}"
+            )
+
+    def _on_instance_exit(self, server, runtime):
+        timer = self._schedules.pop(runtime.key, None)
+        if timer:
+            timer.cancel()
+
+    def _on_instance_stop(self, server, runtime):
+        from games.base_game import STOP_GRACEFUL
+        if runtime.stop_outcome == STOP_GRACEFUL and runtime.config.get("world_path") and runtime.node is None:
+            asyncio.create_task(self._backup_after_stop(server, runtime))
+
+    async def _backup_after_stop(self, server, runtime):
+        # Nothing may start the instance and touch its world while the snapshot is taken.
+        self._manager.mark_busy(server.name, runtime.name, "its world is being backed up, try again in a moment")
+        try:
+            await self.backup(server, runtime.name, runtime.config, reason="stopped", channel=runtime.channel)
+        finally:
+            self._manager.clear_busy(server.name, runtime.name)
+
+    async def _scheduled_backup(self, server, runtime):
+        # A backup still running from the last interval is as good as this one.
+        if not runtime.ready or runtime.player_count == 0 or runtime.in_standby or self._lock.locked():
+            return
+        await self._backup_running(server, runtime, reason="scheduled", quiet=True)
+
+    async def _backup_running(self, server, runtime, reason: str, quiet: bool = False):
+        paused = await server.pause_saving(runtime)
+        try:
+            return await self.backup(server, runtime.name, runtime.config, reason=reason, channel=runtime.channel, quiet=quiet)
+        finally:
+            if paused:
+                await server.resume_saving(runtime)
+
+    async def backup_instance(self, server, instance_name: str, reason: str, channel=None):
+        """Back up an instance whether it's running (with saving paused) or stopped (with starts refused meanwhile)."""
+        runtime = server.runtimes.get(instance_name)
+        if runtime is not None and runtime.is_running:
+            if not runtime.ready or runtime.node is not None:
+                return None
+            return await self._backup_running(server, runtime, reason=reason)
+        config = self._manager.instance_config(server.name, instance_name)
+        self._manager.mark_busy(server.name, instance_name, "its world is being backed up, try again in a moment")
+        try:
+            return await self.backup(server, instance_name, config, reason=reason, channel=channel)
+        finally:
+            self._manager.clear_busy(server.name, instance_name)
+
+    async def backup(self, server, instance_name: str, config: dict, reason: str, channel=None, quiet: bool = False):
+        """Take a snapshot of an instance's world; returns its manifest, or None on failure."""
+        world = config.get("world_path")
+        if not world or not os.path.isdir(world):
+            print(f"[{server.name}:{instance_name}] ⚠️ No world directory to back up: {world}")
+            return None
+
+        async with self._lock:
+            started = time.monotonic()
+            try:
+                manifest = await self._snapshot(server.name, instance_name, world, config, reason)
+                await asyncio.to_thread(self.store.prune, server.name, instance_name, config.get("backup_keep", self.DEFAULT_KEEP))
+            except Exception as e:
+                print(f"[{server.name}:{instance_name}] ❌ Backup failed: {e}")
+                if channel is not None:
+                    notifier.post(channel, f"❌ Backup of `{instance_name}` failed: {e}")
+                return None
+
+        stats = manifest["stats"]
+        message = (
+            f"💾 Backed up `{instance_name}` ({reason}): {stats['files']} files, "
+            f"{stats['changed_files']} changed, {_mb(stats['new_bytes'])} new "
+            f"({_mb(stats['stored_bytes'])} stored) in {time.monotonic() - started:.1f}s. Snapshot `{manifest['id']}`."
+        )
+        print(f"[{server.name}:{instance_name}] {message}")
+        if channel is not None and not quiet:
+            notifier.post(channel, message)
+        return manifest
+
+    async def _snapshot(self, game: str, instance_name: str, world: str, config: dict, reason: str) -> dict:
+        compression = config.get("backup_compression", "zlib")
+        if compression not in COMPRESSORS:
+            raise ValueError(f"unknown compression {compression}")
+        previous = await asyncio.to_thread(self.store.latest_manifest, game, instance_name)
+        previous_files = previous["files"] if previous else {}
+        paths = await asyncio.to_thread(_list_files, world)
+
+        loop = asyncio.get_running_loop()
+        files = {}
+        pending = {}
+        for relpath in paths:
+            # Files whose size and mtime haven't changed are taken from the last snapshot unread.
+            old = previous_files.get(relpath)
+            if old:
+                try:
+                    stat = os.stat(os.path.join(world, relpath))
+                except FileNotFoundError:
+                    continue
+                if stat.st_size == old["size"] and stat.st_mtime_ns == old["mtime_ns"]:
+                    files[relpath] = old
+                    continue
+            pending[relpath] = loop.run_in_executor(
+                self._executor(), _store_file, os.path.join(world, relpath), self.store.chunk_dir, self.CHUNK_SIZE, compression
+            )
+
+        stats = {"files": 0, "changed_files": len(pending), "new_chunks": 0, "new_bytes": 0, "stored_bytes": 0, "total_bytes": 0}
+        results = await asyncio.gather(*pending.values(), return_exceptions=True)
+        for relpath, result in zip(pending, results):
+            if isinstance(result, FileNotFoundError):
+                # Deleted while we were looking at it.
+                continue
+            if isinstance(result, Exception):
+                raise result
+            files[relpath] = result["entry"]
+            for key in ("new_chunks", "new_bytes", "stored_bytes"):
+                stats[key] += result[key]
+        stats["files"] = len(files)
+        stats["total_bytes"] = sum(entry["size"] for entry in files.values())
+
+        manifest = {
+            "id": self.store.new_id(game, instance_name),
+            "game": game,
+            "instance": instance_name,
+            "reason": reason,
+            "created": time.time(),
+            "chunk_size": self.CHUNK_SIZE,
+            "stats": stats,
+            "files": files,
+        }
+        await asyncio.to_thread(self.store.write_manifest, game, instance_name, manifest)
+        return manifest
+
+    def snapshots(self, game: str, instance_name: str) -> list:
+        return self.store.snapshots(game, instance_name)
+
+    async def restore(self, server, instance_name: str, snapshot: str) -> dict:
+        """
+        Replace an instance's world with a snapshot. The current world is kept next to it as
+        <world>.pre-restore-<time>. The instance must be stopped, and can't start meanwhile.
+        """
+        world = (server.get_instance(instance_name) or {}).get("world_path")
+        if not world:
+            raise ValueError(f"{instance_name} has no world_path configured")
+        if server.is_instance_running(instance_name):
+            raise RuntimeError(f"{instance_name} is running, stop it first")
+
+        self._manager.mark_busy(server.name, instance_name, "its world is being restored from a backup")
+        try:
+            async with self._lock:
+                manifest = await asyncio.to_thread(self.store.load_manifest, server.name, instance_name, snapshot)
+                kept = None
+                if os.path.exists(world):
+                    prefix = f"{world}.pre-restore-"
+                    kept = prefix + _unique_stamp(lambda stamp: os.path.exists(prefix + stamp))
+                    await asyncio.to_thread(os.rename, world, kept)
+                os.makedirs(world, exist_ok=True)
+
+                loop = asyncio.get_running_loop()
+                await asyncio.gather(*(
+                    loop.run_in_executor(self._executor(), _restore_file, os.path.join(world, relpath), self.store.chunk_dir, entry)
+                    for relpath, entry in manifest["files"].items()
+                ))
+        finally:
+            self._manager.clear_busy(server.name, instance_name)
+        return {"files": len(manifest["files"]), "bytes": manifest["stats"]["total_bytes"], "previous_world": kept}
+
+
+def _mb(value: float) -> str:
+    return f"{value / (1024 * 1024):.1f} MB"
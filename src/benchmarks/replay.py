@@ -0,0 +1,261 @@
+# replay.py
+#
+# Replays a recorded or synthetic console log through a game's BaseGameServer pipeline: a stub
+# process writes the log like a real server would, and a fake Discord channel receives the
+# notifications. Reports lines/sec, per-line parse latency, event-to-notification latency and
+# memory growth, and can compare them against stored baselines.
+#
+# Usage (from src/):
+#   python -m benchmarks.replay [--minecraft LOG] [--valheim LOG] [--rate LINES_PER_SEC]
+#   python -m benchmarks.replay --check            # exit 1 if slower than benchmarks/replay_baselines.json
+#   python -m benchmarks.replay --update-baseline  # record this machine's numbers as the baseline
+#
+# tests/test_replay_benchmark.py runs a shorter replay under pytest; it applies the same check
+# only when REPLAY_BASELINE_CHECK is set, since the baselines are specific to one machine.
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import bisect
+import tempfile
+import tracemalloc
+import types
+
+from array import array
+
+import psutil
+
+# Keep the bot's state database, spool files and logs out of the real ones.
+WORK_DIR = tempfile.mkdtemp(prefix="replay-")
+os.environ["STATE_DIR"] = os.path.join(WORK_DIR, "state")
+os.environ["LOG_DIR"] = os.path.join(WORK_DIR, "logs")
+
+from games import registry
+from games.rules import ServerReady, PlayerJoined, Crashed, ServerStopping
+from notifier import Notifier
+from benchmarks.rules_bench import synthetic_minecraft_boot, synthetic_valheim_boot, load_log
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "replay_baselines.json")
+STUB_PATH = os.path.join(os.path.dirname(__file__), "replay_stub.py")
+INSTANCE = "replay"
+
+# Events the bot always tells Discord about; their latency is measured up to the next delivery.
+NOTIFYING_EVENTS = (ServerReady, PlayerJoined, Crashed, ServerStopping)
+# Metrics compared against the baseline, and whether higher is better.
+CHECKED = {"lines_per_sec": True, "parse_p50_us": False}
+
+
+class FakeChannel:
+    """Records when each message is sent or edited instead of talking to Discord."""
+
+    id = 0
+
+    def __init__(self):
+        self.deliveries = []
+
+    async def send(self, content: str):
+        self.deliveries.append(time.monotonic())
+        return FakeMessage(self)
+
+
+class FakeMessage:
+    def __init__(self, channel: FakeChannel):
+        self._channel = channel
+
+    async def edit(self, content: str):
+        self._channel.deliveries.append(time.monotonic())
+
+
+def write_log(lines: list) -> str:
+    path = os.path.join(WORK_DIR, f"replay-{len(lines)}.log")
+    with open(path, "wb") as f:
+        f.write(b"\n".join(lines) + b"\n")
+    return path
+
+
+def write_launcher(log_path: str, rate: float) -> str:
+    path = os.path.join(WORK_DIR, "launch.sh")
+    with open(path, "w") as f:
+        f.write(f'#!/bin/bash\nexec "{sys.executable}" "{STUB_PATH}" "{log_path}" {rate}\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+async def replay(game: str, log_path: str, rate: float, timeout: float, trace_memory: bool) -> dict:
+    server = registry.game_class(game)({INSTANCE: {"script_path": write_launcher(log_path, rate)}})
+    server.timer_duration = 24 * 60 * 60
+    server._notifier = notifier = Notifier()
+    channel = FakeChannel()
+
+    # Time every parse, and note when each notifying event is handed to the bot.
+    engine = server._rule_engine
+    match = engine.match
+    parse_ns = array("q")
+    span = {"first": None, "last": None}
+
+    def timed_match(raw: bytes):
+        begin = time.perf_counter_ns()
+        event = match(raw)
+        end = time.perf_counter_ns()
+        parse_ns.append(end - begin)
+        if span["first"] is None:
+            span["first"] = begin
+        span["last"] = end
+        return event
+
+    engine.match = timed_match
+
+    handle_event = server.handle_event
+    event_times = []
+
+    async def timed_handle_event(runtime, event):
+        if isinstance(event, NOTIFYING_EVENTS):
+            event_times.append(time.monotonic())
+        await handle_event(runtime, event)
+
+    server.handle_event = timed_handle_event
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    if trace_memory:
+        tracemalloc.start()
+
+    runtime = await server.start_instance(INSTANCE, types.SimpleNamespace(channel=channel))
+    await asyncio.wait_for(runtime.output_task, timeout)
+    # Give the notifier its coalescing window and the rate limiter time to deliver the rest.
+    deadline = time.monotonic() + timeout
+    while notifier.queue_depth() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(1.5)
+
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    rss_after = process.memory_info().rss
+
+    delivered = sorted(channel.deliveries)
+    notify_latencies = []
+    for sent in event_times:
+        i = bisect.bisect_left(delivered, sent)
+        if i < len(delivered):
+            notify_latencies.append(delivered[i] - sent)
+
+    parse = sorted(parse_ns)
+    busy = (span["last"] - span["first"]) / 1e9 if span["first"] is not None else 0.0
+    return {
+        "lines": len(parse),
+        "lines_per_sec": len(parse) / busy if busy else 0.0,
+        "parse_p50_us": _percentile(parse, 0.50) / 1000,
+        "parse_p90_us": _percentile(parse, 0.90) / 1000,
+        "parse_p99_us": _percentile(parse, 0.99) / 1000,
+        "parse_max_us": (parse[-1] if parse else 0) / 1000,
+        "events": len(event_times),
+        "notify_p50_ms": _percentile(sorted(notify_latencies), 0.50) * 1000,
+        "notify_max_ms": (max(notify_latencies) if notify_latencies else 0.0) * 1000,
+        "dropped": runtime.pipeline.stats.dropped,
+        "rss_growth_mb": (rss_after - rss_before) / (1024 * 1024),
+        "traced_peak_mb": traced_peak / (1024 * 1024) if traced_peak is not None else None,
+    }
+
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(game: str, result: dict):
+    memory = f"RSS +{result['rss_growth_mb']:.1f} MB"
+    if result["traced_peak_mb"] is not None:
+        memory += f", traced peak {result['traced_peak_mb']:.1f} MB"
+    print(
+        f"{game:<10} {result['lines']:>8} lines  {result['lines_per_sec']:>11,.0f} lines/s  "
+        f"parse p50/p90/p99/max {result['parse_p50_us']:.1f}/{result['parse_p90_us']:.1f}/"
+        f"{result['parse_p99_us']:.1f}/{result['parse_max_us']:.0f} µs  "
+        f"{result['dropped']} dropped  {result['events']} events, notify p50 {result['notify_p50_ms']:.0f} ms max {result['notify_max_ms']:.0f} ms  "
+        f"{memory}"
+    )
+
+
+def check(results: dict, tolerance: float) -> list:
+    """Metrics that regressed more than `tolerance` against the stored baseline."""
+    with open(BASELINE_PATH) as f:
+        baselines = json.load(f)
+    failures = []
+    for game, result in results.items():
+        for metric, higher_is_better in CHECKED.items():
+            baseline = baselines.get(game, {}).get(metric)
+            if baseline is None:
+                continue
+            value = result[metric]
+            worse = value < baseline * (1 - tolerance) if higher_is_better else value > baseline * (1 + tolerance)
+            if worse:
+                failures.append(f"{game} {metric}: {value:,.2f} vs baseline {baseline:,.2f}")
+    return failures
+
+
+async def measure(logs: dict, runs: int = 3, rate: float = 0, timeout: float = 300, trace_memory: bool = False) -> dict:
+    """Replay each game's lines `runs` times and return its best result, keyed by game."""
+    results = {}
+    for game, lines in logs.items():
+        log_path = write_log(lines)
+        replays = [await replay(game, log_path, rate, timeout, trace_memory) for _ in range(runs)]
+        # Compare the best run: noise from the rest of the machine only ever makes things slower.
+        results[game] = best = max(replays, key=lambda result: result["lines_per_sec"])
+        best["parse_p50_us"] = min(result["parse_p50_us"] for result in replays)
+    return results
+
+
+async def run(args) -> int:
+    logs = {
+        "minecraft": load_log(args.minecraft) if args.minecraft else synthetic_minecraft_boot() * args.scale,
+        "valheim": load_log(args.valheim) if args.valheim else synthetic_valheim_boot() * args.scale,
+    }
+    results = await measure(logs, args.runs, args.rate, args.timeout, args.tracemalloc)
+    for game, result in results.items():
+        report(game, result)
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({game: {metric: round(result[metric], 2) for metric in CHECKED} for game, result in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+    if args.check:
+        failures = check(results, args.tolerance)
+        for failure in failures:
+            print(f"❌ Regression: {failure}")
+        if failures:
+            return 1
+        print("✅ Within baseline.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay console logs through the output pipeline.")
+    parser.add_argument("--minecraft", help="recorded Minecraft log")
+    parser.add_argument("--valheim", help="recorded Valheim log")
+    parser.add_argument("--rate", type=float, default=0, help="lines per second to replay at, 0 for as fast as possible")
+    parser.add_argument("--scale", type=int, default=5, help="times to repeat a synthetic log")
+    parser.add_argument("--runs", type=int, default=3, help="replays per game; the best one is reported")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--tracemalloc", action="store_true", help="also trace Python allocations (slower)")
+    parser.add_argument("--check", action="store_true", help="fail if slower than the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed regression for --check, as a fraction")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+    if (args.check or args.update_baseline) and (args.rate or args.tracemalloc):
+        parser.error("baselines are measured with --rate 0 and without --tracemalloc")
+
+    try:
+        sys.exit(asyncio.run(run(args)))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# replay_stub.py
+#
+# Stands in for a game server: writes a recorded log to stdout at a fixed rate.
+# Usage: python replay_stub.py LOG LINES_PER_SEC   (0 = as fast as possible)
+
+import sys
+import time
+
+# Lines written per burst when pacing, as a fraction of the rate (100 bursts per second).
+BURSTS_PER_SECOND = 100
+
+
+def main():
+    path, rate = sys.argv[1], float(sys.argv[2])
+    with open(path, "rb") as f:
+        lines = f.readlines()
+
+    out = sys.stdout.buffer
+    if rate <= 0:
+        out.writelines(lines)
+        out.flush()
+        return
+
+    burst = max(1, int(rate / BURSTS_PER_SECOND))
+    start = time.monotonic()
+    for i in range(0, len(lines), burst):
+        out.writelines(lines[i:i + burst])
+        out.flush()
+        delay = start + (i + burst) / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+if __name__ == "__main__":
+    main()
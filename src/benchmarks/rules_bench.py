@@ -0,0 +1,105 @@
+# rules_bench.py
+#
+# Lines/sec of each game's rule table over a boot log, next to a naive matcher that decodes
+# every line and tries every pattern, as the bot did before the keyword prefilter.
+# Usage (from src/):  python -m benchmarks.rules_bench [--minecraft LOG] [--valheim LOG]
+# Without a log file a synthetic boot log shaped like a real one is used.
+
+import re
+import argparse
+import random
+import time
+
+from games.minecraft import MinecraftServer
+from games.valheim import ValheimServer
+from games.rules import RuleEngine
+
+
+def synthetic_minecraft_boot(mods: int = 310, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    lines = []
+    for i in range(mods):
+        lines.append(f"[12:00:01] [main/INFO] [net.neoforged.fml.loading.moddiscovery.ModDiscoverer/SCAN]: Found mod file mod{i}-1.21.1-{rng.randint(1, 9)}.0.jar of type MOD")
+    for i in range(mods * 40):
+        lines.append(f"[12:00:{10 + i % 50:02}] [modloading-worker-{i % 8}/INFO] [mod{i % mods}/]: Registering {rng.choice(['blocks', 'items', 'entities', 'recipes'])} entry {i}")
+    for i in range(mods * 4):
+        lines.append(f"[12:01:0{i % 10}] [Worker-Main-{i % 4}/WARN] [minecraft/ModelBakery]: Unable to load model: 'mod{i % mods}:block/thing_{i}' referenced from: mod{i % mods}:thing#")
+    lines.append("[12:01:30] [Server thread/INFO] [minecraft/MinecraftServer]: Preparing level \"world\"")
+    for pct in range(0, 101):
+        lines.append(f"[12:01:31] [Worker-Main-1/INFO] [minecraft/LoggingChunkStatusListener]: Preparing spawn area: {pct}%")
+    lines.append("[12:01:45] [Server thread/INFO] [minecraft/DedicatedServer]: Done (95.123s)! For help, type \"help\"")
+    for i in range(20):
+        lines.append(f"[12:0{2 + i % 7}:00] [Server thread/INFO] [minecraft/MinecraftServer]: Player{i} joined the game")
+        lines.append(f"[12:0{2 + i % 7}:05] [Server thread/INFO] [minecraft/MinecraftServer]: <Player{i}> hello")
+        lines.append(f"[12:0{3 + i % 6}:00] [Server thread/INFO] [minecraft/MinecraftServer]: Player{i} left the game")
+    return [line.encode("utf-8") for line in lines]
+
+
+def synthetic_valheim_boot(seed: int = 1) -> list:
+    rng = random.Random(seed)
+    lines = []
+    for i in range(4000):
+        lines.append(f"10/17/2026 12:00:{i % 60:02}: Loading zone {rng.randint(-200, 200)},{rng.randint(-200, 200)} objects {rng.randint(0, 500)}")
+    for i in range(2000):
+        lines.append(f"(Filename: ./Runtime/Export/Debug/Debug.bindings.h Line: {i})")
+    lines.append("10/17/2026 12:01:00: Session \"Pantelimon\" with join code 123456 and IP 1.2.3.4:2456 is active with 0 player(s)")
+    for i in range(20):
+        lines.append(f"10/17/2026 12:02:00: Player joined server \"Pantelimon\" that has join code 123456, now {i % 5 + 1} player(s)")
+        lines.append(f"10/17/2026 12:03:00: Player connection lost server \"Pantelimon\" that has join code 123456, now {i % 5} player(s)")
+    return [line.encode("utf-8") for line in lines]
+
+
+def load_log(path: str) -> list:
+    with open(path, "rb") as f:
+        return [line.strip() for line in f]
+
+
+class NaiveRuleEngine:
+    """Matches like RuleEngine, without the keyword prefilter: every line is decoded and every pattern tried."""
+
+    def __init__(self, rules: list):
+        self._rules = [(re.compile(rule.pattern), rule.event, rule.extractor) for rule in rules]
+
+    def match(self, raw: bytes):
+        line = raw.decode("utf-8", errors="replace")
+        for regex, event, extractor in self._rules:
+            found = regex.search(line)
+            if found:
+                fields = extractor(found) if extractor else found.groupdict()
+                return event(**fields)
+        return None
+
+
+def measure(engine, lines: list, repeat: int) -> tuple:
+    events = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            if engine.match(line):
+                events += 1
+    elapsed = time.perf_counter() - start
+    return len(lines) * repeat / elapsed, events // repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the console rule tables.")
+    parser.add_argument("--minecraft", help="recorded Minecraft boot log")
+    parser.add_argument("--valheim", help="recorded Valheim boot log")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    logs = {
+        MinecraftServer: load_log(args.minecraft) if args.minecraft else synthetic_minecraft_boot(),
+        ValheimServer: load_log(args.valheim) if args.valheim else synthetic_valheim_boot(),
+    }
+    for game, lines in logs.items():
+        rate, events = measure(RuleEngine(game.Rules), lines, args.repeat)
+        naive_rate, _ = measure(NaiveRuleEngine(game.Rules), lines, args.repeat)
+        print(
+            f"{game.__name__:<16} {len(lines):>7} lines  {rate:>12,.0f} lines/s  {events} events  "
+            f"({rate / naive_rate:.1f}x the naive {naive_rate:,.0f} lines/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# boot_profile.py
+
+import os
+import json
+import time
+import sqlite3
+
+from statistics import median
+
+# Milestones every boot has; games add their own through BootMilestone rules.
+SPAWNED = "spawned"
+FIRST_OUTPUT = "first output"
+READY = "ready"
+
+
+class BootTimeline:
+    """Seconds from the start request to each milestone of one boot, in the order they passed."""
+
+    def __init__(self):
+        self._began = time.monotonic()
+        self.started_at = time.time()
+        self.milestones = {}
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._began
+
+    def mark(self, phase: str) -> bool:
+        """Record `phase` as passed now; False if it already was."""
+        if phase in self.milestones:
+            return False
+        self.milestones[phase] = round(self.elapsed, 2)
+        return True
+
+
+class BootHistory:
+    """
+    Recent boot timelines per instance, kept in SQLite as one compact row per boot, and the
+    predictions and phase comparisons derived from them.
+    """
+
+    # Boots kept per instance.
+    KEEP = 50
+    # Boots compared against the ones before them when looking for regressions.
+    RECENT = 3
+
+    _shared = {}
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS boots ("
+            " game TEXT NOT NULL,"
+            " instance TEXT NOT NULL,"
+            " started_at REAL NOT NULL,"
+            " milestones TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS boots_by_instance ON boots (game, instance, started_at)")
+
+    @classmethod
+    def shared(cls, path: str):
+        history = cls._shared.get(path)
+        if history is None:
+            history = cls._shared[path] = cls(path)
+        return history
+
+    def record(self, game: str, instance: str, timeline: BootTimeline):
+        self._db.execute(
+            "INSERT INTO boots (game, instance, started_at, milestones) VALUES (?, ?, ?, ?)",
+            (game, instance, timeline.started_at, json.dumps(timeline.milestones, separators=(",", ":"))),
+        )
+        self._db.execute(
+            "DELETE FROM boots WHERE game = ? AND instance = ? AND started_at NOT IN"
+            " (SELECT started_at FROM boots WHERE game = ? AND instance = ? ORDER BY started_at DESC LIMIT ?)",
+            (game, instance, game, instance, self.KEEP),
+        )
+
+    def recent(self, game: str, instance: str, limit: int = None) -> list:
+        """Milestone dicts of completed boots, oldest first."""
+        rows = self._db.execute(
+            "SELECT milestones FROM boots WHERE game = ? AND instance = ? ORDER BY started_at DESC LIMIT ?",
+            (game, instance, limit or self.KEEP),
+        ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def predict(self, game: str, instance: str, limit: int = 10):
+        """
+        Median and p90 of the time to ready over recent boots, and the median offset of every
+        milestone; None without history.
+        """
+        boots = [boot for boot in self.recent(game, instance, limit) if READY in boot]
+        if not boots:
+            return None
+        totals = sorted(boot[READY] for boot in boots)
+        offsets = {}
+        for boot in boots:
+            for phase, offset in boot.items():
+                offsets.setdefault(phase, []).append(offset)
+        return {
+            "boots": len(boots),
+            "median": median(totals),
+            "p90": totals[min(len(totals) - 1, int(len(totals) * 0.9))],
+            "milestones": {phase: median(values) for phase, values in offsets.items()},
+        }
+
+    def phase_report(self, game: str, instance: str) -> list:
+        """
+        Duration of each phase (the time from the previous milestone to this one) in the most
+        recent boots against the boots before them, as (phase, recent, baseline) tuples in boot
+        order. `baseline` is None until there are enough boots to compare.
+        """
+        boots = [boot for boot in self.recent(game, instance) if READY in boot]
+        durations = [_phase_durations(boot) for boot in boots]
+        recent, baseline = durations[-self.RECENT:], durations[:-self.RECENT]
+
+        order = []
+        for boot in durations:
+            for phase in boot:
+                if phase not in order:
+                    order.append(phase)
+
+        report = []
+        for phase in order:
+            recent_values = [boot[phase] for boot in recent if phase in boot]
+            baseline_values = [boot[phase] for boot in baseline if phase in boot]
+            if recent_values:
+                report.append((phase, median(recent_values), median(baseline_values) if baseline_values else None))
+        return report
+
+
+def _phase_durations(milestones: dict) -> dict:
+    durations = {}
+    previous = 0.0
+    for phase, offset in sorted(milestones.items(), key=lambda item: item[1]):
+        durations[phase] = max(0.0, offset - previous)
+        previous = offset
+    return durations
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    m, s = divmod(seconds, 60)
+    return f"{m}m{s:02}s"
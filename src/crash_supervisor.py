@@ -0,0 +1,187 @@
+# crash_supervisor.py
+
+import re
+import time
+import signal
+import asyncio
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from notifier import notifier
+from process_tree import AdoptedProcess
+
+# How an instance exited, as far as can be told.
+EXIT_CLEAN = "clean"            # it shut down on its own accord (or someone else stopped it)
+EXIT_CRASHED = "crashed"        # error exit, crash report or fatal signal
+EXIT_OUT_OF_MEMORY = "oom"      # JVM heap exhausted
+EXIT_KILLED = "killed"          # SIGKILL from outside, most often the kernel's OOM killer
+EXIT_UNKNOWN = "unknown"        # an adopted process vanished and its status can't be collected
+
+# Signals someone sends to stop a server on purpose.
+STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGQUIT}
+
+_OUT_OF_MEMORY = re.compile(r"java\.lang\.OutOfMemoryError[:\s]*(.*)")
+# Lines that mark a real crash, not the "0 errors" or mod warnings mentioning an Error that
+# servers print all the time. Case-sensitive: FATAL is the log level, as in "[Server thread/FATAL]".
+_FATAL_ERROR = re.compile(
+    r"A fatal error has been detected by the Java Runtime|\bFATAL\b|Exception in server tick loop"
+    r"|Encountered an unexpected exception|OutOfMemoryError|Exception in thread \"|Unhandled [Ee]xception"
+)
+
+
+@dataclass(frozen=True)
+class ExitReport:
+    kind: str
+    code: Optional[int] = None
+    signal: Optional[int] = None
+    reason: Optional[str] = None
+
+    @property
+    def is_failure(self) -> bool:
+        return self.kind != EXIT_CLEAN
+
+    def describe(self) -> str:
+        if self.signal is not None:
+            status = f"signal {signal.Signals(self.signal).name}"
+        elif self.code is not None:
+            status = f"exit code {self.code}"
+        else:
+            status = "exit status unknown"
+        return f"{status}, {self.reason}" if self.reason else status
+
+
+def classify(returncode, tail: list, stopping_seen: bool = False, crash_reason: str = None, adopted: bool = False) -> ExitReport:
+    """
+    Work out why a server exited from its return code, the last lines of its console and what
+    the rules saw. Launch scripts run the server under bash, which reports a child killed by a
+    signal as 128 + the signal number; that is decoded like a signal of the script itself.
+    """
+    lines = [line.decode("utf-8", errors="replace") if isinstance(line, bytes) else line for line in tail]
+    for line in reversed(lines):
+        found = _OUT_OF_MEMORY.search(line)
+        if found:
+            return ExitReport(EXIT_OUT_OF_MEMORY, *_status(returncode, adopted), reason=f"out of memory: {found.group(1) or 'Java heap space'}".strip())
+
+    code, sig = _status(returncode, adopted)
+    if sig is not None:
+        if sig == signal.SIGKILL:
+            return ExitReport(EXIT_KILLED, code, sig, crash_reason or "killed, most likely by the kernel's OOM killer")
+        if sig in STOP_SIGNALS and not crash_reason:
+            return ExitReport(EXIT_CLEAN, code, sig, "stopped by a signal from outside the bot")
+        return ExitReport(EXIT_CRASHED, code, sig, crash_reason or _last_error(lines))
+    if crash_reason:
+        return ExitReport(EXIT_CRASHED, code, sig, crash_reason)
+    if code == 0 or (code is None and stopping_seen):
+        return ExitReport(EXIT_CLEAN, code, sig)
+    if code is None:
+        return ExitReport(EXIT_UNKNOWN, code, sig, "the process disappeared without shutting down")
+    return ExitReport(EXIT_CRASHED, code, sig, _last_error(lines))
+
+
+def _status(returncode, adopted: bool) -> tuple:
+    """(exit code, signal number) with whichever doesn't apply as None."""
+    if returncode is None or (adopted and returncode == AdoptedProcess.UNKNOWN_EXIT_STATUS):
+        return None, None
+    if returncode < 0:
+        return None, -returncode
+    if returncode > 128 and returncode - 128 in signal.valid_signals():
+        return None, returncode - 128
+    return returncode, None
+
+
+def _last_error(lines: list) -> Optional[str]:
+    for line in reversed(lines):
+        if _FATAL_ERROR.search(line):
+            return line.strip()[:200]
+    return None
+
+
+class CrashSupervisor:
+    """
+    Watches every instance exit. Exits the bot didn't ask for are classified, reported with the
+    last console lines, and restarted after an exponential backoff, unless the instance crashed
+    CrashLimit times within CrashWindow seconds, in which case it is left stopped until started
+    by hand. Instances can set `restart_on_crash = false`, `crash_limit` and `crash_window`.
+    """
+
+    RestartDelay = 10
+    MaxRestartDelay = 300
+    CrashLimit = 3
+    CrashWindow = 15 * 60
+    # Console lines quoted in the alert when giving up.
+    QuotedLines = 12
+    # How long to wait for the rest of an exited instance's output to be read.
+    DrainTimeout = 10
+
+    def __init__(self, manager):
+        self._manager = manager
+        self._crashes = {}
+        manager.add_exit_listener(self._on_instance_exit)
+
+    def _on_instance_exit(self, server, runtime):
+        if runtime.stop_requested:
+            return
+        asyncio.create_task(self._handle_exit(server, runtime))
+
+    async def _handle_exit(self, server, runtime):
+        if runtime.output_task is not None:
+            # Classify with everything the server printed before dying.
+            try:
+                await asyncio.wait_for(asyncio.shield(runtime.output_task), self.DrainTimeout)
+            except Exception:
+                pass
+        tail = list(runtime.pipeline.tail) if runtime.pipeline else []
+        report = classify(runtime.process.returncode, tail, runtime.stopping_seen, runtime.crash_reason, runtime.adopted)
+        label = f"{server.name}:{runtime.name}"
+        print(f"[{label}] Exited unexpectedly: {report.kind} ({report.describe()})")
+        if not report.is_failure:
+            self._post(runtime, f"🛑 `{runtime.name}` shut down on its own ({report.describe()}).")
+            return
+
+        config = runtime.config
+        if not config.get("restart_on_crash", True):
+            self._post(runtime, f"💥 `{runtime.name}` {self._verb(report)} ({report.describe()}). Automatic restarts are off for it.")
+            return
+
+        key = (server.name, runtime.name)
+        window = config.get("crash_window", self.CrashWindow)
+        limit = config.get("crash_limit", self.CrashLimit)
+        history = self._crashes.setdefault(key, deque(maxlen=max(limit, 1) * 2))
+        now = time.time()
+        history.append(now)
+        crashes = sum(1 for at in history if now - at < window)
+
+        if crashes >= limit:
+            quoted = "\n".join(line.decode("utf-8", errors="replace") for line in tail[-self.QuotedLines:])
+            self._post(
+                runtime,
+                f"🚨 `{runtime.name}` {self._verb(report)} ({report.describe()}) and has crashed {crashes} times in "
+                f"{window // 60:.0f} minutes. Not restarting it again until someone starts it by hand."
+                + (f"\n```\n{quoted[-1500:]}\n```" if quoted else ""),
+            )
+            return
+
+        delay = min(self.RestartDelay * 2 ** (crashes - 1), self.MaxRestartDelay)
+        self._post(
+            runtime,
+            f"💥 `{runtime.name}` {self._verb(report)} ({report.describe()}). "
+            f"Restarting in {delay:.0f}s (crash {crashes} of {limit} allowed in {window // 60:.0f} minutes).",
+        )
+        self._manager.schedule_restart(server.name, runtime.name, delay, runtime.channel)
+
+    @staticmethod
+    def _verb(report: ExitReport) -> str:
+        return {
+            EXIT_OUT_OF_MEMORY: "ran out of memory",
+            EXIT_KILLED: "was killed",
+            EXIT_UNKNOWN: "disappeared",
+        }.get(report.kind, "crashed")
+
+    @staticmethod
+    def _post(runtime, content: str):
+        if runtime.channel is None:
+            print(f"[{runtime.game}:{runtime.name}] {content}")
+            return
+        notifier.post(runtime.channel, content, important=True)
@@ -0,0 +1,26 @@
+from games.base_game import BaseGameServer
+from games.rules import Rule, ServerReady, PlayerJoined, PlayerLeft, ServerStopping
+
+
+class DontStarveTogetherServer(BaseGameServer):
+    DefaultFootprint = {"memory_mb": 2048, "cpu_cores": 1.0}
+    # The dedicated server's console takes Lua; c_shutdown(true) saves before exiting.
+    StopCommands = ["c_shutdown(true)"]
+    GracefulStopTimeout = 60
+
+    Rules = [
+        Rule(r'\[Join Announcement\] (?P<player>.+)', PlayerJoined),
+        Rule(r'\[Leave Announcement\] (?P<player>.+)', PlayerLeft),
+        Rule(r'Server registered via geo DNS', ServerReady),
+        Rule(r'Shutting down', ServerStopping),
+    ]
+
+    def __init__(self, instances: dict = None):
+        super().__init__("dst", instances)
+
+    async def ready_message(self, runtime, event: ServerReady) -> str:
+        server_name = runtime.config.get("server_name", runtime.name)
+        return (
+            f"✅ **Don't Starve Together `{runtime.name}` is live!**\n"
+            f"🔎 Find **{server_name}** in the server browser."
+        )
@@ -1,30 +1,145 @@
 import os
-import subprocess
+import re
+import time
 import asyncio
 import signal
-import time
-import datetime
 import psutil
 
 from abc import ABC, abstractmethod
+from collections import deque
+from statistics import median
+from log_sink import LogSink, instance_log_dir
+from notifier import notifier
+from scheduler import scheduler
+from state_store import StateStore, STATE_DIR
+from boot_profile import BootHistory, BootTimeline, SPAWNED, FIRST_OUTPUT, READY, format_duration
+from tick_health import TickHealth
+from sessions import SessionStore
+from resource_profile import ResourceProfile, ResourceGovernor
+from games.rules import RuleEngine, ServerReady, PlayerJoined, PlayerLeft, ServerStopping, Crashed, WorldSaved, SaveStarted, TickLag, BootMilestone
+from games.runtime import InstanceRuntime
+from games.pipeline import OutputPipeline, OVERFLOW_DROP
+from games.console import ConsoleChannel, ConsoleUnavailable
+import process_tree
+
+STOP_GRACEFUL = "stopped"
+STOP_TERMINATED = "terminated"
+STOP_KILLED = "killed"
+
+COLD_START = "cold"
+WARM_START = "warm"
+
+
+def describe_stop(game: str, instance: str, outcome: str) -> str:
+    if outcome == STOP_GRACEFUL:
+        return f"🛑 {game} instance {instance} saved and stopped."
+    if outcome == STOP_TERMINATED:
+        return f"🛑 {game} instance {instance} stopped (terminated after ignoring the stop command)."
+    if outcome == STOP_KILLED:
+        return f"🛑 {game} instance {instance} was killed (it ignored the stop command and SIGTERM)."
+    return f"⚠️ {game} instance {instance} was not running."
 
 
 class BaseGameServer(ABC):
-    def __init__(self, name: str):
+    # Instances of the game, keyed by name, used when none are passed in (they normally come
+    # from the instance config file).
+    Instances = {}
+    # Size of each raw read from the server's console spool file.
+    READ_CHUNK_SIZE = 64 * 1024
+    # Bounds of the delay between reads once the tail of the spool is reached.
+    TAIL_MIN_INTERVAL = 0.05
+    TAIL_MAX_INTERVAL = 0.5
+    # Minimum seconds between persisting the spool read offset.
+    OFFSET_SAVE_INTERVAL = 1.0
+    # Once the spool is this large and every byte of it has been processed, it is emptied.
+    SPOOL_MAX_BYTES = 64 * 1024 * 1024
+    # Capacity, in batches of lines, of the queues feeding the persist and interpret stages, and
+    # what the reader does when the interpret stage falls behind (see games.pipeline). Instances
+    # can override the policy with an `event_overflow` key.
+    PersistQueueSize = 256
+    EventQueueSize = 64
+    EventOverflow = OVERFLOW_DROP
+    # Events whose lines are never dropped, whatever the overflow policy.
+    CriticalEvents = (ServerReady, Crashed, PlayerJoined, PlayerLeft, WorldSaved, ServerStopping)
+    # Console lines kept in memory per instance, to tell why it exited.
+    CrashTailLines = 50
+    # Console patterns of the game, as a list of games.rules.Rule.
+    Rules = []
+    # Resources an instance is expected to use unless its config says otherwise.
+    DefaultFootprint = {"memory_mb": 2048, "cpu_cores": 1.0}
+    # Console commands that make the game save and exit, written to the server's stdin.
+    StopCommands = []
+    # Signal sent to the process group for a graceful stop when StopCommands can't be used.
+    StopSignal = signal.SIGTERM
+    # Seconds to wait after the graceful stop request, and after SIGTERM, before escalating.
+    GracefulStopTimeout = 60
+    TerminateTimeout = 10
+    # Console commands that make the game save its world without exiting, and how long to wait
+    # for the WorldSaved event. Games without them can't be put in warm standby.
+    SaveCommands = []
+    SaveTimeout = 60
+    # Console commands that stop and restart the game's own saving, so its world files hold
+    # still while a backup of a running instance is taken.
+    SaveOffCommands = []
+    SaveOnCommands = []
+    # Seconds a suspended instance stays in warm standby before it is really stopped; None
+    # disables standby. Instances can override it with a `standby_timeout` key.
+    StandbyTimeout = None
+    # Seconds to wait for a suspended process tree to run again after SIGCONT.
+    ResumeTimeout = 10
+    # Number of recent start-to-ready latencies kept per instance and start kind.
+    LatencyHistory = 20
+    # Target tick rate of the game's simulation, if it reports falling behind it.
+    TicksPerSecond = None
+    # An overload alert is posted when an instance spent more than LagAlertThreshold of the
+    # last LagAlertWindow seconds behind, over at least LagAlertMinEvents lag warnings, and then
+    # not again for LagAlertCooldown seconds. Instances can override the threshold with a
+    # `lag_alert_threshold` key.
+    LagAlertWindow = 300
+    LagAlertThreshold = 0.1
+    LagAlertMinEvents = 3
+    LagAlertCooldown = 1800
+    # Console command listing the players online, and the pattern of its answer: a `count`
+    # group and optionally a comma-separated `names` group. When set, the count kept from
+    # join and leave lines is checked against it every PlayerListInterval seconds, which
+    # instances can override with a `player_list_interval` key (0 turns it off).
+    PlayerListCommand = None
+    PlayerListPattern = None
+    PlayerListInterval = 300
+    PlayerListTimeout = 5
+    # Pattern of the timestamp console lines start with, for dating events in old logs: groups
+    # hour, minute and second, and optionally day, month (number or name) and year.
+    LogTimePattern = None
+    # Days of sessions an `idle_timeout = "auto"` is worked out from.
+    IdleHistoryDays = 90
+    # Port players connect to, unless an instance's config sets `port`.
+    DefaultPort = None
+    # Globs, relative to the launch script's directory, of the files a boot reads; prewarmed
+    # before an instance's first boot has shown which files it really opens (see prewarm.py).
+    PrewarmPatterns = ()
+
+    def __init__(self, name: str, instances: dict = None):
         self._name = name.lower()
-        self._instances = self._load_instances()
-        self._active_instance = None
-        self._process = None
-        self._log_file = None
-        self._log_file_path = None
-        self._start_time = None
-        self._player_count = 0
-        self._timer_task = None
+        self._instances = dict(self.Instances if instances is None else instances)
+        self._runtimes = {}
+        self._rule_engine = RuleEngine(self.__class__.Rules)
+        self._is_critical = self._rule_engine.detector(self.CriticalEvents)
+        self._player_list = re.compile(self.PlayerListPattern) if self.PlayerListPattern else None
         self._timer_duration = 60
+        self._notifier = notifier
+        self._start_listeners = []
+        self._exit_listeners = []
+        self._stop_listeners = []
+        self._start_latencies = {}
+        self._health = {}
+        # Instance name to the time until which it's kept up regardless of players (see keep_up).
+        self._kept_up = {}
 
-        self._project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        self._pid_dir = os.path.join(self._project_root, "pids")
-        os.makedirs(self._pid_dir, exist_ok=True)
+        self._state = StateStore.default()
+        self._boot_history = BootHistory.shared(os.path.join(STATE_DIR, "boots.db"))
+        self._sessions = SessionStore.default()
+        self._spool_dir = os.path.join(STATE_DIR, "spool")
+        os.makedirs(self._spool_dir, exist_ok=True)
 
     @property
     def name(self) -> str:
@@ -34,29 +149,82 @@ class BaseGameServer(ABC):
     def instances(self) -> dict:
         return self._instances
 
+    @instances.setter
+    def instances(self, instances: dict):
+        """Replace the instance definitions. Running instances keep the config they started with."""
+        self._instances = dict(instances)
+
+    @property
+    def runtimes(self) -> dict:
+        """Running instances of this game, keyed by instance name."""
+        return self._runtimes
+
     @property
     def active_instance(self) -> str:
-        return self._active_instance
+        runtime = self._first_runtime()
+        return runtime.name if runtime else None
 
     @property
     def process(self):
-        return self._process
+        runtime = self._first_runtime()
+        return runtime.process if runtime else None
 
     @property
     def log_file_path(self) -> str:
-        return self._log_file_path
+        runtime = self._first_runtime()
+        return runtime.log_sink.path if runtime and runtime.log_sink else None
 
     @property
     def player_count(self) -> int:
-        return self._player_count
-
-    @player_count.setter
-    def player_count(self, value: int):
-        self._player_count = max(0, value)
+        return sum(runtime.player_count for runtime in self._runtimes.values())
 
     @property
     def is_running(self) -> bool:
-        return self._process and self._process.poll() is None
+        return any(runtime.is_running for runtime in self._runtimes.values())
+
+    def is_instance_running(self, instance_name: str) -> bool:
+        runtime = self._runtimes.get(instance_name)
+        return runtime is not None and runtime.is_running
+
+    def is_instance_in_standby(self, instance_name: str) -> bool:
+        runtime = self._runtimes.get(instance_name)
+        return runtime is not None and runtime.is_running and runtime.in_standby
+
+    def standby_timeout(self, instance_name: str):
+        """Seconds the instance may stay in warm standby, or None if it shouldn't use standby."""
+        if not self.SaveCommands:
+            return None
+        instance = self.get_instance(instance_name) or {}
+        return instance.get("standby_timeout", self.StandbyTimeout)
+
+    def start_latencies(self, instance_name: str) -> dict:
+        """Median and latest start-to-ready seconds of recent cold and warm starts of an instance."""
+        summary = {}
+        for kind in (COLD_START, WARM_START):
+            samples = self._start_latencies.get((instance_name, kind))
+            if samples:
+                summary[kind] = {"median": median(samples), "last": samples[-1], "count": len(samples)}
+        return summary
+
+    def health(self, instance_name: str) -> TickHealth:
+        """Lag and save pause history of an instance, kept across its restarts."""
+        if instance_name not in self._health:
+            self._health[instance_name] = TickHealth()
+        return self._health[instance_name]
+
+    def _record_start_latency(self, instance_name: str, kind: str, seconds: float):
+        key = (instance_name, kind)
+        if key not in self._start_latencies:
+            self._start_latencies[key] = deque(maxlen=self.LatencyHistory)
+        self._start_latencies[key].append(seconds)
+
+    @property
+    def boot_history(self) -> BootHistory:
+        return self._boot_history
+
+    @property
+    def sessions(self) -> SessionStore:
+        return self._sessions
 
     @property
     def timer_duration(self) -> int:
@@ -66,170 +234,808 @@ class BaseGameServer(ABC):
     def timer_duration(self, value: int):
         self._timer_duration = value
 
-    def _load_instances(self) -> dict:
-        if not hasattr(self.__class__, "Instances"):
-            raise NotImplementedError(f"{self.__class__.__name__} must define a class-level Instances dict.")
-        return self.__class__.Instances
+    def idle_timeout(self, instance_name: str) -> float:
+        """
+        Seconds an instance without players stays up: timer_duration, the instance's
+        `idle_timeout`, or with `idle_timeout = "auto"` long enough for most players who leave
+        to find it still running when they come back, going by recent sessions.
+        """
+        setting = (self.get_instance(instance_name) or {}).get("idle_timeout")
+        if setting == "auto":
+            since = time.time() - self.IdleHistoryDays * 86400
+            return self._sessions.suggest_idle_timeout(self._name, instance_name, self._timer_duration, since) or self._timer_duration
+        return setting or self._timer_duration
 
+    def _first_runtime(self):
+        return next((runtime for runtime in self._runtimes.values() if runtime.is_running), None)
 
     def get_instance(self, instance_name: str):
-        if not hasattr(self.__class__, "Instances") or not isinstance(self.__class__.Instances, dict):
-            raise NotImplementedError(f"{self.__class__.__name__} must define a class-level Instances dict.")
         return self._instances.get(instance_name)
 
-    def _get_pid_file(self, instance_name: str) -> str:
-        safe = instance_name.lower().replace(" ", "_").replace(".", "_")
-        return os.path.join(self._pid_dir, f"{self._name}_{safe}.pid")
+    def get_runtime(self, instance_name: str):
+        return self._runtimes.get(instance_name)
+
+    def port(self, instance_name: str):
+        """The port players connect to an instance on, or None if it isn't known."""
+        return (self.get_instance(instance_name) or {}).get("port", self.DefaultPort)
+
+    @property
+    def supports_wake(self) -> bool:
+        return type(self).answer_wake is not BaseGameServer.answer_wake
+
+    async def answer_wake(self, reader, writer, instance_name: str, status: str, reply: str):
+        """
+        Talk to a client connecting to a stopped instance's port in the game's own protocol (see
+        wake_listener.py): show `status` to anyone looking at the server list and turn an attempt
+        to join away with `reply`. Returns the name of the player who tried to join, or None.
+        Games that don't override it can't be woken up by players.
+        """
+        return None
+
+    def footprint(self, instance_name: str) -> dict:
+        """Expected memory (MB) and CPU cores of an instance, from its config or the game default."""
+        instance = self.get_instance(instance_name) or {}
+        return {key: instance.get(key, default) for key, default in self.DefaultFootprint.items()}
+
+    def add_start_listener(self, callback):
+        """Register `callback(server, runtime)`, called whenever an instance's process is spawned."""
+        self._start_listeners.append(callback)
+
+    def add_exit_listener(self, callback):
+        """Register `callback(server, runtime)`, called whenever an instance's process exits."""
+        self._exit_listeners.append(callback)
+
+    def add_stop_listener(self, callback):
+        """
+        Register `callback(server, runtime)`, called once `stop_instance` has stopped an instance;
+        `runtime.stop_outcome` tells how.
+        """
+        self._stop_listeners.append(callback)
+
+    def _fire(self, listeners: list, runtime):
+        for callback in listeners:
+            try:
+                callback(self, runtime)
+            except Exception as e:
+                print(f"[{self._name}:{runtime.name}] ⚠️ Listener failed: {e}")
 
-    def _create_log_file(self, instance_name: str):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        safe = instance_name.lower().replace(" ", "_")
-        log_dir = os.path.join(self._project_root, "logs", self._name, safe)
-        os.makedirs(log_dir, exist_ok=True)
-        self._log_file_path = os.path.join(log_dir, f"{timestamp}.log")
-        self._log_file = open(self._log_file_path, "w")
+    def _get_spool_path(self, instance_name: str) -> str:
+        safe = instance_name.lower().replace(" ", "_").replace(".", "_")
+        return os.path.join(self._spool_dir, f"{self._name}_{safe}.out")
 
-    def mark_started(self):
-        self._start_time = time.time()
+    def _create_log_sink(self, runtime):
+        runtime.log_sink = LogSink.from_instance_config(instance_log_dir(self._name, runtime.name), runtime.config)
+        runtime.log_sink.open()
 
     @property
     def uptime(self) -> str:
-        if not self._start_time:
-            return "Not running"
-        elapsed = int(time.time() - self._start_time)
-        h, m = divmod(elapsed, 3600)
-        m, s = divmod(m, 60)
-        return f"{h:02}:{m:02}:{s:02}"
-
-    async def start_instance(self, instance_name: str, ctx):
+        runtime = self._first_runtime()
+        return runtime.uptime if runtime else "Not running"
+
+    async def start_instance(self, instance_name: str, ctx, node=None):
+        """Start an instance, on the node agent `node` (a node_client.NodeClient) if given."""
         instance = self.get_instance(instance_name)
         if not instance:
             await ctx.channel.send(f"❌ No instance named {instance_name}.")
-            return
+            return None
+        if self.is_instance_running(instance_name):
+            await ctx.channel.send(f"⚠️ {instance_name} is already running.")
+            return None
 
-        script_path = instance["script_path"]
-        self._active_instance = instance_name
-        self._player_count = 0
-        self._create_log_file(instance_name)
+        boot = BootTimeline()
+        runtime = InstanceRuntime(self._name, instance_name, instance, ctx.channel)
+        runtime.spool_path = self._get_spool_path(instance_name)
+        self._create_log_sink(runtime)
 
+        # The server writes its console to a spool file rather than a pipe, so it keeps running
+        # (and keeps its output) if the bot restarts; the bot tails the spool. On a node agent
+        # the agent keeps the spool and streams it into the local one.
         try:
             launch_args = self.get_launch_args(instance)
-            self._process = subprocess.Popen(
-                ["/bin/bash", *launch_args],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                preexec_fn=os.setsid,
-                cwd=os.path.dirname(launch_args[0]),
-            )
-            self._save_pid(self._get_pid_file(instance_name))
-            self.mark_started()
-            asyncio.create_task(self._log_output(ctx))
+            if node is not None:
+                runtime.process = await self._spawn_remote(runtime, node, launch_args)
+            else:
+                runtime.process = await self._spawn_local(runtime, launch_args)
         except Exception as e:
+            runtime.log_sink.close()
             await ctx.channel.send(f"❌ Failed to start {instance_name}: {e}")
+            return None
 
-    def stop_instance(self, instance_name: str):
-        pid_file = self._get_pid_file(instance_name)
-        info = self._load_pid_info(pid_file)
-        if not info or not info.get("pid"):
-            return
+        self._runtimes[instance_name] = runtime
+        runtime.mark_started()
+        runtime.boot = boot
+        boot.mark(SPAWNED)
+        self._update_boot_status(runtime)
+        self._save_state(runtime)
+        self._run(runtime)
+        return runtime
 
+    async def _spawn_local(self, runtime, launch_args: list):
+        spool_fd = os.open(runtime.spool_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
         try:
-            pid = int(info["pid"])
-            parent = psutil.Process(pid)
-            for child in parent.children(recursive=True):
-                child.terminate()
-            parent.terminate()
-            _, alive = psutil.wait_procs([parent] + parent.children(), timeout=5)
-            for p in alive:
-                p.kill()
-        except Exception as e:
-            print(f"[{self._name}] ❌ Error stopping instance {instance_name}: {e}")
+            process = await asyncio.create_subprocess_exec(
+                "/bin/bash", *launch_args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=spool_fd,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+                cwd=os.path.dirname(launch_args[0]),
+            )
+        finally:
+            os.close(spool_fd)
+        runtime.tree = process_tree.LocalTree(process.pid)
+        return process
 
-        self._cancel_shutdown_timer()
-        self._remove_pid(pid_file)
-        self._process = None
-        self._active_instance = None
+    async def _spawn_remote(self, runtime, node, launch_args: list):
+        # Paths in the instance config are paths on the node.
+        process = await node.spawn(f"{self._name}/{runtime.name}", ["/bin/bash", *launch_args], os.path.dirname(launch_args[0]))
+        os.close(os.open(runtime.spool_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644))
+        await process.follow(runtime.spool_path)
+        runtime.node = node
+        runtime.tree = process.tree
+        return process
 
-    def cleanup_orphan_process(self):
+    async def reattach(self, resolve_channel, resolve_node=None) -> list:
         """
-        If a PID file exists and the process is still running from a previous session, kill it.
-        This is useful to avoid port conflicts or zombie servers.
+        Re-adopt instances a previous run of the bot left running, instead of killing them.
+        A recorded process is only adopted if its start time still matches, so a reused pid is
+        never mistaken for a server. Output is tailed again from the last processed offset and
+        the shutdown timer resumes with whatever time it had left.
+        `resolve_channel(channel_id)` returns the channel to notify, or None, and
+        `resolve_node(name)` the node agent client for instances that ran on one.
         """
-        for instance_name in self.instances:
-            pid_file = self._get_pid_file(instance_name)
-            info = self._load_pid_info(pid_file)
-            if not info or "pid" not in info:
+        adopted = []
+        for record in self._state.all(self._name):
+            instance_name = record["instance"]
+            instance = self.get_instance(instance_name)
+            if instance_name in self._runtimes:
+                continue
+            node = resolve_node(record["node"]) if record["node"] and resolve_node else None
+            process = None
+            if instance and record["node"] and node is not None:
+                try:
+                    process = await node.find(f"{self._name}/{instance_name}", record["pid"], record["create_time"])
+                except Exception as e:
+                    # Keep the record; the node may be back by the next restart.
+                    print(f"[{self._name}:{instance_name}] ⚠️ Node {record['node']} unreachable, not re-adopting: {e}")
+                    continue
+            elif instance and not record["node"] and self._is_same_process(record):
+                process = process_tree.AdoptedProcess(record["pid"])
+            if process is None or not os.path.exists(record["spool_path"]):
+                print(f"[{self._name}:{instance_name}] Forgetting stale record (PID {record['pid']})")
+                self._state.remove(self._name, instance_name)
                 continue
 
+            runtime = InstanceRuntime(self._name, instance_name, instance, resolve_channel(record["channel_id"]))
+            runtime.process = process
+            if node is not None:
+                await process.follow(record["spool_path"])
+                runtime.node = node
+                runtime.tree = process.tree
+            else:
+                runtime.tree = process_tree.LocalTree(process.pid)
+            runtime.adopted = True
+            runtime.spool_path = record["spool_path"]
+            runtime.log_offset = record["log_offset"]
+            runtime.start_time = record["started_at"]
+            runtime.player_count = record["player_count"]
+            runtime.ready = bool(record["ready"])
+            runtime.standby_since = record["standby_since"]
+            self._create_log_sink(runtime)
+            self._runtimes[instance_name] = runtime
+            self._save_state(runtime)
+            self._run(runtime)
+
+            if record["timer_deadline"] is not None:
+                delay = max(0.0, record["timer_deadline"] - time.time())
+                if runtime.in_standby:
+                    self._start_standby_timer(runtime, delay)
+                else:
+                    self._start_shutdown_timer(runtime, reason="restored after bot restart", delay=delay)
+            print(f"[{self._name}:{instance_name}] 🔗 Re-adopted running server (PID {record['pid']})")
+            adopted.append(runtime)
+        return adopted
+
+    def _is_same_process(self, record: dict) -> bool:
+        try:
+            proc = psutil.Process(record["pid"])
+            return proc.status() != psutil.STATUS_ZOMBIE and abs(proc.create_time() - record["create_time"]) < 1.0
+        except psutil.Error:
+            return False
+
+    def _run(self, runtime):
+        runtime.console = ConsoleChannel(runtime.process)
+        runtime.exit_task = asyncio.create_task(self._watch_exit(runtime))
+        runtime.output_task = asyncio.create_task(self._log_output(runtime))
+        self._govern(runtime)
+        if runtime.ready:
+            self._watch_players(runtime)
+        self._fire(self._start_listeners, runtime)
+
+    def _govern(self, runtime):
+        """Keep the instance's process tree on the resource profile from its config, if any."""
+        if runtime.node is not None:
+            if runtime.config.get("resources"):
+                print(f"[{self._name}:{runtime.name}] ⚠️ Resource profiles aren't applied on node agents yet.")
+            return
+        try:
+            profile = ResourceProfile.from_config(runtime.config)
+        except (ValueError, TypeError) as e:
+            print(f"[{self._name}:{runtime.name}] ⚠️ Ignoring invalid resource profile: {e}")
+            return
+        if profile is None:
+            return
+        runtime.governor = ResourceGovernor(
+            runtime, profile, lambda content: self._notify(runtime, content), f"{self._name}:{runtime.name}"
+        )
+        runtime.governor_task = asyncio.create_task(runtime.governor.run())
+
+    def _save_state(self, runtime):
+        if runtime.node is not None:
+            create_time = runtime.process.create_time
+        else:
             try:
-                pid = int(info["pid"])
-                proc = psutil.Process(pid)
-                if proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE:
-                    print(f"[{self.name}:{instance_name}] 🛑 Killing orphaned process (PID {pid})")
-                    proc.terminate()
-                    proc.wait(timeout=5)
-            except psutil.NoSuchProcess:
+                create_time = psutil.Process(runtime.pid).create_time()
+            except psutil.Error:
+                create_time = runtime.start_time
+        self._state.put(
+            self._name, runtime.name,
+            pid=runtime.pid,
+            create_time=create_time,
+            started_at=runtime.start_time,
+            spool_path=runtime.spool_path,
+            log_offset=runtime.log_offset,
+            log_path=runtime.log_sink.path,
+            channel_id=getattr(runtime.channel, "id", None),
+            player_count=runtime.player_count,
+            ready=int(runtime.ready),
+            timer_deadline=runtime.timer_deadline,
+            standby_since=runtime.standby_since,
+            node=runtime.node.name if runtime.node is not None else None,
+        )
+
+    async def stop_instance(self, instance_name: str, progress=None) -> str:
+        """
+        Stop an instance without blocking the event loop: ask the game to save and exit, then
+        escalate to SIGTERM and finally SIGKILL for whatever is left of the process tree.
+        `progress` is an optional coroutine function called with status messages.
+        Returns one of the STOP_* outcomes, or None if the instance wasn't running.
+        """
+        runtime = self._runtimes.get(instance_name)
+        if runtime and runtime.is_running:
+            pid = runtime.pid
+            runtime.stop_requested = True
+            self._cancel_shutdown_timer(runtime)
+            runtime.standby_since = None
+        else:
+            record = self._state.get(self._name, instance_name)
+            # A leftover record of a remote instance names a pid on another machine.
+            if not record or record["node"] or not self._is_same_process(record):
+                return None
+            pid = record["pid"]
+
+        try:
+            outcome = await self._stop_process_tree(pid, runtime, instance_name, progress)
+        except Exception as e:
+            print(f"[{self._name}] ❌ Error stopping instance {instance_name}: {e}")
+            outcome = None
+
+        if runtime and runtime.exit_task:
+            try:
+                await asyncio.wait_for(asyncio.shield(runtime.exit_task), timeout=5)
+            except asyncio.TimeoutError:
                 pass
-            except Exception as e:
-                print(f"[{self.name}:{instance_name}] ⚠️ Could not clean orphaned process: {e}")
+            runtime.stop_outcome = outcome
+            self._fire(self._stop_listeners, runtime)
+        else:
+            self._state.remove(self._name, instance_name)
+        return outcome
 
-            self._remove_pid(pid_file)
+    async def _stop_process_tree(self, pid: int, runtime, label: str, progress=None) -> str:
+        async def report(message: str):
+            if progress:
+                try:
+                    await progress(message)
+                except Exception as e:
+                    print(f"[{self._name}:{label}] ⚠️ Could not report stop progress: {e}")
+
+        tree = runtime.tree if runtime and runtime.tree else process_tree.LocalTree(pid)
+        if await tree.wait_gone(0):
+            return STOP_GRACEFUL
+        # A tree in warm standby can't act on the stop request (or SIGTERM) until it runs again.
+        await tree.signal(signal.SIGCONT)
+
+        await report(f"💾 Asking `{label}` to save and shut down...")
+        try:
+            await self.request_graceful_stop(pid, runtime)
+        except Exception as e:
+            print(f"[{self._name}:{label}] ⚠️ Graceful stop request failed: {e}")
+        if await tree.wait_gone(self.GracefulStopTimeout):
+            return STOP_GRACEFUL
 
+        await report(f"⚠️ `{label}` didn't stop within {self.GracefulStopTimeout}s, sending SIGTERM...")
+        await tree.signal(signal.SIGTERM)
+        if await tree.wait_gone(self.TerminateTimeout):
+            return STOP_TERMINATED
 
-    async def _log_output(self, ctx):
-        if not self._process or not self._process.stdout:
+        await report(f"🔪 `{label}` ignored SIGTERM, killing it...")
+        await tree.signal(signal.SIGKILL)
+        await tree.wait_gone(self.TerminateTimeout)
+        return STOP_KILLED
+
+    async def request_graceful_stop(self, pid: int, runtime=None):
+        """
+        Ask the game to save and exit: write StopCommands to its console when we own its stdin,
+        otherwise send StopSignal to its process group.
+        """
+        if self.StopCommands and runtime and runtime.console and runtime.console.available:
+            await runtime.console.send(self.StopCommands)
+        else:
+            tree = runtime.tree if runtime and runtime.tree else process_tree.LocalTree(pid)
+            await tree.signal(self.StopSignal, group=True)
+
+    async def wait_for_exit(self, instance_name: str):
+        """Wait until the instance's process exits and return its exit code."""
+        runtime = self._runtimes.get(instance_name)
+        if not runtime or not runtime.exit_task:
+            return None
+        await asyncio.shield(runtime.exit_task)
+        return runtime.process.returncode
+
+    async def _watch_exit(self, runtime):
+        await runtime.process.wait()
+        self._cancel_shutdown_timer(runtime)
+        if runtime.governor_task:
+            runtime.governor_task.cancel()
+        if runtime.roster_task:
+            runtime.roster_task.cancel()
+        self._sessions.stopped(self._name, runtime.name)
+        self._state.remove(self._name, runtime.name)
+        self.health(runtime.name).set_players(None)
+        if self._runtimes.get(runtime.name) is runtime:
+            del self._runtimes[runtime.name]
+        self._fire(self._exit_listeners, runtime)
+
+    async def _read_batches(self, runtime):
+        """
+        Tail the instance's console spool from `runtime.log_offset`, yielding each chunk's
+        complete lines together with the spool offset just past them. Once the end is reached
+        the reader backs off between polls until more output arrives or the process exits.
+        A spool past SPOOL_MAX_BYTES is truncated at such a pause (see _truncate_spool).
+        """
+        pending = b""
+        interval = self.TAIL_MIN_INTERVAL
+        with open(runtime.spool_path, "rb", buffering=0) as spool:
+            spool.seek(runtime.log_offset)
+            while True:
+                chunk = spool.read(self.READ_CHUNK_SIZE)
+                if not chunk:
+                    if runtime.exit_task.done():
+                        # The process is gone and everything it wrote has been read.
+                        break
+                    if not pending and spool.tell() >= self.SPOOL_MAX_BYTES and runtime.pipeline is not None:
+                        # Let the stages commit what was read, then empty the spool unless more came meanwhile.
+                        if await runtime.pipeline.wait_committed(spool.tell(), interval):
+                            self._truncate_spool(runtime, spool)
+                        continue
+                    await asyncio.sleep(interval)
+                    interval = min(interval * 2, self.TAIL_MAX_INTERVAL)
+                    continue
+
+                if runtime.boot is not None and runtime.boot.mark(FIRST_OUTPUT):
+                    self._update_boot_status(runtime)
+                interval = self.TAIL_MIN_INTERVAL
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                if lines:
+                    yield lines, spool.tell() - len(pending)
+            if pending:
+                yield [pending], spool.tell()
+
+    def _truncate_spool(self, runtime, spool) -> bool:
+        """
+        Empty the spool if the pipeline has committed everything in it, and start the offset
+        over at 0. The server (or the node stream) appends with O_APPEND, so its next write
+        lands at the new start. This runs without yielding to the loop right after a read found
+        the end, and only if the file hasn't grown since; output written in the few microseconds
+        between that check and the truncate would be lost, as with logrotate's copytruncate.
+        Returns whether it was truncated.
+        """
+        end = spool.tell()
+        if runtime.pipeline.offset != end or os.fstat(spool.fileno()).st_size != end:
+            return False
+        os.truncate(runtime.spool_path, 0)
+        spool.seek(0)
+        runtime.pipeline.rebase()
+        return True
+
+    async def _log_output(self, runtime):
+        def save_offset(offset: int):
+            runtime.log_offset = offset
+            self._state.update(self._name, runtime.name, log_offset=offset)
+
+        async def handle(event):
+            await self.handle_event(runtime, event)
+
+        try:
+            if runtime.log_offset > os.path.getsize(runtime.spool_path):
+                # The spool was truncated after this offset was saved and before 0 was.
+                save_offset(0)
+        except OSError:
+            pass
+
+        runtime.pipeline = OutputPipeline(
+            self._read_batches(runtime),
+            runtime.log_sink,
+            self._rule_engine.match,
+            handle,
+            self._is_critical,
+            save_offset,
+            runtime.log_offset,
+            policy=runtime.config.get("event_overflow", self.EventOverflow),
+            persist_queue_size=self.PersistQueueSize,
+            event_queue_size=self.EventQueueSize,
+            save_interval=self.OFFSET_SAVE_INTERVAL,
+            tail_size=self.CrashTailLines,
+            observe=runtime.console.feed,
+            label=f"{self._name}:{runtime.name}",
+        )
+        try:
+            await runtime.pipeline.run()
+        finally:
+            runtime.log_sink.close()
+            if runtime.boot is not None and runtime.exit_task.done():
+                # All of its output has been read and it never became ready.
+                self._update_boot_status(runtime, final=True)
+                runtime.boot = None
+            if runtime.exit_task.done():
+                try:
+                    os.remove(runtime.spool_path)
+                except OSError:
+                    pass
+
+    async def handle_event(self, runtime, event):
+        if isinstance(event, ServerReady):
+            if runtime.ready:
+                return
+            runtime.ready = True
+            self._state.update(self._name, runtime.name, ready=1)
+            if runtime.start_time:
+                self._record_start_latency(runtime.name, COLD_START, time.time() - runtime.start_time)
+            if runtime.boot is not None:
+                runtime.boot.mark(READY)
+                self._update_boot_status(runtime, final=True)
+                self._boot_history.record(self._name, runtime.name, runtime.boot)
+                runtime.boot = None
+            self.health(runtime.name).set_players(runtime.player_count)
+            self._sessions.started(self._name, runtime.name)
+            if runtime.governor:
+                runtime.governor.relax()
+            self._notify(runtime, await self.ready_message(runtime, event), important=True)
+            self._start_shutdown_timer(runtime, reason="no players joined")
+            self._watch_players(runtime)
+
+        elif isinstance(event, PlayerJoined):
+            who = event.player or "A player"
+            suffix = " Shutdown cancelled." if runtime.timer else ""
+            self._notify(
+                runtime,
+                f"🎮 {who} joined `{runtime.name}`.{suffix}",
+                group=f"{runtime.name}:joined",
+                summarize=lambda n: f"🎮 {n} players joined `{runtime.name}`.",
+            )
+            self._cancel_shutdown_timer(runtime)
+            if event.player:
+                runtime.players.add(event.player)
+            runtime.player_count = event.count if event.count is not None else runtime.player_count + 1
+            self._state.update(self._name, runtime.name, player_count=runtime.player_count)
+            self.health(runtime.name).set_players(runtime.player_count)
+            self._sessions.joined(self._name, runtime.name, event.player, runtime.player_count)
+
+        elif isinstance(event, PlayerLeft):
+            runtime.players.discard(event.player)
+            runtime.player_count = event.count if event.count is not None else runtime.player_count - 1
+            self._state.update(self._name, runtime.name, player_count=runtime.player_count)
+            self.health(runtime.name).set_players(runtime.player_count)
+            self._sessions.left(self._name, runtime.name, event.player, runtime.player_count)
+            if runtime.player_count == 0:
+                self._notify(runtime, f"👤 All players left `{runtime.name}`. Starting shutdown timer.")
+                self._start_shutdown_timer(runtime, reason="all players left")
+
+        elif isinstance(event, Crashed):
+            runtime.crash_reason = event.reason or runtime.crash_reason or "crash reported in the console"
+            self._notify(
+                runtime,
+                f"❌ `{runtime.name}` crashed.",
+                group=f"{runtime.name}:crashed",
+                summarize=lambda n: f"❌ `{runtime.name}` crashed ({n} reports).",
+                important=True,
+            )
+
+        elif isinstance(event, BootMilestone):
+            if runtime.boot is not None and runtime.boot.mark(event.phase):
+                self._update_boot_status(runtime)
+
+        elif isinstance(event, WorldSaved):
+            runtime.world_saved.set()
+            duration_ms = event.duration_ms
+            if duration_ms is None and runtime.save_started is not None:
+                duration_ms = (time.monotonic() - runtime.save_started) * 1000
+            runtime.save_started = None
+            if duration_ms is not None:
+                self.health(runtime.name).record_save(duration_ms)
+
+        elif isinstance(event, SaveStarted):
+            runtime.save_started = time.monotonic()
+
+        elif isinstance(event, TickLag):
+            health = self.health(runtime.name)
+            health.record_lag(event.ms, event.ticks)
+            threshold = runtime.config.get("lag_alert_threshold", self.LagAlertThreshold)
+            overload = health.check_overload(self.LagAlertWindow, threshold, self.LagAlertMinEvents, self.LagAlertCooldown)
+            if overload:
+                self._notify(
+                    runtime,
+                    f"🐢 `{runtime.name}` is overloaded: {overload['lag_ms'] / 1000:.0f}s behind over the last "
+                    f"{self.LagAlertWindow // 60} minutes ({overload['lag_events']} lag warnings, "
+                    f"{runtime.player_count} players online). See /health.",
+                )
+
+        elif isinstance(event, ServerStopping):
+            runtime.stopping_seen = True
+            self._notify(runtime, f"🛑 {self._name.capitalize()} `{runtime.name}` is shutting down.", group=f"{runtime.name}:stopping", important=True)
+
+    def _notify(self, runtime, content: str, group: str = None, summarize=None, important: bool = False):
+        """
+        Queue a message for the channel the instance was started from without waiting on Discord.
+        `important` messages are kept even when the channel's queue is full.
+        """
+        if runtime.channel is None:
+            print(f"[{self._name}:{runtime.name}] {content}")
             return
+        self._notifier.post(runtime.channel, content, group=group, summarize=summarize, important=important)
 
-        with open(self._log_file_path, "a") as log_file:
-            while True and self.is_running:
-                line = await asyncio.to_thread(self._process.stdout.readline)
-                if not line:
-                    break
-                decoded = line.decode("utf-8").strip()
-                log_file.write(f"{decoded}\n")
-                log_file.flush()
-                await self.handle_output_line(ctx, decoded)
+    def _update_boot_status(self, runtime, final: bool = False):
+        """Post or edit the instance's boot progress message: milestones passed and the ETA."""
+        if runtime.channel is None:
+            return
+        self._notifier.update(runtime.channel, f"{self._name}:{runtime.name}:boot", self._boot_status(runtime), final=final)
+
+    def _boot_status(self, runtime) -> str:
+        boot = runtime.boot
+        prediction = self._boot_history.predict(self._name, runtime.name)
+        if READY in boot.milestones:
+            header = f"✅ `{runtime.name}` booted in {format_duration(boot.milestones[READY])}"
+            if prediction:
+                header += f" (usually {format_duration(prediction['median'])})"
+        elif not runtime.is_running:
+            header = f"❌ `{runtime.name}` exited after {format_duration(boot.elapsed)} without becoming ready"
+        elif prediction is None:
+            header = f"🚀 Booting `{runtime.name}`... no boot history yet, so no ETA."
+        else:
+            # Re-anchor the prediction on the latest milestone that past boots also reached.
+            usual = prediction["milestones"]
+            anchor = max((phase for phase in boot.milestones if phase in usual), key=lambda phase: boot.milestones[phase])
+            shift = boot.milestones[anchor] - usual[anchor]
+            now = time.time()
+            eta = boot.started_at + prediction["median"] + shift
+            p90 = boot.started_at + prediction["p90"] + shift
+            if eta > now:
+                header = (
+                    f"🚀 Booting `{runtime.name}`... ready <t:{int(eta)}:R> "
+                    f"(90% of the last {prediction['boots']} boots by <t:{int(max(p90, eta))}:T>)"
+                )
+            else:
+                header = f"🚀 Booting `{runtime.name}`... taking longer than the usual {format_duration(prediction['median'])}."
+
+        passed = " · ".join(f"{phase} {format_duration(offset)}" for phase, offset in boot.milestones.items())
+        return f"{header}\n⏱️ {passed}"
 
     @abstractmethod
-    async def handle_output_line(self, ctx, line: str):
-        """Override this in subclasses to process game-specific output lines."""
+    async def ready_message(self, runtime, event: ServerReady) -> str:
+        """
+        Override this in subclasses to build the message announcing the instance is live.
+        It runs in the output pipeline's interpret stage, so anything slow must be awaited.
+        """
         pass
 
-    def _save_pid(self, path: str):
-        if not self._process:
-            return
-        try:
-            with open(path, "w") as f:
-                f.write(f"pid={self._process.pid}\n")
-        except Exception:
-            pass
+    def _cancel_shutdown_timer(self, runtime):
+        if runtime.timer:
+            runtime.timer.cancel()
+            runtime.timer = None
+        if runtime.timer_deadline is not None:
+            runtime.timer_deadline = None
+            self._state.update(self._name, runtime.name, timer_deadline=None)
 
-    def _load_pid_info(self, path: str):
-        if not os.path.exists(path):
-            return None
-        with open(path) as f:
-            data = dict(line.strip().split("=", 1) for line in f if "=" in line)
-        return data
+    def _start_timer(self, runtime, delay: float, action):
+        """Run `action()` after `delay` seconds unless cancelled; the deadline is persisted."""
+        self._cancel_shutdown_timer(runtime)
+        runtime.timer_deadline = time.time() + delay
+        self._state.update(self._name, runtime.name, timer_deadline=runtime.timer_deadline)
+
+        async def fire():
+            runtime.timer = None
+            await action()
 
-    def _remove_pid(self, path: str):
-        if os.path.exists(path):
-            os.remove(path)
+        runtime.timer = scheduler.call_at(runtime.timer_deadline, fire, label=f"{self._name}:{runtime.name} timer")
 
-    def _cancel_shutdown_timer(self):
-        if self._timer_task:
-            self._timer_task.cancel()
-            self._timer_task = None
+    def keep_up(self, instance_name: str, until: float):
+        """Don't let the instance idle out before `until`, e.g. for the length of a scheduled session."""
+        self._kept_up[instance_name] = until
+        runtime = self._runtimes.get(instance_name)
+        if runtime and runtime.is_running and not runtime.in_standby and runtime.timer and runtime.player_count == 0:
+            self._start_shutdown_timer(runtime, reason="scheduled session" if until > time.time() else "scheduled session over")
 
-    async def _start_shutdown_timer(self, ctx, reason: str):
-        self._cancel_shutdown_timer()
-        await ctx.channel.send(f"⏳ Server will shut down in {self._timer_duration} seconds ({reason})")
+    def _start_shutdown_timer(self, runtime, reason: str, delay: float = None):
+        delay = self.idle_timeout(runtime.name) if delay is None else delay
+        held = self._kept_up.get(runtime.name, 0) - time.time()
+        if held > delay:
+            delay, reason = held, "scheduled session"
+        standby = self.standby_timeout(runtime.name)
+        verb = "go to standby" if standby else "shut down"
+        self._notify(runtime, f"⏳ `{runtime.name}` will {verb} in {delay:.0f} seconds ({reason})")
 
         async def shutdown():
-            await asyncio.sleep(self._timer_duration)
-            await ctx.channel.send("🛑 Shutting down due to inactivity.")
-            self.stop_instance(self._active_instance)
+            if standby and await self.enter_standby(runtime.name):
+                return
+            self._notify(runtime, f"🛑 Shutting down `{runtime.name}` due to inactivity.", important=True)
+            await self.stop_instance(runtime.name)
+
+        self._start_timer(runtime, delay, shutdown)
+
+    def _start_standby_timer(self, runtime, delay: float):
+        async def expire():
+            self._notify(runtime, f"🛑 `{runtime.name}` was in standby too long, shutting it down.", important=True)
+            await self.stop_instance(runtime.name)
+
+        self._start_timer(runtime, delay, expire)
+
+    async def enter_standby(self, instance_name: str) -> bool:
+        """
+        Put an idle instance in warm standby: save the world, then SIGSTOP its whole process
+        tree so it keeps its memory but uses no CPU. It is resumed in seconds by
+        `resume_instance`, and really stopped once its standby timeout expires.
+        Returns False, leaving the instance running, if the world couldn't be saved.
+        """
+        runtime = self._runtimes.get(instance_name)
+        timeout = self.standby_timeout(instance_name)
+        if not runtime or not runtime.is_running or runtime.in_standby or not timeout:
+            return False
+        if not await self._save_world(runtime):
+            print(f"[{self._name}:{instance_name}] ⚠️ World save wasn't confirmed, not using standby.")
+            return False
+        if runtime.player_count > 0:
+            # Someone joined while the world was saving.
+            return False
+
+        if runtime.node is None:
+            # The hooks run local tools against the server's processes.
+            try:
+                await self.before_standby(runtime)
+            except Exception as e:
+                print(f"[{self._name}:{instance_name}] ⚠️ Pre-standby hook failed: {e}")
+        await runtime.tree.signal(signal.SIGSTOP)
+        runtime.standby_since = time.time()
+        self._state.update(self._name, instance_name, standby_since=runtime.standby_since)
+        self._notify(
+            runtime,
+            f"💤 `{instance_name}` saved and went to standby. It resumes in seconds on the next start, "
+            f"and shuts down fully in {timeout / 60:.0f} minutes."
+        )
+        self._start_standby_timer(runtime, timeout)
+        return True
+
+    async def resume_instance(self, instance_name: str, channel=None):
+        """
+        Wake an instance from warm standby with SIGCONT and return the seconds it took until
+        its whole process tree was running again, or None if it wasn't in standby.
+        """
+        runtime = self._runtimes.get(instance_name)
+        if not runtime or not runtime.is_running or not runtime.in_standby:
+            return None
+
+        begin = time.monotonic()
+        self._cancel_shutdown_timer(runtime)
+        await runtime.tree.signal(signal.SIGCONT)
+        if not await runtime.tree.wait_resumed(self.ResumeTimeout):
+            print(f"[{self._name}:{instance_name}] ⚠️ Process tree still stopped {self.ResumeTimeout}s after SIGCONT.")
+        latency = time.monotonic() - begin
 
-        self._timer_task = asyncio.create_task(shutdown())
+        runtime.standby_since = None
+        if channel is not None:
+            runtime.channel = channel
+        self._state.update(
+            self._name, instance_name,
+            standby_since=None,
+            channel_id=getattr(runtime.channel, "id", None),
+        )
+        self._record_start_latency(instance_name, WARM_START, latency)
+        self._notify(runtime, f"♨️ `{instance_name}` resumed from standby in {latency:.1f}s.")
+        self._start_shutdown_timer(runtime, reason="no players joined")
+        return latency
+
+    async def _save_world(self, runtime, before: list = ()) -> bool:
+        """Send `before` and SaveCommands to the console and wait for the WorldSaved event."""
+        if not self.SaveCommands:
+            return False
+        runtime.world_saved.clear()
+        if not await self._send_console(runtime, [*before, *self.SaveCommands]):
+            return False
+        try:
+            await asyncio.wait_for(runtime.world_saved.wait(), timeout=self.SaveTimeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _send_console(self, runtime, commands: list) -> bool:
+        try:
+            await runtime.console.send(commands)
+        except ConsoleUnavailable:
+            return False
+        return True
+
+    def _watch_players(self, runtime):
+        interval = runtime.config.get("player_list_interval", self.PlayerListInterval)
+        if self._player_list is None or not interval or runtime.roster_task or not runtime.console.available:
+            return
+
+        async def watch():
+            while True:
+                if not runtime.in_standby and not runtime.stop_requested:
+                    try:
+                        await self.reconcile_players(runtime)
+                    except Exception as e:
+                        print(f"[{self._name}:{runtime.name}] ⚠️ Player list check failed: {e}")
+                await asyncio.sleep(interval)
+
+        runtime.roster_task = asyncio.create_task(watch())
+
+    async def reconcile_players(self, runtime):
+        """
+        Ask the server who is online and correct the player count kept from join and leave
+        lines, which drifts when one of them is missed. Returns the count, or None if the
+        server didn't answer.
+        """
+        found = await runtime.console.query(self.PlayerListCommand, self._player_list, self.PlayerListTimeout)
+        if found is None:
+            return None
+        count = int(found["count"])
+        names = found.groupdict().get("names")
+        if names is not None:
+            runtime.players = {name.strip() for name in names.split(",") if name.strip()}
+        self._sessions.checked(self._name, runtime.name, count, runtime.players if names is not None else None)
+        if count == runtime.player_count:
+            return count
+
+        print(f"[{self._name}:{runtime.name}] Player count corrected from {runtime.player_count} to {count}")
+        runtime.player_count = count
+        self._state.update(self._name, runtime.name, player_count=count)
+        self.health(runtime.name).set_players(count)
+        if count > 0:
+            self._cancel_shutdown_timer(runtime)
+        elif runtime.timer is None:
+            self._start_shutdown_timer(runtime, reason="no players online")
+        return count
+
+    async def pause_saving(self, runtime) -> bool:
+        """
+        Flush the world to disk and stop the game from writing it until `resume_saving`.
+        False if the game can't do that, in which case its files may change at any time.
+        """
+        if not self.SaveOffCommands or runtime.in_standby:
+            return False
+        if await self._save_world(runtime, before=self.SaveOffCommands):
+            return True
+        await self.resume_saving(runtime)
+        return False
+
+    async def resume_saving(self, runtime):
+        if self.SaveOnCommands and runtime.is_running:
+            await self._send_console(runtime, self.SaveOnCommands)
+
+    async def before_standby(self, runtime):
+        """Override this to shrink the server's memory before its process tree is suspended."""
+        pass
 
     def get_launch_args(self, instance_config: dict) -> list:
         """
@@ -0,0 +1,85 @@
+import asyncio
+
+
+class ConsoleUnavailable(Exception):
+    """The server's console input can't be written to."""
+
+
+class ConsoleChannel:
+    """
+    Two-way access to an instance's console: commands go to the server's stdin, and `query`
+    and `run` also collect the output lines that answer them. The console has no request ids,
+    so exchanges run one at a time and an answer is recognised among the lines that follow
+    the command. The output pipeline's reader feeds lines in as soon as they are read, ahead
+    of the rules and their bounded queue, so overflow dropping never hides an answer.
+    Processes re-adopted after a bot restart have no stdin; their console is unavailable.
+    """
+
+    def __init__(self, process):
+        self._process = process
+        self._lock = asyncio.Lock()
+        self._lines = None
+
+    @property
+    def available(self) -> bool:
+        stdin = self._process.stdin if self._process else None
+        return stdin is not None and not stdin.is_closing()
+
+    async def send(self, commands: list):
+        if not self.available:
+            raise ConsoleUnavailable("the server's console input isn't available")
+        stdin = self._process.stdin
+        for command in commands:
+            stdin.write(f"{command}\n".encode("utf-8"))
+        await stdin.drain()
+
+    def feed(self, lines: list):
+        """Output lines just read from the server, as stripped bytes."""
+        if self._lines is not None:
+            for line in lines:
+                self._lines.put_nowait(line)
+
+    async def query(self, command: str, expect, timeout: float = 5.0):
+        """Run `command` and return the match of the first line `expect` finds, or None at the timeout."""
+        async with self._lock:
+            self._lines = asyncio.Queue()
+            try:
+                await self.send([command])
+                deadline = asyncio.get_running_loop().time() + timeout
+                while (line := await self._next_line(deadline)) is not None:
+                    found = expect.search(line)
+                    if found:
+                        return found
+                return None
+            finally:
+                self._lines = None
+
+    async def run(self, command: str, timeout: float = 5.0, quiet: float = 0.75) -> list:
+        """
+        Run `command` and return what the server printed after it: every line up to the
+        timeout, or until `quiet` seconds pass without output once it started answering.
+        Anything else the server printed in the meantime is included too.
+        """
+        async with self._lock:
+            self._lines = asyncio.Queue()
+            try:
+                await self.send([command])
+                deadline = asyncio.get_running_loop().time() + timeout
+                lines = []
+                while (line := await self._next_line(deadline, quiet if lines else None)) is not None:
+                    lines.append(line)
+                return lines
+            finally:
+                self._lines = None
+
+    async def _next_line(self, deadline: float, quiet: float = None):
+        remaining = deadline - asyncio.get_running_loop().time()
+        if quiet is not None:
+            remaining = min(remaining, quiet)
+        if remaining <= 0:
+            return None
+        try:
+            line = await asyncio.wait_for(self._lines.get(), remaining)
+        except asyncio.TimeoutError:
+            return None
+        return line.decode("utf-8", errors="replace")
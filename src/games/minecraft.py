@@ -1,57 +1,124 @@
 import os
 import socket
 import re
+import shutil
+import asyncio
+import process_tree
+from games import minecraft_protocol
 from games.base_game import BaseGameServer
+from games.rules import Rule, ServerReady, PlayerJoined, PlayerLeft, ServerStopping, Crashed, WorldSaved, SaveStarted, TickLag, milestone
 
 
 class MinecraftServer(BaseGameServer):
-    Instances = {
-        "Modded 1.21.1 NeoForge BMC5": {
-            "script_path": os.getenv("MINECRAFT_MODDED_1_21_1_NEOFORGE_BMC5_SCRIPT_FILE_PATH")
-        },
-        "Vanilla Fabric 1.21.5": {
-            "script_path": os.getenv("MINECRAFT_VANILLA_FABRIC_1_21_5_SCRIPT_FILE_PATH")
-        },
-    }
-
-    def __init__(self):
-        super().__init__("minecraft")
-
-    async def handle_output_line(self, ctx, line: str):
-        if "Done" in line:
-            ip = self._get_local_ip()
-            await ctx.channel.send(
-                f"✅ **Minecraft `{self.active_instance}` is live!**\n🌐 IP: `{ip}:25565` using ZeroTier"
+    DefaultFootprint = {"memory_mb": 4096, "cpu_cores": 2.0}
+    StopCommands = ["save-all", "stop"]
+    GracefulStopTimeout = 90
+    SaveCommands = ["save-all flush"]
+    SaveOffCommands = ["save-off"]
+    SaveOnCommands = ["save-on"]
+    TicksPerSecond = 20
+    DefaultPort = 25565
+    PrewarmPatterns = ("*.jar", "mods/*.jar", "libraries/**/*.jar", "config/**/*", "world/region/*.mca")
+    PlayerListCommand = "list"
+    PlayerListPattern = r'\]: There are (?P<count>\d+) of a max of \d+ players online:(?P<names>.*)'
+    # "[12:00:00]" from vanilla and Fabric, "[17Oct2026 12:00:00.123]" from NeoForge.
+    LogTimePattern = r'^\[(?:(?P<day>\d\d)(?P<month>[A-Z][a-z]{2})(?P<year>\d{4}) )?(?P<hour>\d\d):(?P<minute>\d\d):(?P<second>\d\d)'
+
+    Rules = [
+        Rule(r'\]: Done \(\d+(?:\.\d+)?s\)! For help', ServerReady),
+        Rule(r'\]: (?P<player>[\w.-]+) joined the game', PlayerJoined),
+        Rule(r'\]: (?P<player>[\w.-]+) left the game', PlayerLeft),
+        Rule(r'\[main/ERROR\].*Shutting down', Crashed),
+        Rule(r'This crash report has been saved to: (?P<reason>.+)', Crashed),
+        Rule(r'Shutting down', ServerStopping),
+        Rule(r'\]: Stopping server', ServerStopping),
+        Rule(r'\]: Saving the game', SaveStarted),
+        Rule(r'\]: Saved the game', WorldSaved),
+        Rule(
+            r"Can't keep up! Is the server overloaded\? Running (?P<ms>\d+)ms or (?P<ticks>\d+) ticks behind",
+            TickLag,
+            lambda m: {"ms": int(m["ms"]), "ticks": int(m["ticks"])},
+        ),
+        milestone(r'ModLauncher running', "mod loading"),
+        milestone(r'Loading \d+ mods:', "mod loading"),
+        milestone(r'\]: Starting minecraft server version', "server starting"),
+        milestone(r'\]: Preparing level "', "world loading"),
+        milestone(r'\]: Preparing start region', "spawn area"),
+        milestone(r'\]: Preparing spawn area: 0%', "spawn area"),
+    ]
+
+    def __init__(self, instances: dict = None):
+        super().__init__("minecraft", instances)
+        self._motds = {}
+
+    async def ready_message(self, runtime, event: ServerReady) -> str:
+        ip = await self._get_local_ip()
+        port = runtime.config.get("port", self.DefaultPort)
+        return f"✅ **Minecraft `{runtime.name}` is live!**\n🌐 IP: `{ip}:{port}` using ZeroTier"
+
+    async def answer_wake(self, reader, writer, instance_name: str, status: str, reply: str):
+        if instance_name not in self._motds:
+            self._motds[instance_name] = await asyncio.to_thread(self._read_motd, instance_name)
+        motd = self._motds[instance_name]
+        description = f"{motd}\n{status}" if motd else status
+        return await minecraft_protocol.answer(reader, writer, description, "Asleep", reply)
+
+    def _read_motd(self, instance_name: str) -> str:
+        """The `motd` from server.properties next to the instance's launch script, if there is one."""
+        try:
+            script = self.get_launch_args(self.get_instance(instance_name))[0]
+            with open(os.path.join(os.path.dirname(script), "server.properties"), encoding="utf-8") as f:
+                for line in f:
+                    key, _, value = line.partition("=")
+                    if key.strip() == "motd":
+                        # Properties files escape non-ASCII text as \uXXXX.
+                        return value.strip().encode("latin-1", "backslashreplace").decode("unicode_escape")
+        except Exception:
+            pass
+        return ""
+
+    async def before_standby(self, runtime):
+        # A full GC lets the JVM hand unused heap back to the OS before it is frozen.
+        jcmd = shutil.which("jcmd")
+        if not jcmd:
+            return
+        for proc in process_tree.snapshot(runtime.pid):
+            try:
+                if proc.name() != "java":
+                    continue
+            except Exception:
+                continue
+            gc = await asyncio.create_subprocess_exec(
+                jcmd, str(proc.pid), "GC.run",
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
             )
-            await self._start_shutdown_timer(ctx, reason="no players joined")
-
-        elif "joined the game" in line:
-            self._cancel_shutdown_timer()
-            self.player_count += 1
-            await ctx.channel.send("🎮 A player joined. Shutdown cancelled.")
-
-        elif "left the game" in line:
-            self.player_count -= 1
-            if self.player_count == 0:
-                await ctx.channel.send("👤 All players left. Starting shutdown timer.")
-                await self._start_shutdown_timer(ctx, reason="all players left")
-
-        elif "Shutting down" in line:
-            if "[main/ERROR]" in line:
-                await ctx.channel.send("❌ Server crashed.")
-            else:
-                await ctx.channel.send("🛑 Minecraft server is shutting down.")
-            self._process = None
-
-    def _get_local_ip(self) -> str:
+            try:
+                await asyncio.wait_for(gc.wait(), timeout=30)
+            except asyncio.TimeoutError:
+                gc.kill()
+
+    async def _get_local_ip(self) -> str:
         try:
-            out = os.popen("zerotier-cli listnetworks").read()
-            match = re.search(r'(\d{1,3}(?:\.\d{1,3}){3})\/\d+', out)
+            zerotier = await asyncio.create_subprocess_exec(
+                "zerotier-cli", "listnetworks",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            try:
+                out, _ = await asyncio.wait_for(zerotier.communicate(), timeout=5)
+            except asyncio.TimeoutError:
+                zerotier.kill()
+                out = b""
+            match = re.search(r'(\d{1,3}(?:\.\d{1,3}){3})\/\d+', out.decode(errors="replace"))
             if match:
                 return match.group(1)
-        except:
+        except Exception:
             pass
+        return await asyncio.to_thread(self._get_routed_ip)
 
+    @staticmethod
+    def _get_routed_ip() -> str:
         try:
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             s.connect(("8.8.8.8", 80))
@@ -0,0 +1,162 @@
+# minecraft_protocol.py
+# Just enough of the Minecraft Java Edition protocol to answer server-list pings and turn away
+# a login with a message, for stopped instances listening for players (see wake_listener.py).
+# Run it as a script to ping a server or try a login like a client would.
+
+import json
+import asyncio
+
+# The handshake's next state.
+STATUS = 1
+LOGIN = 2
+TRANSFER = 3
+
+# Clients send short packets before logging in; anything longer isn't a client we can talk to.
+MAX_PACKET = 32 * 1024
+
+
+def varint(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def string(text: str) -> bytes:
+    encoded = text.encode("utf-8")
+    return varint(len(encoded)) + encoded
+
+
+def packet(packet_id: int, body: bytes = b"") -> bytes:
+    data = varint(packet_id) + body
+    return varint(len(data)) + data
+
+
+def unpack_varint(data: bytes, position: int = 0) -> tuple:
+    value = 0
+    for shift in range(0, 35, 7):
+        if position >= len(data):
+            raise ValueError("truncated VarInt")
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return (value - (1 << 32) if value >= 1 << 31 else value), position
+    raise ValueError("VarInt is too long")
+
+
+def unpack_string(data: bytes, position: int = 0) -> tuple:
+    length, position = unpack_varint(data, position)
+    if length < 0 or position + length > len(data):
+        raise ValueError("truncated string")
+    return data[position:position + length].decode("utf-8", errors="replace"), position + length
+
+
+async def read_varint(reader) -> int:
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+    raise ValueError("VarInt is too long")
+
+
+async def read_packet(reader) -> tuple:
+    """(packet id, body) of the next packet."""
+    length = await read_varint(reader)
+    if not 0 < length <= MAX_PACKET:
+        raise ValueError(f"unexpected packet length {length}")
+    data = await reader.readexactly(length)
+    packet_id, position = unpack_varint(data)
+    return packet_id, data[position:]
+
+
+async def answer(reader, writer, description: str, version: str, kick: str):
+    """
+    Serve one client connection: a server-list ping gets `description` and `version`, with the
+    client's own protocol number so it isn't shown as incompatible, and a login attempt is
+    disconnected with `kick`. Returns the name of the player who tried to log in, else None.
+    Legacy (pre-1.7) pings and anything else unexpected just get the connection closed.
+    """
+    packet_id, body = await read_packet(reader)
+    if packet_id != 0x00:
+        return None
+    protocol, position = unpack_varint(body)
+    _, position = unpack_string(body, position)
+    next_state, _ = unpack_varint(body, position + 2)  # skip the port
+
+    if next_state == STATUS:
+        packet_id, _ = await read_packet(reader)
+        if packet_id != 0x00:
+            return None
+        status = {
+            "version": {"name": version, "protocol": protocol},
+            "players": {"max": 0, "online": 0},
+            "description": {"text": description},
+        }
+        writer.write(packet(0x00, string(json.dumps(status))))
+        await writer.drain()
+        try:
+            packet_id, payload = await read_packet(reader)
+        except asyncio.IncompleteReadError:
+            return None
+        if packet_id == 0x01:
+            writer.write(packet(0x01, payload[:8]))
+            await writer.drain()
+        return None
+
+    if next_state in (LOGIN, TRANSFER):
+        packet_id, body = await read_packet(reader)
+        name = unpack_string(body)[0] if packet_id == 0x00 else ""
+        writer.write(packet(0x00, string(json.dumps({"text": kick}))))
+        await writer.drain()
+        return name or "A player"
+    return None
+
+
+def _handshake(host: str, port: int, next_state: int, protocol: int) -> bytes:
+    return packet(0x00, varint(protocol) + string(host) + port.to_bytes(2, "big") + varint(next_state))
+
+
+async def query_status(host: str, port: int, protocol: int = 767, timeout: float = 5.0) -> dict:
+    """Ping a server like the server list does and return its status."""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(_handshake(host, port, STATUS, protocol) + packet(0x00))
+        await writer.drain()
+        _, body = await asyncio.wait_for(read_packet(reader), timeout)
+        return json.loads(unpack_string(body)[0])
+    finally:
+        writer.close()
+
+
+async def attempt_login(host: str, port: int, name: str, protocol: int = 767, timeout: float = 5.0) -> str:
+    """Start logging in as `name` and return what the server answers, as text."""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(_handshake(host, port, LOGIN, protocol) + packet(0x00, string(name) + bytes(16)))
+        await writer.drain()
+        packet_id, body = await asyncio.wait_for(read_packet(reader), timeout)
+        if packet_id != 0x00:
+            return f"(packet {packet_id:#04x})"
+        return json.loads(unpack_string(body)[0]).get("text", "")
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        sys.exit("usage: minecraft_protocol.py HOST PORT [PLAYER]  (with PLAYER, attempt a login)")
+    target_host, target_port = sys.argv[1], int(sys.argv[2])
+    if len(sys.argv) > 3:
+        print(asyncio.run(attempt_login(target_host, target_port, sys.argv[3])))
+    else:
+        print(json.dumps(asyncio.run(query_status(target_host, target_port)), indent=2))
@@ -0,0 +1,164 @@
+import time
+import asyncio
+
+from collections import deque
+from dataclasses import dataclass
+
+from loop_monitor import monitor
+
+# What the reader does when the interpret stage falls behind and its queue is full.
+OVERFLOW_DROP = "drop"    # drop lines that can't produce a critical event
+OVERFLOW_BLOCK = "block"  # wait for room, never dropping anything
+
+_END = None
+
+
+@dataclass
+class PipelineStats:
+    """Line counters of one instance's output pipeline."""
+    read: int = 0
+    persisted: int = 0
+    interpreted: int = 0
+    dropped: int = 0
+
+
+class OutputPipeline:
+    """
+    Carries an instance's console output through three stages joined by bounded queues:
+    the reader tails the spool and splits it into batches of lines, the persist stage writes
+    every line to the log sink, and the interpret stage runs the rules and handles events.
+    The server writes to a spool file, so however far behind the stages fall the child never
+    blocks on its output. A slow Discord call only holds up the interpret stage; once its queue
+    is full, the overflow policy either makes the reader wait or drops the lines that can't
+    produce a critical event. Persistence never drops anything.
+    The spool offset only moves past a batch once both stages are done with it, so a restarted
+    bot resumes without losing lines. The last `tail_size` persisted lines are kept in `tail`,
+    and `observe(lines)` sees every batch as soon as it is read. The interpret stage times
+    every line it matches ("output.line", handling included) and every event it handles
+    ("output.event") in the loop monitor.
+    """
+
+    def __init__(self, batches, sink, match, handle, is_critical, save_offset, offset: int,
+                 policy: str = OVERFLOW_DROP, persist_queue_size: int = 256, event_queue_size: int = 64,
+                 save_interval: float = 1.0, tail_size: int = 0, observe=None, label: str = ""):
+        if policy not in (OVERFLOW_DROP, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self._batches = batches
+        self._sink = sink
+        self._match = match
+        self._handle = handle
+        self._is_critical = is_critical
+        self._save_offset = save_offset
+        self._policy = policy
+        self._save_interval = save_interval
+        self._observe = observe
+        self._label = label
+        self._persist_queue = asyncio.Queue(persist_queue_size)
+        self._event_queue = asyncio.Queue(event_queue_size)
+        self._persisted_offset = offset
+        self._interpreted_offset = offset
+        # End of the newest batch dropped entirely, reached once the queued batches before it are done.
+        self._skipped_offset = offset
+        self._saved_at = 0.0
+        self._committed = asyncio.Event()
+        self.offset = offset
+        self.stats = PipelineStats()
+        self.tail = deque(maxlen=tail_size)
+
+    @property
+    def event_queue_depth(self) -> int:
+        return self._event_queue.qsize()
+
+    async def run(self):
+        await asyncio.gather(self._read(), self._persist(), self._interpret())
+        self._interpreted_offset = max(self._interpreted_offset, self._skipped_offset)
+        self._commit(force=True)
+
+    async def _read(self):
+        try:
+            async for lines, offset in self._batches:
+                lines = [line.strip() for line in lines]
+                self.stats.read += len(lines)
+                if self._observe is not None:
+                    self._observe(lines)
+                await self._persist_queue.put((lines, offset))
+                await self._offer(lines, offset)
+        except Exception as e:
+            print(f"[{self._label}] ❌ Output reader failed: {e}")
+        finally:
+            await self._persist_queue.put(_END)
+            await self._event_queue.put(_END)
+
+    async def _offer(self, lines: list, offset: int):
+        if self._policy == OVERFLOW_BLOCK or not self._event_queue.full():
+            await self._event_queue.put((lines, offset))
+            return
+        kept = [line for line in lines if self._is_critical(line)]
+        self.stats.dropped += len(lines) - len(kept)
+        if not kept:
+            self._skipped_offset = offset
+            return
+        # Critical lines wait for room rather than being lost.
+        await self._event_queue.put((kept, offset))
+
+    async def _persist(self):
+        while (batch := await self._persist_queue.get()) is not _END:
+            lines, offset = batch
+            try:
+                for line in lines:
+                    self._sink.write(line)
+            except Exception as e:
+                print(f"[{self._label}] ❌ Failed to write log: {e}")
+            self.stats.persisted += len(lines)
+            self.tail.extend(lines)
+            self._persisted_offset = offset
+            self._commit()
+
+    async def _interpret(self):
+        while (batch := await self._event_queue.get()) is not _END:
+            lines, offset = batch
+            for line in lines:
+                started = time.perf_counter()
+                event = self._match(line)
+                if event:
+                    try:
+                        await self._handle(event)
+                    except Exception as e:
+                        print(f"[{self._label}] ❌ Failed to handle {type(event).__name__}: {e}")
+                    monitor.observe("output.event", time.perf_counter() - started)
+                monitor.observe("output.line", time.perf_counter() - started)
+            self.stats.interpreted += len(lines)
+            self._interpreted_offset = offset
+            if self._event_queue.empty():
+                self._interpreted_offset = max(offset, self._skipped_offset)
+            self._commit()
+
+    async def wait_committed(self, offset: int, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for both stages to be done with everything before `offset`."""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.offset < offset:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return False
+            self._committed.clear()
+            try:
+                await asyncio.wait_for(self._committed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def rebase(self):
+        """
+        Start the offsets over at 0 after the spool was truncated, and save that right away.
+        Only valid once everything read so far has been committed.
+        """
+        self._persisted_offset = self._interpreted_offset = self._skipped_offset = 0
+        self._commit(force=True)
+
+    def _commit(self, force: bool = False):
+        self.offset = min(self._persisted_offset, self._interpreted_offset)
+        self._committed.set()
+        now = time.monotonic()
+        if force or now - self._saved_at >= self._save_interval:
+            self._saved_at = now
+            self._save_offset(self.offset)
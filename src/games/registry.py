@@ -0,0 +1,34 @@
+import importlib
+
+# Game name -> "module:Class" of its server. Modules are imported the first time a game is used,
+# so registering a game costs nothing at startup.
+GAMES = {
+    "minecraft": "games.minecraft:MinecraftServer",
+    "valheim": "games.valheim:ValheimServer",
+    "dst": "games.DontStarveTogether:DontStarveTogetherServer",
+}
+
+_classes = {}
+
+
+def register(name: str, target: str):
+    """Register (or replace) the server class of a game as "module:Class"."""
+    name = name.lower()
+    if GAMES.get(name) != target:
+        GAMES[name] = target
+        _classes.pop(name, None)
+
+
+def is_registered(name: str) -> bool:
+    return name.lower() in GAMES
+
+
+def game_class(name: str) -> type:
+    name = name.lower()
+    cls = _classes.get(name)
+    if cls is None:
+        if name not in GAMES:
+            raise KeyError(f"No game named {name} is registered.")
+        module_name, _, class_name = GAMES[name].partition(":")
+        cls = _classes[name] = getattr(importlib.import_module(module_name), class_name)
+    return cls
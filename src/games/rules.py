@@ -0,0 +1,186 @@
+import re
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+@dataclass(frozen=True)
+class ServerEvent:
+    """Base class for events parsed from a server's console output."""
+
+
+@dataclass(frozen=True)
+class ServerReady(ServerEvent):
+    code: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class PlayerJoined(ServerEvent):
+    player: Optional[str] = None
+    count: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class PlayerLeft(ServerEvent):
+    player: Optional[str] = None
+    count: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class ServerStopping(ServerEvent):
+    pass
+
+
+@dataclass(frozen=True)
+class Crashed(ServerEvent):
+    reason: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class SaveStarted(ServerEvent):
+    pass
+
+
+@dataclass(frozen=True)
+class WorldSaved(ServerEvent):
+    # How long the save took, for games that log it.
+    duration_ms: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class TickLag(ServerEvent):
+    """The server reported falling behind its tick rate."""
+    ms: int
+    ticks: int = 0
+
+
+@dataclass(frozen=True)
+class BootMilestone(ServerEvent):
+    phase: str
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    One row of a game's rule table.
+    `extractor` turns the regex match into keyword arguments for `event`; by default the
+    named groups are passed through. `keyword` is a literal every matching line must contain
+    and is derived from the pattern when omitted.
+    """
+    pattern: str
+    event: type
+    extractor: Optional[Callable[[re.Match], dict]] = None
+    keyword: Optional[str] = None
+
+
+def milestone(pattern: str, phase: str) -> Rule:
+    """A rule marking a boot phase as passed when `pattern` shows up in the console."""
+    return Rule(pattern, BootMilestone, lambda found: {"phase": phase})
+
+
+class RuleEngine:
+    """
+    Compiles a rule table once and matches raw output lines against it.
+    Lines are checked against a single combined bytes regex of the rule keywords before
+    they are decoded, so the common case (a line no rule cares about) never touches UTF-8
+    decoding or the per-rule patterns. The first rule that matches wins.
+    """
+
+    def __init__(self, rules: list):
+        self._rules = []
+        keywords = []
+        for rule in rules:
+            keyword = rule.keyword if rule.keyword is not None else _required_literal(rule.pattern)
+            keyword = keyword.encode("utf-8") if keyword else None
+            self._rules.append((keyword, re.compile(rule.pattern), rule.event, rule.extractor))
+            keywords.append(keyword)
+
+        if rules and all(keywords):
+            unique = sorted(set(keywords), key=len, reverse=True)
+            self._prefilter = re.compile(b"|".join(re.escape(k) for k in unique)).search
+        else:
+            # A rule without a usable literal has to see every line.
+            self._prefilter = None
+
+    def detector(self, event_types: tuple) -> Callable[[bytes], bool]:
+        """
+        A cheap check of whether a raw line could produce one of `event_types`, from the rule
+        keywords alone. It may say yes to lines that end up matching nothing, never the reverse.
+        """
+        keywords = [keyword for keyword, regex, event, extractor in self._rules if issubclass(event, event_types)]
+        if not keywords:
+            return lambda raw: False
+        if not all(keywords):
+            return lambda raw: True
+        unique = sorted(set(keywords), key=len, reverse=True)
+        search = re.compile(b"|".join(re.escape(k) for k in unique)).search
+        return lambda raw: search(raw) is not None
+
+    def match(self, raw: bytes) -> Optional[ServerEvent]:
+        if self._prefilter is not None:
+            if not self._prefilter(raw):
+                return None
+        elif not self._rules:
+            return None
+
+        line = raw.decode("utf-8", errors="replace")
+        for keyword, regex, event, extractor in self._rules:
+            if keyword is not None and keyword not in raw:
+                continue
+            found = regex.search(line)
+            if found:
+                fields = extractor(found) if extractor else found.groupdict()
+                return event(**fields)
+        return None
+
+
+def _required_literal(pattern: str) -> Optional[str]:
+    """
+    Return the longest run of literal text that every match of `pattern` must contain,
+    or None when one can't be determined safely (alternation, inline flags).
+    Only characters outside groups and character classes are considered.
+    """
+    if "|" in pattern or pattern.startswith("(?") and not pattern.startswith(("(?:", "(?P", "(?=", "(?!", "(?<")):
+        return None
+
+    best, current = "", ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            escaped = pattern[i + 1:i + 2]
+            i += 2
+            if depth == 0 and escaped and not escaped.isalnum():
+                current += escaped
+                continue
+            best, current = max(best, current, key=len), ""
+            continue
+        if c == "[":
+            best, current = max(best, current, key=len), ""
+            i += 2 if pattern[i + 1:i + 2] == "]" else 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c in "?*{":
+            # The preceding character may be optional; don't count on it.
+            if depth == 0:
+                current = current[:-1]
+            if c == "{":
+                i = pattern.find("}", i) if "}" in pattern[i:] else len(pattern) - 1
+        elif depth == 0 and c == "+":
+            best, current = max(best, current, key=len), ""
+        elif depth == 0 and c not in ".^$":
+            current += c
+            i += 1
+            continue
+        best, current = max(best, current, key=len), ""
+        i += 1
+
+    best = max(best, current, key=len)
+    return best or None
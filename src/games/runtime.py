@@ -0,0 +1,81 @@
+import time
+import asyncio
+
+
+class InstanceRuntime:
+    """State of one running instance of a game: its process, log sink, timer and players."""
+
+    def __init__(self, game: str, name: str, config: dict, channel):
+        self.game = game
+        self.name = name
+        self.config = config
+        self.channel = channel
+        self.process = None
+        # Process tree operations (process_tree.LocalTree or node_client.RemoteTree), and the
+        # node agent the instance runs on, None for this host.
+        self.tree = None
+        self.node = None
+        self.exit_task = None
+        self.output_task = None
+        self.pipeline = None
+        self.log_sink = None
+        self.spool_path = None
+        self.log_offset = 0
+        # scheduler.Timer for the shutdown or standby countdown, and when it fires.
+        self.timer = None
+        self.timer_deadline = None
+        self.start_time = None
+        self.ready = False
+        self.adopted = False
+        self.standby_since = None
+        self.boot = None
+        self.stop_outcome = None
+        self.stop_requested = False
+        self.stopping_seen = False
+        self.crash_reason = None
+        self.world_saved = asyncio.Event()
+        self.save_started = None
+        self.governor = None
+        self.governor_task = None
+        # games.console.ConsoleChannel to the server, and the task checking its player list.
+        self.console = None
+        self.roster_task = None
+        # Names of the players online, as far as the console has told.
+        self.players = set()
+        self._player_count = 0
+
+    @property
+    def key(self) -> tuple:
+        return (self.game, self.name)
+
+    @property
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def in_standby(self) -> bool:
+        return self.standby_since is not None
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    @property
+    def player_count(self) -> int:
+        return self._player_count
+
+    @player_count.setter
+    def player_count(self, value: int):
+        self._player_count = max(0, value)
+
+    def mark_started(self):
+        self.start_time = time.time()
+
+    @property
+    def uptime(self) -> str:
+        if not self.start_time:
+            return "Not running"
+        elapsed = int(time.time() - self.start_time)
+        h, m = divmod(elapsed, 3600)
+        m, s = divmod(m, 60)
+        return f"{h:02}:{m:02}:{s:02}"
@@ -0,0 +1,87 @@
+# instance_config.py
+
+import os
+import json
+import asyncio
+import tomllib
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_PATH = os.path.join(PROJECT_ROOT, "instances.toml")
+
+
+def default_path() -> str:
+    return os.getenv("INSTANCES_CONFIG") or DEFAULT_PATH
+
+
+def load(path: str) -> dict:
+    """
+    Read the instance definitions: {game: {"class": "module:Class" or None, "instances": {name: config}}}.
+    TOML, or JSON when the file ends in .json. Each top-level table is a game; its sub-tables
+    are instances. String values may reference environment variables as $NAME or ${NAME}.
+    """
+    with open(path, "rb") as f:
+        data = json.load(f) if path.endswith(".json") else tomllib.load(f)
+
+    games = {}
+    for game, table in data.items():
+        if not isinstance(table, dict):
+            raise ValueError(f"{path}: '{game}' must be a table of instances")
+        instances = {
+            name: {key: _expand(value) for key, value in config.items()}
+            for name, config in table.items()
+            if isinstance(config, dict)
+        }
+        games[game.lower()] = {"class": table.get("class"), "instances": instances}
+    return games
+
+
+def _expand(value):
+    return os.path.expandvars(value) if isinstance(value, str) else value
+
+
+class ConfigWatcher:
+    """
+    Polls the config file and calls `on_change(config)` with the freshly parsed definitions
+    whenever it is modified. A file that fails to parse is reported and otherwise ignored, so
+    a half-saved edit never takes instances away.
+    """
+
+    def __init__(self, path: str, on_change, interval: float = 2.0):
+        self._path = path
+        self._on_change = on_change
+        self._interval = interval
+        self._signature = self._stat()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self._path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+            self._signature = signature
+            try:
+                config = load(self._path)
+            except Exception as e:
+                print(f"[config] ⚠️ Not reloading {self._path}: {e}")
+                continue
+            try:
+                self._on_change(config)
+            except Exception as e:
+                print(f"[config] ❌ Failed to apply {self._path}: {e}")
@@ -0,0 +1,186 @@
+# log_search.py
+
+import os
+import re
+import gzip
+import mmap
+import time
+import bisect
+import datetime
+
+from log_sink import read_index, segment_name, segment_started_at
+
+# Lines written within this many seconds of a search window's edges may be included, since
+# the sink buffers lines for up to its flush interval before they get an index record.
+INDEX_SLACK = 5.0
+
+
+class Segment:
+    """One file of an instance's log, plain or gzipped, and its sparse index if it has one."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = segment_name(path)
+        self.compressed = path.endswith(".gz")
+        self.index = read_index(path)
+        self.started_at = self.index[0][0] if self.index else segment_started_at(path)
+
+    @property
+    def ended_at(self) -> float:
+        """When the segment was last written to, as far as can be told."""
+        if self.index and self.compressed:
+            return self.index[-1][0]
+        return os.path.getmtime(self.path)
+
+    def raw_range(self, since: float = None, until: float = None) -> tuple:
+        """
+        (start, end) offsets in the uncompressed log holding every line written between
+        `since` and `until`; end is None for "to the end".
+        """
+        if not self.index:
+            return 0, None
+        times = [record[0] for record in self.index]
+        start = end = None
+        if since is not None:
+            position = bisect.bisect_right(times, since - INDEX_SLACK) - 1
+            start = self.index[max(position, 0)][1]
+        if until is not None:
+            position = bisect.bisect_left(times, until + INDEX_SLACK)
+            end = self.index[position][1] if position < len(self.index) else None
+        return start or 0, end
+
+    def read(self, start: int = 0, end: int = None):
+        """
+        The log from `start` to `end` and the offset it begins at, which may be a little before
+        `start` for a gzipped segment. Plain segments come back memory-mapped; close the map.
+        """
+        if not self.compressed:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b"", 0
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), 0
+        if not self.index:
+            with gzip.open(self.path, "rb") as f:
+                return f.read(), 0
+        # Decompress just the members covering the range.
+        raw_offsets = [record[1] for record in self.index]
+        first = max(bisect.bisect_right(raw_offsets, start) - 1, 0)
+        last = len(self.index) - 1 if end is None else bisect.bisect_left(raw_offsets, end)
+        last = min(max(last, first + 1), len(self.index) - 1)
+        with open(self.path, "rb") as f:
+            f.seek(self.index[first][2])
+            stored = f.read(max(self.index[last][2] - self.index[first][2], 0))
+        return gzip.decompress(stored) if stored else b"", self.index[first][1]
+
+
+def segments(directory: str) -> list:
+    """The log segments in `directory`, oldest first."""
+    try:
+        paths = [entry.path for entry in os.scandir(directory) if entry.name.endswith((".log", ".log.gz"))]
+    except FileNotFoundError:
+        return []
+    return [Segment(path) for path in sorted(paths, key=segment_name)]
+
+
+def tail(directory: str, count: int) -> list:
+    """The last `count` lines of the instance's log, across segments if need be."""
+    lines = []
+    for segment in reversed(segments(directory)):
+        data = b""
+        if segment.compressed and segment.index:
+            # Decompress members from the end until they hold enough lines.
+            for record in reversed(segment.index[:-1]):
+                data, _ = segment.read(record[1])
+                if data.count(b"\n") >= count - len(lines):
+                    break
+        else:
+            data, _ = segment.read()
+        try:
+            end = len(data)
+            if data[end - 1:end] == b"\n":
+                end -= 1
+            while len(lines) < count and end > 0:
+                newline = data.rfind(b"\n", 0, end)
+                lines.append(bytes(data[newline + 1:end]))
+                end = max(newline, 0)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        if len(lines) >= count:
+            break
+    return [line.decode("utf-8", errors="replace") for line in reversed(lines)]
+
+
+def search(directory: str, pattern: str, since: float = None, until: float = None, max_bytes: int = 5 * 1024 * 1024) -> tuple:
+    """
+    Lines of the instance's log matching `pattern` (a regex, or literal text if it isn't one,
+    case-insensitive) written between `since` and `until`, oldest first. Only segments and
+    indexed stretches of them that overlap the window are read. Returns the lines and whether
+    the result was cut off at `max_bytes`.
+    """
+    try:
+        regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE)
+    except re.error:
+        regex = re.compile(re.escape(pattern.encode("utf-8")), re.IGNORECASE)
+
+    found, size = [], 0
+    for segment in segments(directory):
+        if until is not None and segment.started_at is not None and segment.started_at > until + INDEX_SLACK:
+            break
+        if since is not None and segment.ended_at < since - INDEX_SLACK:
+            continue
+        start, end = segment.raw_range(since, until)
+        data, base = segment.read(start, end)
+        try:
+            limit = len(data) if end is None else min(len(data), end - base)
+            position = start - base
+            for match in regex.finditer(data, position, limit):
+                if match.start() < position:
+                    continue
+                line_start = data.rfind(b"\n", 0, match.start()) + 1
+                line_end = data.find(b"\n", match.end())
+                line_end = len(data) if line_end < 0 else line_end
+                line = bytes(data[line_start:line_end])
+                found.append(line.decode("utf-8", errors="replace"))
+                size += len(line) + 1
+                if size >= max_bytes:
+                    return found, True
+                # One line per match, however many matches it holds.
+                position = line_end
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    return found, False
+
+
+def parse_when(text: str, now: float = None):
+    """
+    A point in time from "21:30", "yesterday 21:30", "2026-10-16 21:30" or "2h" / "30m" /
+    "1d" ago, in local time; None for an empty string. Raises ValueError otherwise.
+    """
+    text = (text or "").strip().lower()
+    if not text:
+        return None
+    now = now or time.time()
+    relative = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smhd])", text)
+    if relative:
+        return now - float(relative[1]) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[relative[2]]
+    today = datetime.datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    for prefix, day in (("yesterday ", today - datetime.timedelta(days=1)), ("today ", today), ("", None)):
+        if not text.startswith(prefix):
+            continue
+        clock = text[len(prefix):]
+        for fmt in ("%H:%M", "%H:%M:%S"):
+            try:
+                parsed = datetime.datetime.strptime(clock, fmt).time()
+            except ValueError:
+                continue
+            at = datetime.datetime.combine(day or today, parsed).timestamp()
+            # A bare time later than now means that time yesterday.
+            return at - 86400 if day is None and at > now else at
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"can't read a time from '{text}'")
@@ -0,0 +1,294 @@
+# log_sink.py
+
+import os
+import time
+import gzip
+import shutil
+import struct
+import asyncio
+import datetime
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Where console logs go, one directory per instance; the LOG_DIR environment variable moves it elsewhere.
+LOG_DIR = os.getenv("LOG_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "logs"))
+
+# Rotated segments are compressed off the event loop, one at a time.
+_compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+
+
+# Sparse index kept next to each segment as "<segment>.idx": records of (wall-clock time, offset
+# in the uncompressed log, offset in the file as stored). Everything before an offset was
+# written by the recorded time. A gzipped segment is a series of gzip members, one starting
+# at each stored offset, so any part of it can be decompressed without the rest.
+INDEX_RECORD = struct.Struct("<dQQ")
+INDEX_SUFFIX = ".idx"
+
+
+def instance_log_dir(game: str, instance: str) -> str:
+    return os.path.join(LOG_DIR, game, instance.lower().replace(" ", "_"))
+
+
+def segment_name(path: str) -> str:
+    """A log segment's name, the same before and after it is gzipped."""
+    name = os.path.basename(path)
+    return name[:-len(".gz")] if name.endswith(".gz") else name
+
+
+def segment_started_at(path: str):
+    """When the sink opened a segment, from its file name, or None."""
+    try:
+        return datetime.datetime.strptime(segment_name(path)[:19], "%Y-%m-%d_%H-%M-%S").timestamp()
+    except ValueError:
+        return None
+
+
+def read_index(path: str) -> list:
+    """The index records of the segment at `path`, or an empty list if it has none."""
+    try:
+        with open(path + INDEX_SUFFIX, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % INDEX_RECORD.size
+    return list(INDEX_RECORD.iter_unpack(data[:usable]))
+
+
+class LogSink:
+    """
+    Buffered writer for a server's console output.
+    Lines are batched in memory and written out when the buffer grows past `buffer_size`
+    or every `flush_interval` seconds. Files are rotated by size or age, rotated
+    segments are gzipped on a worker thread and old segments are pruned by the retention policy.
+    A sparse index of write times to offsets is appended as the buffer is flushed, at most
+    every `index_interval` seconds or `index_bytes` bytes, so log_search can go straight to a
+    time range or the end of a segment.
+    """
+
+    # Gzip members of a compressed segment hold at least this much of the log.
+    MEMBER_BYTES = 256 * 1024
+
+    def __init__(
+        self,
+        directory: str,
+        flush_every_line: bool = False,
+        buffer_size: int = 64 * 1024,
+        flush_interval: float = 2.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_age: float = 6 * 3600,
+        retention_days: float = 14,
+        retention_bytes: int = 2 * 1024 * 1024 * 1024,
+        index_interval: float = 10.0,
+        index_bytes: int = 1024 * 1024,
+    ):
+        self._directory = directory
+        self._flush_every_line = flush_every_line
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._retention_days = retention_days
+        self._retention_bytes = retention_bytes
+        self._index_interval = index_interval
+        self._index_bytes = index_bytes
+
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._file = None
+        self._path = None
+        self._file_bytes = 0
+        self._opened_at = 0.0
+        self._flush_task = None
+        self._index = None
+        self._indexed_at = 0.0
+        self._indexed_bytes = 0
+
+    @classmethod
+    def from_instance_config(cls, directory: str, instance_config: dict):
+        """Build a sink using the optional `log_*` keys of an instance config."""
+        options = {
+            "flush_every_line": instance_config.get("log_flush_every_line"),
+            "max_bytes": instance_config.get("log_max_bytes"),
+            "max_age": instance_config.get("log_max_age"),
+            "retention_days": instance_config.get("log_retention_days"),
+            "retention_bytes": instance_config.get("log_retention_bytes"),
+        }
+        return cls(directory, **{k: v for k, v in options.items() if v is not None})
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def open(self):
+        os.makedirs(self._directory, exist_ok=True)
+        self._open_segment()
+        if not self._flush_every_line and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    def write(self, line: bytes):
+        data = line + b"\n"
+        self._buffer.append(data)
+        self._buffered_bytes += len(data)
+        if self._flush_every_line or self._buffered_bytes >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer or not self._file:
+            return
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_bytes = 0
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        now = time.time()
+        if now - self._indexed_at >= self._index_interval or self._file_bytes - self._indexed_bytes >= self._index_bytes:
+            self._write_index(now)
+        if self._file_bytes >= self._max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        if not self._file:
+            return
+        self._close_segment()
+        self._open_segment()
+
+    def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
+        if self._file:
+            self._write_index(time.time())
+            self._file.close()
+            self._file = None
+            self._index.close()
+            self._index = None
+        _compressor.submit(self._apply_retention)
+
+    def compact(self):
+        """
+        Gzip every plain segment in the directory but the one being written, such as the last
+        segment of each run, left plain so it stays quick to tail, then apply retention.
+        Runs on the compressor thread; returns a future of the number of segments compressed.
+        """
+        return _compressor.submit(self._compact)
+
+    def _compact(self) -> int:
+        live = self._path if self._file else None
+        try:
+            paths = sorted(
+                entry.path for entry in os.scandir(self._directory)
+                if entry.is_file() and entry.name.endswith(".log") and entry.path != live
+            )
+        except FileNotFoundError:
+            return 0
+        for path in paths:
+            self._compress_and_prune(path)
+        self._apply_retention()
+        return len(paths)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            self.flush()
+            if self._file and time.monotonic() - self._opened_at >= self._max_age:
+                self.rotate()
+
+    def _open_segment(self):
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = os.path.join(self._directory, f"{timestamp}.log")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self._directory, f"{timestamp}_{suffix}.log")
+            suffix += 1
+        self._path = path
+        self._file = open(path, "ab")
+        self._file_bytes = 0
+        self._opened_at = time.monotonic()
+        self._index = open(path + INDEX_SUFFIX, "ab", buffering=0)
+        self._indexed_bytes = -1
+        self._write_index(time.time())
+
+    def _write_index(self, now: float):
+        if self._index is None or self._file_bytes == self._indexed_bytes:
+            return
+        self._index.write(INDEX_RECORD.pack(now, self._file_bytes, self._file_bytes))
+        self._indexed_at = now
+        self._indexed_bytes = self._file_bytes
+
+    def _close_segment(self):
+        self.flush()
+        self._write_index(time.time())
+        self._file.close()
+        self._file = None
+        self._index.close()
+        self._index = None
+        _compressor.submit(self._compress_and_prune, self._path)
+
+    def _compress_and_prune(self, path: str):
+        if not os.path.exists(path):
+            return  # already compressed by compact()
+        try:
+            index = read_index(path)
+            if index:
+                self._compress_indexed(path, index)
+            else:
+                with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+            os.remove(path)
+            if index:
+                os.remove(path + INDEX_SUFFIX)
+        except Exception as e:
+            print(f"[log_sink] ⚠️ Could not compress {path}: {e}")
+        self._apply_retention()
+
+    def _compress_indexed(self, path: str, index: list):
+        """Gzip a segment as one member per stretch of at least MEMBER_BYTES, indexing each."""
+        size = os.path.getsize(path)
+        starts = []
+        for at, offset, _ in index:
+            if offset < size and (not starts or offset - starts[-1][1] >= self.MEMBER_BYTES):
+                starts.append((at, offset))
+        ends = [offset for _, offset in starts[1:]] + [size]
+        records = []
+        with open(path, "rb") as src, open(f"{path}.gz", "wb") as dst:
+            for (at, offset), end in zip(starts, ends):
+                records.append(INDEX_RECORD.pack(at, offset, dst.tell()))
+                src.seek(offset)
+                dst.write(gzip.compress(src.read(end - offset)))
+            # The end of the log, so readers know where the last member stops.
+            records.append(INDEX_RECORD.pack(index[-1][0], size, dst.tell()))
+        with open(f"{path}.gz{INDEX_SUFFIX}", "wb") as f:
+            f.write(b"".join(records))
+
+    def _apply_retention(self):
+        try:
+            segments = []
+            for entry in os.scandir(self._directory):
+                if entry.is_file() and entry.name.endswith((".log", ".log.gz")) and entry.path != self._path:
+                    stat = entry.stat()
+                    segments.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return
+
+        segments.sort()
+        cutoff = time.time() - self._retention_days * 86400
+        total = sum(size for _, size, _ in segments)
+        for mtime, size, path in segments:
+            if mtime >= cutoff and total <= self._retention_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                print(f"[log_sink] ⚠️ Could not remove old log {path}: {e}")
+                continue
+            try:
+                os.remove(path + INDEX_SUFFIX)
+            except OSError:
+                pass
@@ -0,0 +1,194 @@
+# loop_monitor.py
+
+import os
+import sys
+import json
+import time
+import bisect
+import asyncio
+import threading
+import traceback
+
+from collections import deque
+
+# Upper bounds of the histogram buckets, in seconds; anything slower lands in a final open bucket.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Counts of durations per bucket, with their total and the slowest one seen."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given quantile; the maximum for the open bucket."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip((*BUCKETS, "inf"), self.counts) if count},
+        }
+
+
+class _Span:
+    __slots__ = ("_monitor", "_name", "_started")
+
+    def __init__(self, monitor, name: str):
+        self._monitor = monitor
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._monitor.observe(self._name, time.perf_counter() - self._started)
+        return False
+
+
+class LoopMonitor:
+    """
+    Watches how responsive the event loop is and times named spans of the bot's work.
+    A probe task sleeps `probe_interval` at a time and records how late it wakes up as
+    "loop.lag". A watchdog thread pings the loop every half `slow_threshold`; when a ping goes
+    unanswered for longer than that, the loop is stuck in one step, so the watchdog captures
+    the loop thread's stack there and then, and records the stall once the loop answers.
+    Durations are aggregated into fixed-bucket histograms keyed by span name; the last
+    `keep_slow` stalls are kept with their stacks.
+    """
+
+    def __init__(self, probe_interval: float = 0.5, slow_threshold: float = 0.1, keep_slow: int = 20):
+        self._probe_interval = probe_interval
+        self._slow_threshold = slow_threshold
+        self.histograms = {}
+        self.slow_steps = deque(maxlen=keep_slow)
+        self.started_at = time.time()
+        self._loop = None
+        self._loop_thread = None
+        self._probe_task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    def observe(self, name: str, seconds: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def span(self, name: str) -> _Span:
+        """Context manager timing the block it wraps, awaits included, as `name`."""
+        return _Span(self, name)
+
+    def start(self):
+        if self._probe_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._probe_task = asyncio.create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        if self._probe_task:
+            self._probe_task.cancel()
+            self._probe_task = None
+        self._stopped.set()
+        self._watchdog = None
+
+    async def _probe(self):
+        while True:
+            before = self._loop.time()
+            await asyncio.sleep(self._probe_interval)
+            self.observe("loop.lag", max(0.0, self._loop.time() - before - self._probe_interval))
+
+    def _watch(self):
+        answered = threading.Event()
+        while not self._stopped.wait(self._slow_threshold / 2):
+            answered.clear()
+            sent = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                return  # the loop is closed
+            if answered.wait(self._slow_threshold):
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame, limit=25)) if frame is not None else ""
+            while not answered.wait(1.0):
+                if self._stopped.is_set():
+                    return
+            stalled = time.perf_counter() - sent
+            # Recorded on the loop's own thread, so readers never see the histograms change under them.
+            try:
+                self._loop.call_soon_threadsafe(self._record_stall, stalled, stack)
+            except RuntimeError:
+                return
+
+    def _record_stall(self, seconds: float, stack: str):
+        self.observe("loop.stall", seconds)
+        self.slow_steps.append({"at": time.time(), "duration": seconds, "stack": stack})
+
+    def summary(self, stacks: int = 1) -> str:
+        if not self.histograms:
+            return ""
+        lines = [f"⏱️ **Latency since <t:{int(self.started_at)}:R>** (p50 / p95 / max, count)"]
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(
+                f"`{name}` {_ms(histogram.quantile(0.5))} / {_ms(histogram.quantile(0.95))} / "
+                f"{_ms(histogram.max)} · {histogram.count:,}"
+            )
+        for step in list(self.slow_steps)[-stacks:] if stacks else []:
+            frames = step["stack"].strip().splitlines()[-6:]
+            lines.append(f"🐢 Loop blocked {_ms(step['duration'])} <t:{int(step['at'])}:R>:\n```\n" + "\n".join(frames) + "\n```")
+        return "\n".join(lines)
+
+    def snapshot(self) -> dict:
+        """Every histogram and the kept stalls, copied; take it on the loop's thread."""
+        return {
+            "started_at": self.started_at,
+            "taken_at": time.time(),
+            "slow_threshold": self._slow_threshold,
+            "histograms": {name: histogram.as_dict() for name, histogram in sorted(self.histograms.items())},
+            "slow_steps": list(self.slow_steps),
+        }
+
+    def dump(self, path: str, snapshot: dict = None) -> str:
+        """Write a snapshot, taken now unless one is given, to `path` as JSON and return the path."""
+        snapshot = snapshot or self.snapshot()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2)
+        return path
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}ms" if seconds < 10 else f"{seconds:.1f}s"
+
+
+monitor = LoopMonitor(slow_threshold=float(os.getenv("LOOP_SLOW_THRESHOLD_MS") or 100) / 1000)
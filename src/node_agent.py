@@ -0,0 +1,273 @@
+# node_agent.py
+#
+# Runs game servers for the bot on another machine. The bot connects, places instances here
+# (see node_client.py) and drives them through the same operations it uses locally: start,
+# console input, signals to the process tree, output streaming and resource samples.
+#
+# Usage (from src/):
+#   python -m node_agent --name node-a --listen 0.0.0.0:7600 --token SECRET
+#   python -m node_agent --name test-1 --listen unix:/tmp/agent-1.sock --state-dir /tmp/agent-1
+#
+# Several agents can run on one machine, each with its own socket and state directory, to try
+# multi-node placement locally. The token can also come from NODE_AGENT_TOKEN; a TCP listener
+# refuses to start without one, since whoever connects can run commands on this machine.
+# The protocol is not encrypted: the token and console traffic cross the network in the clear.
+# The listener binds to loopback unless told otherwise; only listen on another address inside
+# a trusted network, or behind a TLS tunnel (stunnel, WireGuard, an SSH forward).
+
+import os
+import sys
+import hmac
+import time
+import signal
+import asyncio
+import argparse
+import psutil
+
+import process_tree
+from admission import HostStats
+from node_protocol import read_frame, write_frame, start_server, parse_address, ProtocolError
+
+# Output is sent in chunks of at most this many bytes.
+CHUNK_SIZE = 64 * 1024
+# Bounds of the delay between spool reads once a watcher has caught up.
+TAIL_MIN_INTERVAL = 0.05
+TAIL_MAX_INTERVAL = 0.5
+
+
+class ManagedProcess:
+    """A server process this agent started, or re-adopted after the agent itself restarted."""
+
+    def __init__(self, key: str, process, spool_path: str):
+        self.key = key
+        self.process = process
+        self.spool_path = spool_path
+        self.tree = process_tree.LocalTree(process.pid)
+        try:
+            self.create_time = psutil.Process(process.pid).create_time()
+        except psutil.Error:
+            self.create_time = time.time()
+        self.exit_task = asyncio.create_task(process.wait())
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def has_stdin(self) -> bool:
+        return self.process.stdin is not None and not self.process.stdin.is_closing()
+
+    def describe(self) -> dict:
+        return {
+            "pid": self.pid,
+            "create_time": self.create_time,
+            "stdin": self.has_stdin,
+            "alive": not self.exit_task.done(),
+            "returncode": self.process.returncode,
+        }
+
+
+class NodeAgent:
+    def __init__(self, name: str, state_dir: str, token: str = None):
+        self.name = name
+        self._token = token
+        self._spool_dir = os.path.join(state_dir, "spool")
+        os.makedirs(self._spool_dir, exist_ok=True)
+        self._processes = {}
+        self._sampler = process_tree.TreeSampler()
+
+    async def serve(self, address: str):
+        server = await start_server(self._handle_connection, address)
+        print(f"[agent {self.name}] Listening on {address}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername") or "unix socket"
+        tasks = set()
+        try:
+            header, _ = await read_frame(reader)
+            if header.get("op") != "hello" or not self._authenticated(header.get("token")):
+                write_frame(writer, {"id": header.get("id"), "ok": False, "error": "authentication failed"})
+                await writer.drain()
+                print(f"[agent {self.name}] ⚠️ Rejected connection from {peer}")
+                return
+            write_frame(writer, {"id": header.get("id"), "ok": True, "node": self.name, "pid": os.getpid()})
+            await writer.drain()
+            print(f"[agent {self.name}] 🔗 Bot connected from {peer}")
+
+            while True:
+                header, payload = await read_frame(reader)
+                # Requests run concurrently; some of them (wait_gone) take seconds.
+                task = asyncio.create_task(self._dispatch(writer, header, payload, tasks))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            print(f"[agent {self.name}] Bot disconnected ({peer})")
+
+    def _authenticated(self, token) -> bool:
+        if not self._token:
+            return True
+        # Constant-time, so the response time doesn't give away how much of the token was right.
+        return isinstance(token, str) and hmac.compare_digest(token.encode("utf-8"), self._token.encode("utf-8"))
+
+    async def _dispatch(self, writer, header: dict, payload: bytes, tasks: set):
+        handler = getattr(self, f"_op_{header.get('op')}", None)
+        try:
+            if handler is None:
+                raise ValueError(f"unknown operation {header.get('op')}")
+            result = await handler(header, payload, writer=writer, tasks=tasks)
+            response = {"id": header.get("id"), "ok": True, **(result or {})}
+        except Exception as e:
+            response = {"id": header.get("id"), "ok": False, "error": str(e)}
+        write_frame(writer, response)
+        await writer.drain()
+
+    def _get(self, pid: int) -> ManagedProcess:
+        managed = self._processes.get(pid)
+        if managed is None:
+            raise ValueError(f"no process {pid} on node {self.name}")
+        return managed
+
+    def _spool_path(self, key: str) -> str:
+        safe = key.lower().replace(" ", "_").replace(".", "_").replace("/", "_")
+        return os.path.join(self._spool_dir, f"{safe}.out")
+
+    async def _op_host(self, header, payload, **_):
+        stats = await HostStats.local()
+        return {"total_mb": stats.total_mb, "available_mb": stats.available_mb, "cores": stats.cores, "cpu_busy": stats.cpu_busy}
+
+    async def _op_start(self, header, payload, **_):
+        key = header["key"]
+        for managed in self._processes.values():
+            if managed.key == key and not managed.exit_task.done():
+                raise ValueError(f"{key} is already running (PID {managed.pid})")
+        spool_path = self._spool_path(key)
+        spool_fd = os.open(spool_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *header["argv"],
+                stdin=asyncio.subprocess.PIPE,
+                stdout=spool_fd,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+                cwd=header.get("cwd"),
+            )
+        finally:
+            os.close(spool_fd)
+        managed = ManagedProcess(key, process, spool_path)
+        self._processes[managed.pid] = managed
+        print(f"[agent {self.name}] ▶️ Started {key} (PID {managed.pid})")
+        return managed.describe()
+
+    async def _op_find(self, header, payload, **_):
+        """Look up a process the bot recorded, adopting it if this agent restarted since."""
+        pid = header["pid"]
+        managed = self._processes.get(pid)
+        if managed is None:
+            try:
+                proc = psutil.Process(pid)
+                same = proc.status() != psutil.STATUS_ZOMBIE and abs(proc.create_time() - header["create_time"]) < 1.0
+            except psutil.Error:
+                same = False
+            spool_path = self._spool_path(header["key"])
+            if not same or not os.path.exists(spool_path):
+                return {"pid": pid, "alive": False, "returncode": None, "stdin": False}
+            managed = ManagedProcess(header["key"], process_tree.AdoptedProcess(pid), spool_path)
+            self._processes[pid] = managed
+            print(f"[agent {self.name}] 🔗 Re-adopted {managed.key} (PID {pid})")
+        return managed.describe()
+
+    async def _op_watch(self, header, payload, writer, tasks, **_):
+        """Stream the process's console from `offset`, then report its exit."""
+        managed = self._get(header["pid"])
+        task = asyncio.create_task(self._stream(writer, managed, header.get("offset", 0)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return {}
+
+    async def _stream(self, writer, managed: ManagedProcess, offset: int):
+        interval = TAIL_MIN_INTERVAL
+        try:
+            with open(managed.spool_path, "rb", buffering=0) as spool:
+                spool.seek(offset)
+                while True:
+                    chunk = spool.read(CHUNK_SIZE)
+                    if chunk:
+                        offset += len(chunk)
+                        write_frame(writer, {"event": "output", "pid": managed.pid, "offset": offset}, chunk)
+                        await writer.drain()
+                        interval = TAIL_MIN_INTERVAL
+                        continue
+                    if managed.exit_task.done():
+                        break
+                    await asyncio.sleep(interval)
+                    interval = min(interval * 2, TAIL_MAX_INTERVAL)
+        except FileNotFoundError:
+            pass
+        write_frame(writer, {"event": "exit", "pid": managed.pid, "returncode": managed.process.returncode})
+        await writer.drain()
+
+    async def _op_write(self, header, payload, **_):
+        managed = self._get(header["pid"])
+        if not managed.has_stdin:
+            raise ValueError("the process's console input isn't available")
+        managed.process.stdin.write(payload)
+        await managed.process.stdin.drain()
+        return {}
+
+    async def _op_signal(self, header, payload, **_):
+        await self._get(header["pid"]).tree.signal(signal.Signals(header["signal"]), group=header.get("group", False))
+        return {}
+
+    async def _op_wait_gone(self, header, payload, **_):
+        return {"done": await self._get(header["pid"]).tree.wait_gone(header["seconds"])}
+
+    async def _op_wait_resumed(self, header, payload, **_):
+        return {"done": await self._get(header["pid"]).tree.wait_resumed(header["seconds"])}
+
+    async def _op_sample(self, header, payload, **_):
+        samples = await asyncio.to_thread(self._sample, header["pids"])
+        return {"samples": samples}
+
+    def _sample(self, pids: list) -> dict:
+        samples = {str(pid): self._sampler.sample(pid) for pid in pids if pid in self._processes}
+        self._sampler.forget_others()
+        return {pid: sample for pid, sample in samples.items() if sample}
+
+    async def _op_release(self, header, payload, **_):
+        """Forget an exited process and its console spool."""
+        managed = self._processes.get(header["pid"])
+        if managed and managed.exit_task.done():
+            del self._processes[managed.pid]
+            try:
+                os.remove(managed.spool_path)
+            except OSError:
+                pass
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run game servers on this machine for the bot.")
+    parser.add_argument("--name", default=os.uname().nodename, help="node name the bot refers to")
+    parser.add_argument("--listen", default="127.0.0.1:7600", help="host:port or unix:/path/to.sock; only expose TCP on a trusted network or behind TLS")
+    parser.add_argument("--state-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "state", "agent"))
+    parser.add_argument("--token", default=os.getenv("NODE_AGENT_TOKEN"), help="shared secret the bot must present")
+    args = parser.parse_args()
+    if parse_address(args.listen)[0] == "tcp" and not args.token:
+        parser.error("a TCP listener needs --token or NODE_AGENT_TOKEN")
+
+    agent = NodeAgent(args.name, os.path.abspath(args.state_dir), args.token)
+    try:
+        asyncio.run(agent.serve(args.listen))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# node_client.py
+
+import os
+import asyncio
+
+from admission import HostStats
+from process_tree import AdoptedProcess
+from node_protocol import read_frame, write_frame, open_connection
+
+
+class NodeClient:
+    """
+    Connection to one node agent (see node_agent.py). Requests are matched to responses by id,
+    so any number can be in flight. If the connection drops, it is re-established in the
+    background and the output of every remote process is streamed again from where it stopped.
+    """
+
+    RECONNECT_INTERVAL = 5
+    REQUEST_TIMEOUT = 30
+
+    def __init__(self, name: str, address: str, token: str = None):
+        self.name = name
+        self.address = address
+        self._token = token
+        self._writer = None
+        self._pending = {}
+        self._next_id = 0
+        self._processes = {}
+        self._connecting = asyncio.Lock()
+        self._reconnect_task = None
+
+    def __repr__(self) -> str:
+        return f"NodeClient({self.name!r}, {self.address!r})"
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _connect(self):
+        async with self._connecting:
+            if self.connected:
+                return
+            reader, writer = await asyncio.wait_for(open_connection(self.address), self.REQUEST_TIMEOUT)
+            write_frame(writer, {"id": 0, "op": "hello", "token": self._token})
+            await writer.drain()
+            header, _ = await asyncio.wait_for(read_frame(reader), self.REQUEST_TIMEOUT)
+            if not header.get("ok"):
+                writer.close()
+                raise ConnectionError(f"node {self.name} refused the connection: {header.get('error')}")
+            self._writer = writer
+            asyncio.create_task(self._read(reader, writer))
+
+    async def request(self, op: str, payload: bytes = b"", timeout: float = None, **args) -> dict:
+        if not self.connected:
+            await self._connect()
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            write_frame(self._writer, {"id": request_id, "op": op, **args}, payload)
+            await self._writer.drain()
+            response = await asyncio.wait_for(future, timeout or self.REQUEST_TIMEOUT)
+        finally:
+            self._pending.pop(request_id, None)
+        if not response.get("ok"):
+            raise RuntimeError(f"node {self.name}: {response.get('error')}")
+        return response
+
+    async def _read(self, reader, writer):
+        try:
+            while True:
+                header, payload = await read_frame(reader)
+                if "event" in header:
+                    process = self._processes.get(header["pid"])
+                    if process is not None:
+                        process._on_event(header, payload)
+                    continue
+                future = self._pending.get(header.get("id"))
+                if future and not future.done():
+                    future.set_result(header)
+        except Exception as e:
+            print(f"[node {self.name}] ⚠️ Connection lost: {e or type(e).__name__}")
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"connection to node {self.name} lost"))
+            if self._processes and self._reconnect_task is None:
+                self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        try:
+            while self._processes:
+                await asyncio.sleep(self.RECONNECT_INTERVAL)
+                try:
+                    await self._connect()
+                    for process in list(self._processes.values()):
+                        await process._resume()
+                except Exception:
+                    continue
+                print(f"[node {self.name}] 🔗 Reconnected, following {len(self._processes)} processes again.")
+                return
+        finally:
+            self._reconnect_task = None
+
+    async def host_stats(self) -> HostStats:
+        result = await self.request("host")
+        return HostStats(result["total_mb"], result["available_mb"], result["cores"], result["cpu_busy"])
+
+    async def spawn(self, key: str, argv: list, cwd: str = None) -> "RemoteProcess":
+        return RemoteProcess(self, key, await self.request("start", key=key, argv=argv, cwd=cwd))
+
+    async def find(self, key: str, pid: int, create_time: float):
+        """The still running process a previous bot run started here, or None."""
+        info = await self.request("find", key=key, pid=pid, create_time=create_time)
+        return RemoteProcess(self, key, info) if info["alive"] else None
+
+    async def sample(self, pids: list) -> dict:
+        """Resource totals of the trees rooted at `pids`, keyed by pid as a string."""
+        return (await self.request("sample", pids=pids))["samples"]
+
+
+class RemoteProcess:
+    """
+    A server process running on a node agent, with the parts of asyncio.subprocess.Process
+    the game servers use: pid, returncode, stdin and wait(). Its console output is appended to
+    a local spool file as it arrives, so the bot tails it exactly like a local server's.
+    """
+
+    def __init__(self, node: NodeClient, key: str, info: dict):
+        self.node = node
+        self.key = key
+        self.pid = info["pid"]
+        self.create_time = info["create_time"]
+        self.returncode = None
+        self.stdin = RemoteStdin(self) if info["stdin"] else None
+        self.tree = RemoteTree(node, self.pid)
+        self._exited = asyncio.Event()
+        self._spool_fd = None
+        self._offset = 0
+
+    async def follow(self, spool_path: str):
+        """Stream the console into `spool_path`, continuing from what it already holds."""
+        self._spool_fd = os.open(spool_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._offset = os.fstat(self._spool_fd).st_size
+        self.node._processes[self.pid] = self
+        await self.node.request("watch", pid=self.pid, offset=self._offset)
+
+    async def _resume(self):
+        info = await self.node.request("find", key=self.key, pid=self.pid, create_time=self.create_time)
+        if not info["alive"] and info["returncode"] is None:
+            # The agent restarted and the process is gone; its exit status went with it.
+            self._finish(None)
+            return
+        # Console input may not have survived: an agent that restarted re-adopts the process
+        # without its stdin pipe. Writes buffered for the old connection are dropped with it.
+        self.stdin = RemoteStdin(self) if info["stdin"] else None
+        await self.node.request("watch", pid=self.pid, offset=self._offset)
+
+    def _on_event(self, header: dict, payload: bytes):
+        if header["event"] == "output":
+            os.write(self._spool_fd, payload)
+            self._offset = header["offset"]
+        elif header["event"] == "exit":
+            self._finish(header["returncode"])
+            asyncio.create_task(self._release())
+
+    def _finish(self, returncode):
+        self.returncode = AdoptedProcess.UNKNOWN_EXIT_STATUS if returncode is None else returncode
+        self.node._processes.pop(self.pid, None)
+        if self._spool_fd is not None:
+            os.close(self._spool_fd)
+            self._spool_fd = None
+        self._exited.set()
+
+    async def _release(self):
+        try:
+            await self.node.request("release", pid=self.pid)
+        except Exception:
+            pass
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        return self.returncode
+
+
+class RemoteStdin:
+    """Console input of a RemoteProcess, with the StreamWriter methods the game servers use."""
+
+    def __init__(self, process: RemoteProcess):
+        self._process = process
+        self._buffer = bytearray()
+
+    def write(self, data: bytes):
+        self._buffer += data
+
+    async def drain(self):
+        data, self._buffer = bytes(self._buffer), bytearray()
+        if data:
+            await self._process.node.request("write", data, pid=self._process.pid)
+
+    def is_closing(self) -> bool:
+        return self._process.returncode is not None
+
+    def close(self):
+        self._buffer.clear()
+
+
+class RemoteTree:
+    """process_tree.LocalTree's operations, carried out by the node agent."""
+
+    # Extra seconds a waiting request may take on top of its own timeout.
+    SLACK = 10
+
+    def __init__(self, node: NodeClient, pid: int):
+        self._node = node
+        self.pid = pid
+
+    async def signal(self, sig, group: bool = False):
+        await self._node.request("signal", pid=self.pid, signal=int(sig), group=group)
+
+    async def wait_gone(self, timeout: float) -> bool:
+        result = await self._node.request("wait_gone", timeout=timeout + self.SLACK, pid=self.pid, seconds=timeout)
+        return result["done"]
+
+    async def wait_resumed(self, timeout: float) -> bool:
+        result = await self._node.request("wait_resumed", timeout=timeout + self.SLACK, pid=self.pid, seconds=timeout)
+        return result["done"]
+
+
+class NodePool:
+    """
+    The node agents the bot may place instances on, from NODE_AGENTS
+    ("name=host:port,other=unix:/path/agent.sock") and the shared NODE_AGENT_TOKEN.
+    """
+
+    def __init__(self, nodes: dict = None):
+        self._nodes = nodes or {}
+
+    @classmethod
+    def from_env(cls) -> "NodePool":
+        token = os.getenv("NODE_AGENT_TOKEN") or None
+        nodes = {}
+        for entry in filter(None, (part.strip() for part in (os.getenv("NODE_AGENTS") or "").split(","))):
+            name, _, address = entry.partition("=")
+            if not address:
+                print(f"[nodes] ⚠️ Ignoring node entry without an address: {entry}")
+                continue
+            nodes[name.strip()] = NodeClient(name.strip(), address.strip(), token)
+        return cls(nodes)
+
+    def get(self, name: str):
+        return self._nodes.get(name)
+
+    @property
+    def names(self) -> list:
+        return list(self._nodes)
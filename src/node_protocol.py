@@ -0,0 +1,62 @@
+# node_protocol.py
+#
+# Wire format between the bot and its node agents. Every frame is an 8-byte prefix (body length
+# and header length, big-endian), a JSON header and an optional binary payload, so console
+# output travels as raw bytes rather than escaped inside JSON.
+#
+#   request   {"id": 7, "op": "start", ...}            bot -> agent
+#   response  {"id": 7, "ok": true, ...}               agent -> bot, or "ok": false with "error"
+#   event     {"event": "output", "pid": 123, ...}     agent -> bot, payload is console output
+
+import json
+import struct
+import asyncio
+
+PREFIX = struct.Struct(">II")
+# Largest frame either side accepts; output is sent in chunks well below this.
+MAX_FRAME = 16 * 1024 * 1024
+DEFAULT_PORT = 7600
+
+
+class ProtocolError(Exception):
+    pass
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple:
+    """The next (header, payload) from `reader`; raises IncompleteReadError at EOF."""
+    body_length, header_length = PREFIX.unpack(await reader.readexactly(PREFIX.size))
+    if body_length > MAX_FRAME or header_length > body_length:
+        raise ProtocolError(f"bad frame ({body_length} bytes, header {header_length})")
+    body = await reader.readexactly(body_length)
+    return json.loads(body[:header_length]), body[header_length:]
+
+
+def write_frame(writer: asyncio.StreamWriter, header: dict, payload: bytes = b""):
+    encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    writer.write(PREFIX.pack(len(encoded) + len(payload), len(encoded)) + encoded + payload)
+
+
+def parse_address(address: str) -> tuple:
+    """("unix", path) or ("tcp", (host, port)) from "unix:/path", "tcp://host:port" or "host:port"."""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    if address.startswith("tcp://"):
+        address = address[len("tcp://"):]
+    host, _, port = address.rpartition(":")
+    if not host:
+        return "tcp", (port or "127.0.0.1", DEFAULT_PORT)
+    return "tcp", (host.strip("[]"), int(port))
+
+
+async def open_connection(address: str) -> tuple:
+    kind, target = parse_address(address)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(target)
+    return await asyncio.open_connection(*target)
+
+
+async def start_server(handler, address: str):
+    kind, target = parse_address(address)
+    if kind == "unix":
+        return await asyncio.start_unix_server(handler, target)
+    return await asyncio.start_server(handler, *target)
@@ -0,0 +1,306 @@
+# notifier.py
+
+import time
+import asyncio
+import collections
+
+import discord
+
+# Discord rejects messages longer than this.
+MAX_MESSAGE_LENGTH = 2000
+
+
+# At most one "messages dropped" line is printed per channel in this many seconds.
+DROP_LOG_INTERVAL = 60
+
+
+class _Outgoing:
+    __slots__ = ("content", "group", "summarize", "queued_at", "important")
+
+    def __init__(self, content: str, group, summarize, queued_at: float, important: bool = False):
+        self.content = content
+        self.group = group
+        self.summarize = summarize
+        self.queued_at = queued_at
+        self.important = important
+
+
+class ChannelQueue:
+    """
+    Outbound queue for a single channel, drained by its own worker task.
+    Messages posted within `coalesce_window` of each other are sent as one message, and
+    messages sharing a group are collapsed into a single summary line. Sends are paced by a
+    token bucket sized after Discord's per-channel limit (5 messages / 5 seconds), and a 429
+    from Discord pauses the queue for the advertised retry delay.
+    Once `max_depth` messages are waiting, the oldest one that isn't important is dropped to
+    make room; important messages (crashes, ready, shutdowns) are never dropped and are queued
+    past the limit if nothing else can go.
+    Status messages are kept apart from the stream: the first update sends one, later updates
+    edit it in place, and updates that pile up while waiting collapse into the latest one.
+    """
+
+    def __init__(self, channel, coalesce_window: float, max_depth: int, rate: float, burst: int, clock=time.monotonic, sleep=asyncio.sleep):
+        self._channel = channel
+        self._coalesce_window = coalesce_window
+        self._queue = collections.deque()
+        self._max_depth = max_depth
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        self._worker = None
+        self._status_pending = {}
+        self._status_messages = {}
+        self._status_worker = None
+
+        self.sent = 0
+        self.edited = 0
+        self.dropped = 0
+        self.failed = 0
+        self.latencies = collections.deque(maxlen=256)
+        self._drops_unlogged = 0
+        self._drop_logged_at = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def post(self, item: _Outgoing):
+        if len(self._queue) >= self._max_depth:
+            victim = next((queued for queued in self._queue if not queued.important), None)
+            if victim is not None:
+                self._queue.remove(victim)
+                self._dropped(victim)
+            elif not item.important:
+                self._dropped(item)
+                return
+        self._queue.append(item)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+
+    def _dropped(self, item: _Outgoing):
+        self.dropped += 1
+        self._drops_unlogged += 1
+        now = self._clock()
+        if self._drop_logged_at is None or now - self._drop_logged_at >= DROP_LOG_INTERVAL:
+            print(
+                f"[notifier] ⚠️ Queue for channel {getattr(self._channel, 'id', self._channel)} is full, "
+                f"dropped {self._drops_unlogged} message(s), latest: {item.content[:80]!r}"
+            )
+            self._drops_unlogged = 0
+            self._drop_logged_at = now
+
+    async def join(self):
+        """Wait until every queued message and status update has been sent."""
+        while True:
+            workers = [worker for worker in (self._worker, self._status_worker) if worker and not worker.done()]
+            if not workers:
+                return
+            await asyncio.gather(*workers)
+
+    def update(self, key: str, content: str, final: bool, queued_at: float):
+        self._status_pending[key] = (content[:MAX_MESSAGE_LENGTH], final, queued_at)
+        if self._status_worker is None or self._status_worker.done():
+            self._status_worker = asyncio.create_task(self._drain_status())
+
+    async def _drain_status(self):
+        while self._status_pending:
+            key = next(iter(self._status_pending))
+            content, final, queued_at = self._status_pending.pop(key)
+            message = self._status_messages.get(key)
+            await self._take_token()
+            try:
+                if message is None:
+                    message = await self._channel.send(content)
+                    self.sent += 1
+                else:
+                    await message.edit(content=content)
+                    self.edited += 1
+                self.latencies.append(self._clock() - queued_at)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    # Retry unless a newer update for the same message arrived meanwhile.
+                    self._status_pending.setdefault(key, (content, final, queued_at))
+                    self._tokens = 0.0
+                    await self._sleep(getattr(e, "retry_after", None) or _retry_after(e) or 1.0)
+                    continue
+                self.failed += 1
+                print(f"[notifier] ❌ Failed to update status message: {e}")
+            except Exception as e:
+                self.failed += 1
+                print(f"[notifier] ❌ Failed to update status message: {e}")
+
+            if final:
+                self._status_messages.pop(key, None)
+            elif message is not None:
+                self._status_messages[key] = message
+
+    async def _drain(self):
+        while self._queue:
+            await self._sleep(self._coalesce_window)
+            batch = list(self._queue)
+            self._queue.clear()
+
+            for content in _split(_coalesce(batch)):
+                await self._send(content)
+            now = self._clock()
+            self.latencies.extend(now - item.queued_at for item in batch)
+
+    async def _send(self, content: str):
+        while True:
+            await self._take_token()
+            try:
+                await self._channel.send(content)
+                self.sent += 1
+                return
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    self.failed += 1
+                    print(f"[notifier] ❌ Failed to send message: {e}")
+                    return
+                retry_after = getattr(e, "retry_after", None) or _retry_after(e) or 1.0
+                self._tokens = 0.0
+                await self._sleep(retry_after)
+            except Exception as e:
+                self.failed += 1
+                print(f"[notifier] ❌ Failed to send message: {e}")
+                return
+
+    async def _take_token(self):
+        while True:
+            now = self._clock()
+            self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await self._sleep((1 - self._tokens) / self._rate)
+
+
+class Notifier:
+    """
+    Non-blocking outbound messages to Discord channels, one ChannelQueue per channel.
+    `post` never awaits, so callers such as the output reader are never held up by Discord.
+    `clock` and `sleep` are the monotonic clock and sleep used for pacing and latencies.
+    """
+
+    def __init__(
+        self,
+        coalesce_window: float = 1.0,
+        max_depth: int = 200,
+        rate: float = 1.0,
+        burst: int = 5,
+        clock=time.monotonic,
+        sleep=asyncio.sleep,
+    ):
+        self._coalesce_window = coalesce_window
+        self._max_depth = max_depth
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._queues = {}
+
+    def post(self, channel, content: str, group: str = None, summarize=None, important: bool = False):
+        """
+        Queue a message for `channel`.
+        Messages with the same `group` in one burst are replaced by `summarize(count)`.
+        `important` messages are never dropped when the channel's queue is full.
+        """
+        self._queue_for(channel).post(_Outgoing(content, group, summarize, self._clock(), important))
+
+    def update(self, channel, key: str, content: str, final: bool = False):
+        """
+        Send or edit the status message `key` in `channel`. Only the latest content of a
+        burst of updates is sent; after a `final` update the next one starts a new message.
+        """
+        self._queue_for(channel).update(key, content, final, self._clock())
+
+    def _queue_for(self, channel) -> ChannelQueue:
+        key = getattr(channel, "id", None) or id(channel)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = ChannelQueue(channel, self._coalesce_window, self._max_depth, self._rate, self._burst, self._clock, self._sleep)
+            self._queues[key] = queue
+        return queue
+
+    async def join(self):
+        """Wait until every channel's queue has been sent."""
+        for queue in list(self._queues.values()):
+            await queue.join()
+
+    def queue_depth(self) -> int:
+        return sum(queue.depth for queue in self._queues.values())
+
+    def metrics(self) -> dict:
+        latencies = sorted(latency for queue in self._queues.values() for latency in queue.latencies)
+        return {
+            "channels": len(self._queues),
+            "queue_depth": self.queue_depth(),
+            "sent": sum(queue.sent for queue in self._queues.values()),
+            "edited": sum(queue.edited for queue in self._queues.values()),
+            "dropped": sum(queue.dropped for queue in self._queues.values()),
+            "failed": sum(queue.failed for queue in self._queues.values()),
+            "latency_p50": _percentile(latencies, 0.50),
+            "latency_p95": _percentile(latencies, 0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+
+def _coalesce(batch: list) -> str:
+    groups = {}
+    lines = []
+    for item in batch:
+        if item.group is None:
+            lines.append([item])
+        elif item.group in groups:
+            groups[item.group].append(item)
+        else:
+            groups[item.group] = [item]
+            lines.append(groups[item.group])
+
+    rendered = []
+    for items in lines:
+        if len(items) > 1 and items[0].summarize:
+            rendered.append(items[0].summarize(len(items)))
+        else:
+            rendered.extend(item.content for item in items)
+    return "\n".join(rendered)
+
+
+def _split(content: str) -> list:
+    chunks = []
+    current = ""
+    for line in content.split("\n"):
+        while len(line) > MAX_MESSAGE_LENGTH:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:MAX_MESSAGE_LENGTH])
+            line = line[MAX_MESSAGE_LENGTH:]
+        if current and len(current) + 1 + len(line) > MAX_MESSAGE_LENGTH:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _retry_after(error) -> float:
+    try:
+        return float(error.response.headers.get("Retry-After"))
+    except Exception:
+        return None
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+notifier = Notifier()
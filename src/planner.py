@@ -0,0 +1,380 @@
+# planner.py
+
+import os
+import re
+import time
+import types
+import sqlite3
+import asyncio
+import datetime
+
+from boot_profile import format_duration
+from log_sink import LogSink, instance_log_dir
+from notifier import notifier
+from scheduler import scheduler
+from state_store import STATE_DIR
+
+# What a schedule entry does. Sessions and stop windows last `duration` seconds from their
+# start time; backups and log compaction are jobs run at that time.
+SESSION = "session"
+STOP = "stop"
+BACKUP = "backup"
+COMPACT = "compact"
+KINDS = (SESSION, STOP, BACKUP, COMPACT)
+WINDOWS = (SESSION, STOP)
+
+DAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+_DAY_SETS = {
+    "daily": tuple(range(7)),
+    "every day": tuple(range(7)),
+    "weekdays": tuple(range(5)),
+    "weekends": (5, 6),
+}
+
+
+def parse_days(text: str) -> tuple:
+    """Weekdays (0 = Monday) from "daily", "weekdays", "weekends", "mon,wed,fri" or "mon-fri"."""
+    text = (text or "daily").strip().lower()
+    if text in _DAY_SETS:
+        return _DAY_SETS[text]
+    days = set()
+    for part in filter(None, re.split(r"[\s,]+", text)):
+        first, _, last = part.partition("-")
+        try:
+            start = DAY_NAMES.index(first[:3])
+            end = DAY_NAMES.index(last[:3]) if last else start
+        except ValueError:
+            raise ValueError(f"can't read a day from '{part}'") from None
+        days.update((start + i) % 7 for i in range((end - start) % 7 + 1))
+    if not days:
+        raise ValueError("no days given")
+    return tuple(sorted(days))
+
+
+def format_days(days: tuple) -> str:
+    for name, day_set in _DAY_SETS.items():
+        if tuple(days) == day_set:
+            return name
+    return ",".join(DAY_NAMES[day] for day in days)
+
+
+def parse_clock(text: str) -> str:
+    """"HH:MM" from "21:30" or "9:05"."""
+    try:
+        return datetime.datetime.strptime(text.strip(), "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ValueError(f"can't read a time of day from '{text}', use HH:MM") from None
+
+
+def parse_span(text: str) -> float:
+    """Seconds from "3h", "90m" or "1h30m"."""
+    parts = re.fullmatch(r"\s*(?:(\d+(?:\.\d+)?)\s*h)?\s*(?:(\d+)\s*m)?\s*", (text or "").lower())
+    if not parts or not any(parts.groups()):
+        raise ValueError(f"can't read a duration from '{text}', use e.g. 3h or 1h30m")
+    return float(parts[1] or 0) * 3600 + int(parts[2] or 0) * 60
+
+
+def _at(date: datetime.date, clock: str) -> float:
+    return datetime.datetime.combine(date, datetime.datetime.strptime(clock, "%H:%M").time()).timestamp()
+
+
+def next_occurrence(days: tuple, clock: str, after: float) -> float:
+    """The first time after `after` that the schedule comes round, in local time."""
+    date = datetime.date.fromtimestamp(after)
+    for offset in range(8):
+        day = date + datetime.timedelta(days=offset)
+        if day.weekday() in days and _at(day, clock) > after:
+            return _at(day, clock)
+    raise ValueError("schedule has no days")
+
+
+def previous_occurrence(days: tuple, clock: str, before: float):
+    """The last time at or before `before` that the schedule came round, None if it never did in the past week."""
+    date = datetime.date.fromtimestamp(before)
+    for offset in range(8):
+        day = date - datetime.timedelta(days=offset)
+        if day.weekday() in days and _at(day, clock) <= before:
+            return _at(day, clock)
+    return None
+
+
+class ScheduleStore:
+    """Recurring schedule entries per instance, kept in SQLite so they survive restarts."""
+
+    DEFAULT_PATH = os.path.join(STATE_DIR, "schedule.db")
+
+    _shared = {}
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # `days` is a comma-separated list of weekdays, 0 = Monday; `clock` is local "HH:MM".
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS schedules ("
+            " id INTEGER PRIMARY KEY, game TEXT NOT NULL, instance TEXT NOT NULL, kind TEXT NOT NULL,"
+            " days TEXT NOT NULL, clock TEXT NOT NULL, duration REAL NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL, last_run REAL)"
+        )
+
+    @classmethod
+    def shared(cls, path: str):
+        store = cls._shared.get(path)
+        if store is None:
+            store = cls._shared[path] = cls(path)
+        return store
+
+    @classmethod
+    def default(cls):
+        return cls.shared(cls.DEFAULT_PATH)
+
+    def add(self, game: str, instance: str, kind: str, days: tuple, clock: str, duration: float = 0) -> dict:
+        entry_id = self._db.execute(
+            "INSERT INTO schedules (game, instance, kind, days, clock, duration, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (game, instance, kind, ",".join(map(str, days)), clock, duration, time.time()),
+        ).lastrowid
+        return self.get(entry_id)
+
+    def remove(self, entry_id: int) -> bool:
+        return self._db.execute("DELETE FROM schedules WHERE id = ?", (entry_id,)).rowcount > 0
+
+    def get(self, entry_id: int):
+        row = self._db.execute("SELECT * FROM schedules WHERE id = ?", (entry_id,)).fetchone()
+        return _entry(row) if row else None
+
+    def all(self, game: str = None) -> list:
+        if game:
+            rows = self._db.execute("SELECT * FROM schedules WHERE game = ? ORDER BY id", (game,))
+        else:
+            rows = self._db.execute("SELECT * FROM schedules ORDER BY id")
+        return [_entry(row) for row in rows]
+
+    def mark_run(self, entry_id: int, at: float):
+        self._db.execute("UPDATE schedules SET last_run = ? WHERE id = ?", (at, entry_id))
+
+
+def _entry(row) -> dict:
+    entry = dict(row)
+    entry["days"] = tuple(int(day) for day in entry["days"].split(","))
+    return entry
+
+
+class Planner:
+    """
+    Planned sessions, stop windows and maintenance jobs for instances, recurring weekly and run
+    off the shared scheduler. A session pre-starts its instance early enough to be ready by
+    its start time, going by the p90 of recent boots, and keeps it up for the session's length
+    whether or not anyone is on; after that the usual idle timeout applies. A stop window stops
+    the instance when it opens and refuses starts until it closes. Backups and log compaction
+    run at their time, and once at startup if the bot was down when one was due within the
+    last MissedGrace seconds. Entries are re-armed from the store at startup, so a session or
+    stop window the bot comes back in the middle of is picked up where it stands.
+    """
+
+    # Lead time for sessions of an instance with no boot history yet, and the margin added to
+    # the predicted boot time.
+    DefaultLead = 300
+    PreStartMargin = 60
+    MissedGrace = 6 * 3600
+
+    def __init__(self, manager, backups=None, resolve_channel=None, store: ScheduleStore = None):
+        self._manager = manager
+        self._backups = backups
+        self._resolve_channel = resolve_channel or (lambda: None)
+        self._store = store or ScheduleStore.default()
+        self._timers = {}
+        # Entry id to the occurrence whose session or stop window is open.
+        self._active = {}
+        # (game, instance) to (end of the stop window, entry id).
+        self._blocked = {}
+        self._started = False
+        manager.add_start_guard(self._guard)
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        for entry in self._store.all():
+            self._arm(entry)
+
+    def stop(self):
+        self._started = False
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    def entries(self, game: str = None) -> list:
+        return self._store.all(game.lower() if game else None)
+
+    def add(self, game: str, instance: str, kind: str, days: str, clock: str, duration: str = None) -> dict:
+        """Validate and store a new entry and arm it; raises ValueError with a reason a user can act on."""
+        game = game.lower()
+        if game not in self._manager.game_names:
+            raise ValueError(f"unknown game '{game}'")
+        if instance not in self._manager.instance_names(game):
+            raise ValueError(f"{game} has no instance '{instance}'")
+        if kind not in KINDS:
+            raise ValueError(f"unknown kind '{kind}', use one of {', '.join(KINDS)}")
+        seconds = 0
+        if kind in WINDOWS:
+            if not duration:
+                raise ValueError(f"a {kind} needs a duration")
+            seconds = parse_span(duration)
+            if not 0 < seconds <= 86400:
+                raise ValueError("the duration must be between a minute and a day")
+        if kind == BACKUP and not self._manager.instance_config(game, instance).get("world_path"):
+            raise ValueError(f"`{instance}` has no world_path to back up")
+        entry = self._store.add(game, instance, kind, parse_days(days), parse_clock(clock), seconds)
+        if self._started:
+            self._arm(entry)
+        return entry
+
+    def remove(self, entry_id: int):
+        """Drop an entry, closing its session or stop window if one is open; returns it, or None."""
+        entry = self._store.get(entry_id)
+        if entry is None:
+            return None
+        self._store.remove(entry_id)
+        timer = self._timers.pop(entry_id, None)
+        if timer:
+            timer.cancel()
+        if self._active.pop(entry_id, None) is not None:
+            self._close_window(entry)
+        return entry
+
+    def next_start(self, entry: dict) -> float:
+        """When the entry's current or next occurrence starts."""
+        now = time.time()
+        if entry["id"] in self._active:
+            return self._active[entry["id"]]
+        return next_occurrence(entry["days"], entry["clock"], now)
+
+    def lead(self, entry: dict) -> float:
+        """How long before its start time a session's instance is started."""
+        if entry["kind"] != SESSION:
+            return 0
+        server = self._manager.get_server(entry["game"])
+        prediction = server.boot_history.predict(entry["game"], entry["instance"]) if server else None
+        return (prediction["p90"] if prediction else self.DefaultLead) + self.PreStartMargin
+
+    def _guard(self, game: str, instance: str):
+        blocked = self._blocked.get((game, instance))
+        if blocked and blocked[0] > time.time():
+            return f"it's in a scheduled stop window until {time.strftime('%H:%M', time.localtime(blocked[0]))}"
+        return None
+
+    def _arm(self, entry: dict):
+        """Set the entry's timer for its next step, opening its window first if it's due now."""
+        timer = self._timers.pop(entry["id"], None)
+        if timer:
+            timer.cancel()
+        now = time.time()
+        label = f"schedule #{entry['id']} {entry['kind']} {entry['game']}:{entry['instance']}"
+
+        if entry["kind"] in WINDOWS:
+            lead = self.lead(entry)
+            current = previous_occurrence(entry["days"], entry["clock"], now + lead)
+            if current is not None and current + entry["duration"] > now:
+                if self._active.get(entry["id"]) != current:
+                    self._active[entry["id"]] = current
+                    asyncio.create_task(self._open_window(entry, current))
+                self._timers[entry["id"]] = scheduler.call_at(
+                    current + entry["duration"], lambda: self._end_window(entry), label=label
+                )
+                return
+            at = next_occurrence(entry["days"], entry["clock"], now + lead) - lead
+            self._timers[entry["id"]] = scheduler.call_at(at, lambda: self._arm(entry), label=label)
+            return
+
+        missed = previous_occurrence(entry["days"], entry["clock"], now)
+        last = entry["last_run"] or entry["created_at"]
+        if missed is not None and missed > last and now - missed <= self.MissedGrace:
+            asyncio.create_task(self._run_job(entry))
+        at = next_occurrence(entry["days"], entry["clock"], now)
+        self._timers[entry["id"]] = scheduler.call_at(at, lambda: self._run_job(entry, rearm=True), label=label)
+
+    async def _open_window(self, entry: dict, occurrence: float):
+        game, instance = entry["game"], entry["instance"]
+        server = self._manager.get_server(game)
+        if server is None or instance not in self._manager.instance_names(game):
+            print(f"[schedule:{game}:{instance}] ⚠️ Schedule #{entry['id']}: the instance no longer exists.")
+            return
+        channel = self._resolve_channel()
+        end = occurrence + entry["duration"]
+
+        if entry["kind"] == SESSION:
+            server.keep_up(instance, end)
+            if server.is_instance_running(instance) and not server.is_instance_in_standby(instance):
+                print(f"[schedule:{game}:{instance}] 📅 Already up for the session at {entry['clock']}.")
+                return
+            print(f"[schedule:{game}:{instance}] 📅 Starting for the session at {entry['clock']}.")
+            try:
+                decision = await self._manager.request_start(game, instance, types.SimpleNamespace(channel=channel))
+            except Exception as e:
+                print(f"[schedule:{game}:{instance}] ❌ Failed to start for the session: {e}")
+                return
+            if channel is not None:
+                notifier.post(
+                    channel,
+                    f"📅 Scheduled session of `{instance}` at <t:{int(occurrence)}:t>, until <t:{int(end)}:t>. "
+                    + decision.message(game.capitalize(), f"`{instance}`"),
+                )
+            return
+
+        self._blocked[(game, instance)] = (end, entry["id"])
+        self._manager.cancel_restart(game, instance)
+        if server.is_instance_running(instance):
+            print(f"[schedule:{game}:{instance}] 🛑 Stopping for the stop window.")
+            if channel is not None:
+                notifier.post(channel, f"🛑 Stopping `{instance}` for its scheduled stop window, until <t:{int(end)}:t>.")
+            try:
+                await server.stop_instance(instance)
+            except Exception as e:
+                print(f"[schedule:{game}:{instance}] ❌ Failed to stop for the stop window: {e}")
+
+    def _end_window(self, entry: dict):
+        if self._active.pop(entry["id"], None) is not None:
+            self._close_window(entry)
+        self._arm(entry)
+
+    def _close_window(self, entry: dict):
+        game, instance = entry["game"], entry["instance"]
+        if entry["kind"] == SESSION:
+            server = self._manager.servers.get(game)
+            if server is not None:
+                server.keep_up(instance, 0)
+            return
+        if self._blocked.get((game, instance), (None, None))[1] == entry["id"]:
+            del self._blocked[(game, instance)]
+            print(f"[schedule:{game}:{instance}] ✅ Stop window over, it can be started again.")
+
+    async def _run_job(self, entry: dict, rearm: bool = False):
+        game, instance = entry["game"], entry["instance"]
+        entry["last_run"] = time.time()
+        self._store.mark_run(entry["id"], entry["last_run"])
+        if rearm:
+            self._arm(entry)
+        server = self._manager.get_server(game)
+        if server is None or instance not in self._manager.instance_names(game):
+            print(f"[schedule:{game}:{instance}] ⚠️ Schedule #{entry['id']}: the instance no longer exists.")
+            return
+        channel = self._resolve_channel()
+
+        if entry["kind"] == BACKUP:
+            if self._backups is None:
+                return
+            await self._backups.backup_instance(server, instance, reason="scheduled maintenance", channel=channel)
+            return
+
+        runtime = server.runtimes.get(instance)
+        if runtime is not None and runtime.is_running and runtime.log_sink is not None:
+            sink = runtime.log_sink
+        else:
+            sink = LogSink.from_instance_config(instance_log_dir(game, instance), self._manager.instance_config(game, instance))
+        started = time.monotonic()
+        count = await asyncio.wrap_future(sink.compact())
+        print(
+            f"[schedule:{game}:{instance}] 🗜️ Compacted logs: {count} segment(s) compressed "
+            f"in {format_duration(time.monotonic() - started)}."
+        )
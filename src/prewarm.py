@@ -0,0 +1,311 @@
+# prewarm.py
+
+import os
+import glob
+import time
+import sqlite3
+import asyncio
+import threading
+
+from statistics import median
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+import process_tree
+from boot_profile import READY, format_duration
+from log_sink import LOG_DIR
+from notifier import notifier
+from server_manager import LOCAL_NODE
+from state_store import STATE_DIR
+from telemetry import _format_bytes
+
+# Files a server opens that aren't part of its working set.
+_SKIPPED_PREFIXES = ("/proc/", "/sys/", "/dev/", "/tmp/", STATE_DIR + os.sep, LOG_DIR + os.sep)
+
+
+class WorkingSet:
+    """
+    Files each instance's server had open while booting, learned over its last KEEP_BOOTS local
+    boots, and the duration of every boot with how much of it had been prewarmed.
+    """
+
+    KEEP_BOOTS = 5
+
+    DEFAULT_PATH = os.path.join(STATE_DIR, "prewarm.db")
+
+    _shared = {}
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS boots ("
+            " id INTEGER PRIMARY KEY, game TEXT NOT NULL, instance TEXT NOT NULL,"
+            " started_at REAL NOT NULL, seconds REAL NOT NULL, prewarmed_bytes INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS boots_by_instance ON boots (game, instance, started_at);"
+            # `boot` is the id of the latest boot the file was seen in.
+            "CREATE TABLE IF NOT EXISTS files ("
+            " game TEXT NOT NULL, instance TEXT NOT NULL, path TEXT NOT NULL, boot INTEGER NOT NULL,"
+            " PRIMARY KEY (game, instance, path));"
+        )
+
+    @classmethod
+    def shared(cls, path: str):
+        store = cls._shared.get(path)
+        if store is None:
+            store = cls._shared[path] = cls(path)
+        return store
+
+    @classmethod
+    def default(cls):
+        return cls.shared(cls.DEFAULT_PATH)
+
+    def record_boot(self, game: str, instance: str, started_at: float, seconds: float, files: set, prewarmed_bytes: int):
+        # One transaction: atomic, and one commit rather than one per file of a large working set.
+        self._db.execute("BEGIN")
+        try:
+            boot = self._db.execute(
+                "INSERT INTO boots (game, instance, started_at, seconds, prewarmed_bytes) VALUES (?, ?, ?, ?, ?)",
+                (game, instance, started_at, seconds, prewarmed_bytes),
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO files (game, instance, path, boot) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (game, instance, path) DO UPDATE SET boot = excluded.boot",
+                [(game, instance, path, boot) for path in files],
+            )
+            # Files none of the last KEEP_BOOTS boots opened have dropped out of the working set.
+            self._db.execute(
+                "DELETE FROM files WHERE game = ? AND instance = ? AND boot NOT IN"
+                " (SELECT id FROM boots WHERE game = ? AND instance = ? ORDER BY started_at DESC LIMIT ?)",
+                (game, instance, game, instance, self.KEEP_BOOTS),
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def files(self, game: str, instance: str) -> list:
+        rows = self._db.execute("SELECT path FROM files WHERE game = ? AND instance = ?", (game, instance)).fetchall()
+        return [row[0] for row in rows]
+
+    def boot_seconds(self, game: str, instance: str, prewarmed: bool, limit: int = 10) -> list:
+        """Durations of the latest boots that were, or weren't, prewarmed."""
+        condition = "prewarmed_bytes > 0" if prewarmed else "prewarmed_bytes = 0"
+        rows = self._db.execute(
+            f"SELECT seconds FROM boots WHERE game = ? AND instance = ? AND {condition} ORDER BY started_at DESC LIMIT ?",
+            (game, instance, limit),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def last_booted(self, game: str, instances: list):
+        """Of `instances`, the one booted most recently, or None if none has been."""
+        if not instances:
+            return None
+        row = self._db.execute(
+            f"SELECT instance FROM boots WHERE game = ? AND instance IN ({','.join('?' * len(instances))})"
+            " ORDER BY started_at DESC LIMIT 1",
+            (game, *instances),
+        ).fetchone()
+        return row[0] if row else None
+
+
+class _Warmup:
+    __slots__ = ("cancelled", "task", "files", "bytes", "started", "finished")
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.task = None
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+
+class Prewarmer:
+    """
+    Reads an instance's working set into the page cache as soon as someone shows the intent to
+    start it, so the boot finds its mods, libraries and world regions in memory instead of on
+    disk. The working set is learned: while a local instance boots, its process tree's open
+    files are sampled every SampleInterval seconds, and the files seen during the last few
+    boots make up the set. Before an instance has booted once, the game's PrewarmPatterns
+    (globs relative to the launch script's directory) stand in for it.
+    Files are read in ChunkBytes chunks, each announced with posix_fadvise(WILLNEED), on worker
+    threads at the lowest best-effort I/O priority, so the server's own reads go first. No
+    more than MemoryFraction of the available memory is read, and a warm-up stops as soon as
+    it is cancelled, the instance is ready, or it exits. Instances can opt out with
+    `prewarm = false`; instances that may run on a node agent are never prewarmed.
+    """
+
+    SampleInterval = 2.0
+    ChunkBytes = 4 * 1024 * 1024
+    MemoryFraction = 0.5
+    Workers = 2
+    # A warm-up that ended longer than this before a boot doesn't count towards it.
+    IntentWindow = 600
+
+    def __init__(self, manager, store: WorkingSet = None):
+        self._manager = manager
+        self._store = store or WorkingSet.default()
+        self._pool = ThreadPoolExecutor(self.Workers, thread_name_prefix="prewarm", initializer=_lower_priority)
+        self._warmups = {}
+        manager.add_start_listener(self._on_instance_start)
+
+    def warming(self, game: str, instance: str) -> bool:
+        warmup = self._warmups.get((game, instance))
+        return warmup is not None and warmup.finished is None
+
+    def likeliest(self, game: str):
+        """The stopped instance of `game` most likely to be picked: the one booted last."""
+        server = self._manager.get_server(game)
+        stopped = [name for name in self._manager.instance_names(game) if not server.is_instance_running(name)]
+        return self._store.last_booted(game, stopped) or (stopped[0] if stopped else None)
+
+    def warm(self, game: str, instance: str) -> bool:
+        """Start prewarming an instance unless it is running, already warming or can't be."""
+        game = game.lower()
+        key = (game, instance)
+        config = self._manager.instance_config(game, instance)
+        if not config or config.get("prewarm") is False or (config.get("nodes") or [LOCAL_NODE]) != [LOCAL_NODE]:
+            return False
+        server = self._manager.get_server(game)
+        if server is None or server.is_instance_running(instance) or self.warming(game, instance):
+            return False
+        if not hasattr(os, "posix_fadvise"):
+            return False
+        warmup = self._warmups[key] = _Warmup()
+        warmup.task = asyncio.create_task(self._warm(server, instance, warmup))
+        return True
+
+    def cancel(self, game: str, instance: str):
+        warmup = self._warmups.pop((game.lower(), instance), None)
+        if warmup is not None:
+            warmup.cancelled.set()
+
+    async def _warm(self, server, instance: str, warmup: _Warmup):
+        label = f"{server.name}:{instance}"
+        try:
+            paths = self._store.files(server.name, instance)
+            if not paths:
+                paths = await asyncio.to_thread(self._guess_working_set, server, instance)
+            budget = int(psutil.virtual_memory().available * self.MemoryFraction)
+            loop = asyncio.get_running_loop()
+            # One batch of files per worker, so a few huge files don't hold up the rest.
+            batches = [paths[worker::self.Workers] for worker in range(self.Workers)]
+            await asyncio.gather(*(
+                loop.run_in_executor(self._pool, self._read, batch, warmup, budget // self.Workers) for batch in batches
+            ))
+        except Exception as e:
+            print(f"[{label}] ⚠️ Prewarming failed: {e}")
+        warmup.finished = time.monotonic()
+        state = "stopped" if warmup.cancelled.is_set() else "done"
+        print(
+            f"[{label}] 🔥 Prewarm {state}: {_format_bytes(warmup.bytes)} of {warmup.files} files "
+            f"in {format_duration(warmup.finished - warmup.started)}"
+        )
+
+    def _guess_working_set(self, server, instance: str) -> list:
+        patterns = getattr(server, "PrewarmPatterns", ())
+        if not patterns:
+            return []
+        root = os.path.dirname(server.get_launch_args(server.get_instance(instance))[0])
+        found = {path for pattern in patterns for path in glob.glob(os.path.join(root, pattern), recursive=True)}
+        files = [path for path in found if os.path.isfile(path)]
+        # Newest first, so the budget runs out on stale world regions rather than on jars loaded every boot.
+        return sorted(files, key=lambda path: os.path.getmtime(path), reverse=True)
+
+    def _read(self, paths: list, warmup: _Warmup, budget: int):
+        buffer = bytearray(self.ChunkBytes)
+        done = 0
+        for path in paths:
+            if warmup.cancelled.is_set() or done >= budget:
+                return
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                size = os.fstat(fd).st_size
+                offset = 0
+                while offset < size and done < budget and not warmup.cancelled.is_set():
+                    length = min(self.ChunkBytes, size - offset)
+                    os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+                    # Reading the chunk waits for it to be cached, which paces the warm-up at the thread's I/O priority.
+                    read = os.preadv(fd, [memoryview(buffer)[:length]], offset)
+                    if read <= 0:
+                        break
+                    offset += read
+                    done += read
+                    warmup.bytes += read
+                warmup.files += 1
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    def _on_instance_start(self, server, runtime):
+        if runtime.node is None and runtime.boot is not None:
+            asyncio.create_task(self._record(server, runtime))
+
+    async def _record(self, server, runtime):
+        """Sample the files the booting server opens; when it's ready, store them and report the warm-up."""
+        key = (server.name, runtime.name)
+        files = set()
+        while runtime.is_running and not runtime.ready:
+            files |= await asyncio.to_thread(_open_files, runtime.pid)
+            await asyncio.sleep(self.SampleInterval)
+        warmup = self._warmups.pop(key, None)
+        if warmup is not None:
+            warmup.cancelled.set()
+            boot_began = time.monotonic() - (time.time() - runtime.start_time)
+            if warmup.finished is not None and warmup.finished < boot_began - self.IntentWindow:
+                warmup = None
+        if not runtime.ready:
+            return
+
+        boots = server.boot_history.recent(server.name, runtime.name, 1)
+        seconds = boots[-1].get(READY) if boots else None
+        if seconds is None:
+            return
+        prewarmed = warmup.bytes if warmup is not None else 0
+        baseline = self._store.boot_seconds(server.name, runtime.name, prewarmed=False)
+        self._store.record_boot(server.name, runtime.name, runtime.start_time, seconds, files, prewarmed)
+        if not prewarmed:
+            return
+
+        report = f"🔥 Prewarmed {_format_bytes(prewarmed)} of `{runtime.name}`'s files ({warmup.files} files)."
+        if baseline:
+            usual = median(baseline)
+            saved = usual - seconds
+            if saved >= 1:
+                report += f" Booted in {format_duration(seconds)}, {format_duration(saved)} faster than the usual {format_duration(usual)} without it."
+            else:
+                report += f" Booted in {format_duration(seconds)}, no faster than the usual {format_duration(usual)} without it."
+        print(f"[{server.name}:{runtime.name}] {report}")
+        if runtime.channel is not None:
+            notifier.post(runtime.channel, report)
+
+
+def _open_files(pid: int) -> set:
+    files = set()
+    for proc in process_tree.snapshot(pid):
+        try:
+            files.update(entry.path for entry in proc.open_files())
+        except psutil.Error:
+            continue
+    return {path for path in files if not path.startswith(_SKIPPED_PREFIXES)}
+
+
+def _lower_priority():
+    """Put a prewarm worker thread at the lowest best-effort I/O priority and a low CPU priority."""
+    tid = threading.get_native_id()
+    try:
+        psutil.Process(tid).ionice(psutil.IOPRIO_CLASS_BE, 7)
+    except Exception:
+        pass
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, 10)
+    except Exception:
+        pass
+
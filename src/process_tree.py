@@ -0,0 +1,213 @@
+# process_tree.py
+
+import os
+import asyncio
+import psutil
+
+
+def snapshot(pid: int) -> list:
+    """The process and all of its descendants, or an empty list if it's gone."""
+    try:
+        parent = psutil.Process(pid)
+        return [parent] + parent.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+
+def alive(procs: list) -> list:
+    """
+    Processes from `procs` that are still running.
+    Zombies count as gone; reaping our own children is left to the event loop's child watcher.
+    """
+    running = []
+    for proc in procs:
+        try:
+            if proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE:
+                running.append(proc)
+        except psutil.NoSuchProcess:
+            pass
+    return running
+
+
+def send_signal(procs: list, sig):
+    for proc in procs:
+        try:
+            proc.send_signal(sig)
+        except psutil.NoSuchProcess:
+            pass
+
+
+async def wait_gone(procs: list, timeout: float, interval: float = 0.25) -> list:
+    """Wait without blocking the loop until all `procs` exit; return the ones still alive at the timeout."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        procs = alive(procs)
+        if not procs or loop.time() >= deadline:
+            return procs
+        await asyncio.sleep(interval)
+
+
+async def wait_resumed(procs: list, timeout: float, interval: float = 0.02) -> bool:
+    """After SIGCONT, wait until none of `procs` is in the stopped state; False on timeout."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        stopped = []
+        for proc in alive(procs):
+            try:
+                if proc.status() == psutil.STATUS_STOPPED:
+                    stopped.append(proc)
+            except psutil.NoSuchProcess:
+                pass
+        if not stopped:
+            return True
+        if loop.time() >= deadline:
+            return False
+        procs = stopped
+        await asyncio.sleep(interval)
+
+
+class LocalTree:
+    """
+    The process tree rooted at a local pid, with the operations the bot performs on a server's
+    processes. Every process ever seen in the tree is remembered, so children orphaned by the
+    root's exit still get signalled and waited for. Node agents expose the same operations
+    for remote servers (see node_client.RemoteTree).
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self._known = {}
+
+    def processes(self) -> list:
+        for proc in snapshot(self.pid):
+            self._known.setdefault(proc.pid, proc)
+        self._known = {proc.pid: proc for proc in alive(list(self._known.values()))}
+        return list(self._known.values())
+
+    async def signal(self, sig, group: bool = False):
+        """Send `sig` to every process of the tree, or to the root's process group."""
+        if group:
+            os.killpg(os.getpgid(self.pid), sig)
+        else:
+            send_signal(self.processes(), sig)
+
+    async def wait_gone(self, timeout: float) -> bool:
+        """True once the whole tree has exited, False if some of it is still there at the timeout."""
+        return not await wait_gone(self.processes(), timeout)
+
+    async def wait_resumed(self, timeout: float) -> bool:
+        return await wait_resumed(self.processes(), timeout)
+
+
+class TreeSampler:
+    """
+    Resource totals of process trees: RSS, CPU%, threads, open file descriptors and disk I/O
+    bytes. Process objects are reused between samples, since CPU% is measured from one call
+    to the next; `forget_others` drops the ones that weren't part of the latest pass.
+    Disk I/O bytes only ever grow for a tree: when a child exits, the bytes it was last seen
+    with stay in the tree's total rather than dropping out with it.
+    """
+
+    FIELDS = ("rss", "cpu", "threads", "fds", "read_bytes", "write_bytes")
+
+    def __init__(self):
+        self._procs = {}
+        self._seen = set()
+        self._io = {}
+        self._members = {}
+        self._retired = {}
+        self._roots = set()
+
+    def sample(self, pid: int):
+        """Totals of the tree rooted at `pid`, or None if it's gone."""
+        try:
+            root = self._procs.get(pid) or psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+
+        totals = dict.fromkeys(self.FIELDS, 0)
+        retired = self._retired.setdefault(pid, [0, 0])
+        members = {proc.pid for proc in procs}
+        for gone in self._members.get(pid, set()) - members:
+            read_bytes, write_bytes = self._io.get(gone, (0, 0))
+            retired[0] += read_bytes
+            retired[1] += write_bytes
+        self._members[pid] = members
+        self._roots.add(pid)
+        totals["read_bytes"], totals["write_bytes"] = retired
+        for proc in procs:
+            proc = self._procs.setdefault(proc.pid, proc)
+            self._seen.add(proc.pid)
+            try:
+                with proc.oneshot():
+                    totals["rss"] += proc.memory_info().rss
+                    totals["cpu"] += proc.cpu_percent(interval=None)
+                    totals["threads"] += proc.num_threads()
+                    totals["fds"] += proc.num_fds()
+            except psutil.Error:
+                continue
+            try:
+                io = proc.io_counters()
+                self._io[proc.pid] = (io.read_bytes, io.write_bytes)
+            except (psutil.Error, AttributeError):
+                pass
+            read_bytes, write_bytes = self._io.get(proc.pid, (0, 0))
+            totals["read_bytes"] += read_bytes
+            totals["write_bytes"] += write_bytes
+        return totals
+
+    def forget_others(self):
+        """Forget processes and trees not sampled since the last call, so their cached counters don't leak."""
+        for pid in set(self._procs) - self._seen:
+            del self._procs[pid]
+        for pid in set(self._io) - self._seen:
+            del self._io[pid]
+        for pid in set(self._members) - self._roots:
+            del self._members[pid]
+            self._retired.pop(pid, None)
+        self._seen = set()
+        self._roots = set()
+
+
+class AdoptedProcess:
+    """
+    A server process spawned by a previous run of the bot. It isn't our child, so its exit is
+    awaited through a pidfd (or by polling where pidfds aren't available) and its exit status
+    can't be collected.
+    """
+
+    # Reported as the return code once an adopted process is gone.
+    UNKNOWN_EXIT_STATUS = 255
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode = None
+        self.stdin = None
+
+    async def wait(self) -> int:
+        if self.returncode is not None:
+            return self.returncode
+        try:
+            fd = os.pidfd_open(self.pid)
+        except (AttributeError, OSError):
+            fd = None
+
+        if fd is None:
+            procs = snapshot(self.pid)[:1]
+            while alive(procs):
+                await asyncio.sleep(1)
+        else:
+            loop = asyncio.get_running_loop()
+            exited = loop.create_future()
+            loop.add_reader(fd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(fd)
+                os.close(fd)
+
+        self.returncode = self.UNKNOWN_EXIT_STATUS
+        return self.returncode
@@ -0,0 +1,181 @@
+# resource_profile.py
+
+import asyncio
+import psutil
+
+from dataclasses import dataclass
+from typing import Optional
+
+import process_tree
+
+IONICE_CLASSES = {
+    "realtime": psutil.IOPRIO_CLASS_RT,
+    "best-effort": psutil.IOPRIO_CLASS_BE,
+    "idle": psutil.IOPRIO_CLASS_IDLE,
+}
+# oom_score_adj given to an instance over its soft memory ceiling, so the kernel's OOM killer
+# picks it before the bot or a well-behaved instance.
+OVER_CEILING_OOM_SCORE = 800
+
+
+@dataclass(frozen=True)
+class ResourceProfile:
+    """
+    Scheduling settings for an instance's process tree, from the `resources` table of its config:
+      affinity        cores the server may run on, as a list or a string like "2-7,10"
+      nice            CPU niceness once the server is ready
+      ionice          I/O priority once ready: "idle", "best-effort[:0-7]" or "realtime[:0-7]"
+      memory_soft_mb  tree RSS above which an alert is posted and the tree is made the OOM
+                      killer's first choice
+      boot_nice, boot_ionice   settings while the server boots, relaxed to the above once ready
+    Unset fields leave the corresponding setting alone. Lowering priority never needs
+    privileges, so a boot boost works unprivileged as long as it only starts from the defaults.
+    """
+    affinity: Optional[tuple] = None
+    nice: Optional[int] = None
+    ionice: Optional[tuple] = None
+    memory_soft_mb: Optional[float] = None
+    boot_nice: Optional[int] = None
+    boot_ionice: Optional[tuple] = None
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """The instance's profile, or None if it has no `resources` table."""
+        table = config.get("resources")
+        if not table:
+            return None
+        return cls(
+            affinity=_parse_affinity(table["affinity"]) if "affinity" in table else None,
+            nice=table.get("nice"),
+            ionice=_parse_ionice(table["ionice"]) if "ionice" in table else None,
+            memory_soft_mb=table.get("memory_soft_mb"),
+            boot_nice=table.get("boot_nice"),
+            boot_ionice=_parse_ionice(table["boot_ionice"]) if "boot_ionice" in table else None,
+        )
+
+    def settings(self, booting: bool) -> tuple:
+        """(nice, ionice) for the boot or the ready phase."""
+        if booting:
+            return (
+                self.boot_nice if self.boot_nice is not None else self.nice,
+                self.boot_ionice if self.boot_ionice is not None else self.ionice,
+            )
+        return self.nice, self.ionice
+
+
+def _parse_affinity(value) -> tuple:
+    if isinstance(value, int):
+        return (value,)
+    if isinstance(value, list):
+        return tuple(int(core) for core in value)
+    cores = []
+    for part in str(value).split(","):
+        first, _, last = part.strip().partition("-")
+        cores.extend(range(int(first), int(last or first) + 1))
+    return tuple(cores)
+
+
+def _parse_ionice(value: str) -> tuple:
+    name, _, level = str(value).partition(":")
+    if name not in IONICE_CLASSES:
+        raise ValueError(f"Unknown I/O priority class: {name}")
+    if name == "idle":
+        return IONICE_CLASSES[name], 0
+    return IONICE_CLASSES[name], int(level or 4)
+
+
+class ResourceGovernor:
+    """
+    Keeps an instance's process tree on its ResourceProfile: applies it to every process right
+    after spawn, to children the server starts later (launch scripts exec or fork the JVM), and
+    again with the relaxed settings once the server is ready. Also watches the tree's RSS
+    against the soft memory ceiling. The /proc walking happens in a worker thread.
+    """
+
+    # Seconds between passes over the process tree.
+    INTERVAL = 5.0
+
+    def __init__(self, runtime, profile: ResourceProfile, notify, label: str):
+        self._runtime = runtime
+        self._profile = profile
+        self._notify = notify
+        self._label = label
+        self._applied = {}
+        self._over_ceiling = False
+        self._deprioritized = set()
+        self._failed = set()
+        self._wake = asyncio.Event()
+
+    def relax(self):
+        """Switch to the ready settings now instead of at the next pass."""
+        self._wake.set()
+
+    async def run(self):
+        while True:
+            rss = await asyncio.to_thread(self._apply, not self._runtime.ready)
+            self._check_ceiling(rss)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _apply(self, booting: bool) -> int:
+        """Bring every process of the tree to the profile; returns the tree's RSS in bytes."""
+        nice, ionice = self._profile.settings(booting)
+        procs = process_tree.snapshot(self._runtime.pid)
+        rss = 0
+        for proc in procs:
+            try:
+                rss += proc.memory_info().rss
+                if self._applied.get(proc.pid) == (nice, ionice):
+                    continue
+                if proc.pid not in self._applied and self._profile.affinity is not None:
+                    self._try("affinity", proc.cpu_affinity, list(self._profile.affinity))
+                if nice is not None:
+                    self._try("nice", proc.nice, nice)
+                if ionice is not None:
+                    self._try("ionice", proc.ionice, *ionice)
+                self._applied[proc.pid] = (nice, ionice)
+            except psutil.NoSuchProcess:
+                continue
+        live = {proc.pid for proc in procs}
+        self._applied = {pid: applied for pid, applied in self._applied.items() if pid in live}
+        if self._over_ceiling:
+            for pid in live - self._deprioritized:
+                self._try("oom_score_adj", _set_oom_score_adj, pid, OVER_CEILING_OOM_SCORE)
+            self._deprioritized = (self._deprioritized | live) & live
+        return rss
+
+    def _try(self, setting: str, apply, *args):
+        try:
+            apply(*args)
+        except psutil.NoSuchProcess:
+            raise
+        except FileNotFoundError:
+            pass
+        except (psutil.Error, OSError, ValueError) as e:
+            # Usually a lack of privileges; say so once per setting rather than every pass.
+            if setting not in self._failed:
+                self._failed.add(setting)
+                print(f"[{self._label}] ⚠️ Could not set {setting}: {e}")
+
+    def _check_ceiling(self, rss: int):
+        ceiling = self._profile.memory_soft_mb
+        if not ceiling:
+            return
+        rss_mb = rss / (1024 * 1024)
+        if rss_mb > ceiling and not self._over_ceiling:
+            self._over_ceiling = True
+            self._notify(
+                f"🧠 `{self._runtime.name}` is using {rss_mb:,.0f} MB, over its {ceiling:,.0f} MB soft limit. "
+                f"It will be the first to go if the host runs out of memory."
+            )
+        elif rss_mb < ceiling * 0.9 and self._over_ceiling:
+            # The raised oom_score_adj stays; lowering it again would need privileges.
+            self._over_ceiling = False
+
+
+def _set_oom_score_adj(pid: int, score: int):
+    with open(f"/proc/{pid}/oom_score_adj", "w") as f:
+        f.write(str(score))
@@ -0,0 +1,113 @@
+# scheduler.py
+
+import time
+import heapq
+import asyncio
+import inspect
+import itertools
+
+
+class Timer:
+    """A callback due at an absolute time (time.time()), every `interval` seconds after that if set."""
+
+    __slots__ = ("deadline", "interval", "callback", "label", "cancelled")
+
+    def __init__(self, deadline: float, callback, interval: float = None, label: str = ""):
+        self.deadline = deadline
+        self.interval = interval
+        self.callback = callback
+        self.label = label
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.time())
+
+
+class Scheduler:
+    """
+    The bot's single timer loop: a heap of absolute deadlines served by one task that sleeps
+    until the earliest is due, instead of a sleeping task per timer. Deadlines are wall-clock
+    times, so they can be persisted and re-armed after a restart; the loop wakes at least every
+    MaxSleep seconds so a clock change or a suspended host can't make it oversleep by much.
+    Callbacks may be coroutine functions; each firing runs in its own task, so a slow one
+    never delays the others. Cancelled timers are dropped lazily when they reach the top.
+    """
+
+    MaxSleep = 60
+
+    def __init__(self):
+        self._heap = []
+        self._order = itertools.count()
+        self._changed = None
+        self._task = None
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, timer in self._heap if not timer.cancelled)
+
+    def call_at(self, deadline: float, callback, label: str = "") -> Timer:
+        return self._push(Timer(deadline, callback, label=label))
+
+    def call_later(self, delay: float, callback, label: str = "") -> Timer:
+        return self._push(Timer(time.time() + delay, callback, label=label))
+
+    def call_every(self, interval: float, callback, label: str = "", first: float = None) -> Timer:
+        """Call `callback` every `interval` seconds, the first time after `first` seconds (default: one interval)."""
+        delay = interval if first is None else first
+        return self._push(Timer(time.time() + delay, callback, interval=interval, label=label))
+
+    def pending(self) -> list:
+        """Live timers, soonest first."""
+        return [timer for _, _, timer in sorted(self._heap) if not timer.cancelled]
+
+    def _push(self, timer: Timer) -> Timer:
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (timer.deadline, next(self._order), timer))
+        if self._task is None:
+            self._changed = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        elif earliest is None or timer.deadline < earliest:
+            self._changed.set()
+        return timer
+
+    async def _run(self):
+        while True:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            now = time.time()
+            if self._heap and self._heap[0][0] <= now:
+                _, _, timer = heapq.heappop(self._heap)
+                self._fire(timer)
+                if timer.interval and not timer.cancelled:
+                    # Keep to the original cadence, skipping beats missed while the loop was held up.
+                    timer.deadline += timer.interval * max(1, int((now - timer.deadline) // timer.interval) + 1)
+                    heapq.heappush(self._heap, (timer.deadline, next(self._order), timer))
+                continue
+            timeout = min(self._heap[0][0] - now, self.MaxSleep) if self._heap else self.MaxSleep
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, timer: Timer):
+        try:
+            result = timer.callback()
+        except Exception as e:
+            print(f"[scheduler] ❌ Timer {timer.label or timer.callback} failed: {e}")
+            return
+        if inspect.isawaitable(result):
+            asyncio.create_task(self._finish(timer, result))
+
+    @staticmethod
+    async def _finish(timer: Timer, awaitable):
+        try:
+            await awaitable
+        except Exception as e:
+            print(f"[scheduler] ❌ Timer {timer.label or timer.callback} failed: {e}")
+
+
+scheduler = Scheduler()
@@ -1,8 +1,28 @@
 import discord
 import os
+import io
+import time
+import asyncio
+import log_search
 from dotenv import load_dotenv
 from GameSelect import InstanceView
 from server_manager import ServerManager
+from games.base_game import describe_stop
+from admission import REJECT
+from telemetry import TelemetrySampler, start_metrics_server
+from notifier import notifier
+from boot_profile import format_duration
+from instance_config import ConfigWatcher
+from tick_health import estimated_tps
+from backup import BackupManager
+from crash_supervisor import CrashSupervisor
+from wake_listener import WakeListener
+from prewarm import Prewarmer
+from planner import Planner, KINDS, SESSION, format_days
+from sessions import SessionStore
+from log_sink import instance_log_dir
+from loop_monitor import monitor
+from state_store import STATE_DIR
 from discord.commands import Option
 
 load_dotenv()
@@ -10,33 +30,91 @@ load_dotenv()
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 GUILD_ID = int(os.getenv("DISCORD_GUILD_ID"))
 ZERO_TIER_NETWORK_ID = os.getenv("ZEROTIER_NETWORK_ID")
+METRICS_HTTP_PORT = os.getenv("METRICS_HTTP_PORT")
+COMMAND_CHANNEL_ID = os.getenv("COMMAND_CHANNEL_ID")
 
 bot = discord.Bot()
 manager = ServerManager()
+sampler = TelemetrySampler(manager)
+metrics_server = None
+session_backfill = None
+config_watcher = ConfigWatcher(manager.config_path, manager.apply_config)
+backups = BackupManager(manager)
+supervisor = CrashSupervisor(manager)
+prewarmer = Prewarmer(manager)
 
-GAME_CHOICES = list(manager.servers.keys())
-DISPLAY_NAMES = {name: name.capitalize() for name in GAME_CHOICES}
-INSTANCE_CHOICES = {
-    game: list(server.instances.keys())
-    for game, server in manager.servers.items()
-}
-ALL_INSTANCE_NAMES = list({inst for inst_list in INSTANCE_CHOICES.values() for inst in inst_list})
+def command_channel():
+    return bot.get_channel(int(COMMAND_CHANNEL_ID)) if COMMAND_CHANNEL_ID else None
+
+
+# Starts triggered by players joining or by the schedule are announced in the command channel, if there is one.
+waker = WakeListener(manager, command_channel)
+planner = Planner(manager, backups, command_channel)
+
+# Game choices are offered through autocomplete so they follow the instance config as it's reloaded.
+async def game_choices(ctx: discord.AutocompleteContext):
+    typed = (ctx.value or "").lower()
+    return [name.capitalize() for name in manager.game_names if name.startswith(typed)]
+
+
+async def status_choices(ctx: discord.AutocompleteContext):
+    return [*await game_choices(ctx), *(["all"] if "all".startswith((ctx.value or "").lower()) else [])]
+
+
+async def instance_choices(ctx: discord.AutocompleteContext):
+    game = (ctx.options.get("game") or "").lower()
+    typed = (ctx.value or "").lower()
+    return [name for name in manager.instance_names(game) if name.lower().startswith(typed)]
+
+
+async def snapshot_choices(ctx: discord.AutocompleteContext):
+    game = (ctx.options.get("game") or "").lower()
+    instance = ctx.options.get("instance") or ""
+    return [snapshot for snapshot in backups.snapshots(game, instance) if snapshot.startswith(ctx.value or "")][:25]
 
 @bot.event
 async def on_ready():
+    global metrics_server, session_backfill
     print(f"✅ Bot {bot.user} is online.")
-    for server in manager.servers.values():
-        server.cleanup_orphan_process()
+    monitor.start()
+    for runtime in await manager.reattach_instances(bot.get_channel):
+        print(f"🔗 Reattached {runtime.game} instance {runtime.name} (uptime {runtime.uptime})")
+    sampler.start()
+    config_watcher.start()
+    await waker.start()
+    planner.start()
+    if session_backfill is None:
+        session_backfill = asyncio.create_task(backfill_sessions())
+    if METRICS_HTTP_PORT and metrics_server is None:
+        metrics_server = await start_metrics_server(sampler, int(METRICS_HTTP_PORT), notifier)
+
+@bot.before_invoke
+async def time_command(ctx: discord.ApplicationContext):
+    ctx.started_at = time.perf_counter()
+    # How long the interaction waited before its handler ran: gateway, network and a busy loop.
+    waited = time.time() - ctx.interaction.created_at.timestamp()
+    monitor.observe("command.dispatch", max(0.0, waited))
+
+
+@bot.after_invoke
+async def record_command(ctx: discord.ApplicationContext):
+    started_at = getattr(ctx, "started_at", None)
+    if started_at is not None:
+        monitor.observe(f"command.{ctx.command.qualified_name.replace(' ', '.')}", time.perf_counter() - started_at)
+
+
+async def backfill_sessions():
+    try:
+        await manager.backfill_sessions()
+    except Exception as e:
+        print(f"[sessions] ⚠️ Backfilling sessions from old logs failed: {e}")
 
 @bot.slash_command(guild_ids=[GUILD_ID], name="startserver", description="Start a game server.")
 async def startserver(
     ctx: discord.ApplicationContext,
-    game: str = Option(str, "Choose a game", choices=[name.capitalize() for name in manager.servers])
+    game: str = Option(str, "Choose a game", autocomplete=game_choices)
 ):
     await ctx.defer(ephemeral=True)
-    if manager.is_any_server_running():
-        await ctx.respond("❌ A server is already running. Please stop it first.", ephemeral=True)
-        return
     game_key = game.lower()
     server = manager.get_server(game_key)
     
@@ -52,13 +130,16 @@ async def startserver(
 
     elif len(instance_names) == 1:
         instance = instance_names[0]
-        if server.is_running:
+        if server.is_instance_running(instance) and not server.is_instance_in_standby(instance):
             await ctx.respond(f"⚠️ {game} instance {instance} is already running.", ephemeral=True)
             return
 
-        await ctx.respond(f"⏳ Starting {game} instance {instance}...", ephemeral=True)
+        prewarmer.warm(game_key, instance)
         try:
-            await server.start_instance(instance, ctx)
+            decision = await manager.request_start(game_key, instance, ctx)
+            if decision.verdict == REJECT:
+                prewarmer.cancel(game_key, instance)
+            await ctx.respond(decision.message(game, instance), ephemeral=True)
         except Exception as e:
             await ctx.channel.send(f"❌ Failed to start {instance}: {e}")
         return
@@ -67,7 +148,7 @@ async def startserver(
         # Multiple instances, show instance picker
         await ctx.respond(
             f"📦 {game} has multiple instances. Select one:",
-            view=InstanceView(game, manager),
+            view=InstanceView(game, manager, prewarmer),
             ephemeral=True
         )
 
@@ -77,7 +158,7 @@ from GameSelect import StopInstanceView  # new View class for stopping
 @bot.slash_command(guild_ids=[GUILD_ID], name="stopserver", description="Stop a game server.")
 async def stopserver(
     ctx: discord.ApplicationContext,
-    game: str = Option(str, "Choose a game", choices=[name.capitalize() for name in manager.servers])
+    game: str = Option(str, "Choose a game", autocomplete=game_choices)
 ):
     await ctx.defer(ephemeral=True)
     game_key = game.lower()
@@ -95,9 +176,12 @@ async def stopserver(
 
     elif len(instance_names) == 1:
         instance = instance_names[0]
-        if server.is_running:
-            server.stop_instance(instance)
-            await ctx.respond(f"🛑 {game} instance {instance} stopped.", ephemeral=True)
+        if server.is_instance_running(instance):
+            message = await ctx.respond(f"⏳ Stopping {game} instance {instance}...", ephemeral=True)
+            outcome = await server.stop_instance(instance, progress=lambda text: message.edit(content=text))
+            await message.edit(content=describe_stop(game, instance, outcome))
+        elif manager.cancel_restart(game_key, instance):
+            await ctx.respond(f"🛑 Cancelled the automatic restart of {game} instance {instance}.", ephemeral=True)
         else:
             await ctx.respond(f"⚠️ {game} is not running.", ephemeral=True)
         return
@@ -114,13 +198,14 @@ async def stopserver(
 @bot.slash_command(guild_ids=[GUILD_ID], name="status", description="Show server status.")
 async def status(
     ctx: discord.ApplicationContext,
-    game: str = Option(str, "Choose a server or 'all'", choices=[*GAME_CHOICES, "all"])
+    game: str = Option(str, "Choose a server or 'all'", autocomplete=status_choices)
 ):
     await ctx.defer(ephemeral=True)
     lines = []
 
-    if game == "all":
-        targets = manager.servers.items()
+    if game.lower() == "all":
+        # Games that haven't been loaded yet can't have anything running; don't import them just for this.
+        targets = [(name, manager.servers.get(name)) for name in manager.game_names]
     else:
         game = game.lower()
         targets = [(game, manager.get_server(game))]
@@ -129,22 +214,395 @@ async def status(
             return
 
     for name, server in targets:
-        if server.is_running:
+        if server is None:
+            lines.append(f"🔴 **{name.capitalize()}** - not running.")
+            continue
+        running = [runtime for runtime in server.runtimes.values() if runtime.is_running]
+        for runtime in running:
+            where = f" (on {runtime.node.name})" if runtime.node is not None else ""
+            if runtime.in_standby:
+                lines.append(f"💤 **{name.capitalize()}** {runtime.name}{where} - in standby, resumes on start.")
+                continue
+            names = f" ({', '.join(sorted(runtime.players))})" if runtime.players else ""
             lines.append(
-                f"🟢 **{name.capitalize()}** {server.active_instance}\n"
-                f"👥 Players: {server.player_count}\n"
-                f"⏱️ Uptime: {server.uptime}"
+                f"🟢 **{name.capitalize()}** {runtime.name}{where}\n"
+                f"👥 Players: {runtime.player_count}{names}\n"
+                f"⏱️ Uptime: {runtime.uptime}"
             )
-        else:
+        for instance in server.instances:
+            if manager.is_queued(name, instance):
+                lines.append(f"🕒 **{name.capitalize()}** {instance} - waiting for resources.")
+            elif manager.restart_pending(name, instance):
+                lines.append(f"🔁 **{name.capitalize()}** {instance} - restarting after a crash.")
+            elif (name, instance) in waker.listening:
+                lines.append(f"💤 **{name.capitalize()}** {instance} - asleep, starts when someone joins on port {waker.listening[(name, instance)]}.")
+        if not running:
             lines.append(f"🔴 **{name.capitalize()}** - not running.")
 
     await ctx.respond("\n\n".join(lines))
 
 
+@bot.slash_command(guild_ids=[GUILD_ID], name="metrics", description="Show resource usage of running servers.")
+async def metrics(ctx: discord.ApplicationContext):
+    summary = sampler.summary()
+    stats = notifier.metrics()
+    summary = summary or "🔴 No servers are running."
+    latencies = []
+    for name, server in manager.servers.items():
+        for instance in server.instances:
+            starts = server.start_latencies(instance)
+            if starts:
+                parts = [
+                    f"{kind} {latency['median']:.1f}s median, {latency['last']:.1f}s last ({latency['count']})"
+                    for kind, latency in starts.items()
+                ]
+                latencies.append(f"🚀 **{name.capitalize()}** {instance}: " + " · ".join(parts))
+    if latencies:
+        summary += "\n\n**Start-to-ready**\n" + "\n".join(latencies)
+    await ctx.respond(
+        f"{summary}\n\n"
+        f"📨 Discord queue: {stats['queue_depth']} waiting · "
+        f"send latency p50 {stats['latency_p50']:.2f}s / p95 {stats['latency_p95']:.2f}s",
+        ephemeral=True
+    )
+
+
+@bot.slash_command(guild_ids=[GUILD_ID], name="latency", description="Show event-loop lag, stalls and command timings.")
+@discord.default_permissions(administrator=True)
+async def latency(
+    ctx: discord.ApplicationContext,
+    dump: bool = Option(bool, "Also write every histogram and stall stack to a file and attach it", required=False, default=False)
+):
+    summary = monitor.summary() or "⏱️ Nothing measured yet."
+    if not dump:
+        await ctx.respond(summary[:1900], ephemeral=True)
+        return
+    path = os.path.join(STATE_DIR, "latency", f"latency-{time.strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    await asyncio.to_thread(monitor.dump, path, monitor.snapshot())
+    await ctx.respond(f"{summary[:1800]}\n📄 Written to `{path}`", file=discord.File(path), ephemeral=True)
+
+
+@bot.slash_command(guild_ids=[GUILD_ID], name="boottimes", description="Show how long recent boots took, phase by phase.")
+async def boottimes(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Select a game", autocomplete=game_choices)
+):
+    server = manager.get_server(game)
+    if not server:
+        await ctx.respond(f"❌ Unknown game: {game}", ephemeral=True)
+        return
+
+    sections = []
+    for instance in server.instances:
+        prediction = server.boot_history.predict(server.name, instance)
+        if not prediction:
+            sections.append(f"⏱️ **{instance}** - no completed boots recorded yet.")
+            continue
+        lines = [
+            f"⏱️ **{instance}** - ready in {format_duration(prediction['median'])} median, "
+            f"{format_duration(prediction['p90'])} p90 over {prediction['boots']} boots"
+        ]
+        for phase, recent, baseline in server.boot_history.phase_report(server.name, instance):
+            line = f"`{phase:<16}` {format_duration(recent):>6}"
+            if baseline is not None:
+                line += f" (was {format_duration(baseline)})"
+                if recent - baseline >= 5 and recent > baseline * 1.2:
+                    line += f" ⚠️ +{format_duration(recent - baseline)}"
+            lines.append(line)
+        sections.append("\n".join(lines))
+
+    await ctx.respond("\n\n".join(sections), ephemeral=True)
+
+
+@bot.slash_command(guild_ids=[GUILD_ID], name="health", description="Show recent lag and save pauses of a game's instances.")
+async def health(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Select a game", autocomplete=game_choices),
+    minutes: int = Option(int, "How far back to look", min_value=1, required=False, default=60)
+):
+    server = manager.get_server(game.lower())
+    if not server:
+        await ctx.respond(f"❌ Unknown game: {game}", ephemeral=True)
+        return
+
+    sections = []
+    for instance in server.instances:
+        runtime = server.get_runtime(instance)
+        history = server.health(instance)
+        totals = history.window(minutes * 60)
+        state = f"{runtime.player_count} players online" if runtime and runtime.is_running else "not running"
+        lines = [f"🩺 **{instance}** - {state}"]
+        if server.TicksPerSecond:
+            lines.append(
+                f"⏱️ ~{estimated_tps(totals, server.TicksPerSecond):.1f} TPS over the last {minutes} min: "
+                f"{totals['lag_events']} lag warnings, {totals['lag_ms'] / 1000:.0f}s behind, "
+                f"{totals['ticks_skipped']} ticks skipped, worst {totals['worst_lag_ms'] / 1000:.1f}s"
+            )
+        if totals["saves"]:
+            lines.append(f"💾 {totals['saves']} saves, {totals['save_avg_ms']:.0f} ms average, {totals['save_max_ms']:.0f} ms longest")
+        by_players = history.lag_by_players()
+        if by_players and server.TicksPerSecond:
+            lines.append("👥 Lag by players online: " + " · ".join(
+                f"{players}: {behind:.0f}s/h" for players, behind in by_players
+            ))
+        if len(lines) == 1:
+            lines.append("No lag or saves recorded.")
+        sections.append("\n".join(lines))
+
+    await ctx.respond("\n\n".join(sections), ephemeral=True)
+
+
+STATS_PERIODS = {"week": 7, "month": 30, "year": 365, "all": None}
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+@bot.slash_command(guild_ids=[GUILD_ID], name="stats", description="Show who plays, when, and how busy the servers get.")
+async def stats(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Select a game, or leave empty for all", autocomplete=game_choices, required=False, default=None),
+    period: str = Option(str, "How far back to look", choices=list(STATS_PERIODS), required=False, default="month")
+):
+    store = SessionStore.default()
+    days = STATS_PERIODS[period]
+    since = time.time() - days * 86400 if days else 0
+    game = game.lower() if game else None
+    games = [game] if game else manager.game_names
+
+    sections = []
+    top = store.hours_by_player(since, game=game)
+    if top:
+        sections.append(f"🏆 **Hours played ({period})**\n" + "\n".join(
+            f"{rank}. {player} - {hours:.1f} h" for rank, (player, hours) in enumerate(top, 1)
+        ))
+    busiest = store.busiest_hours(since, game=game)
+    if busiest:
+        sections.append("📅 **Busiest hours of the week**\n" + "\n".join(
+            f"{WEEKDAYS[weekday]} {hour:02}:00 - {players:.1f} players on average" for weekday, hour, players in busiest
+        ))
+    instances = []
+    for name in games:
+        server = manager.get_server(name)
+        for instance in manager.instance_names(name):
+            peak = store.peak(name, instance, since)
+            if not peak:
+                continue
+            line = f"👥 **{name.capitalize()}** {instance}: peak {peak[0]} players <t:{int(peak[1])}:R>"
+            if server:
+                line += f" · idle shutdown after {server.idle_timeout(instance):.0f}s"
+            instances.append(line)
+    if instances:
+        sections.append("\n".join(instances))
+
+    await ctx.respond("\n\n".join(sections) or f"📊 No sessions recorded ({period}).", ephemeral=True)
+
+
+@bot.slash_command(guild_ids=[GUILD_ID], name="restore", description="Restore a stopped instance's world from a backup.")
+@discord.default_permissions(administrator=True)
+async def restore(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Select a game", autocomplete=game_choices),
+    instance: str = Option(str, "Select an instance", autocomplete=instance_choices),
+    snapshot: str = Option(str, "Snapshot to restore; leave empty to list them", autocomplete=snapshot_choices, required=False, default=None)
+):
+    await ctx.defer(ephemeral=True)
+    server = manager.get_server(game.lower())
+    if not server or instance not in server.instances:
+        await ctx.respond(f"❌ Unknown instance: {game} {instance}", ephemeral=True)
+        return
+
+    snapshots = backups.snapshots(server.name, instance)
+    if not snapshot:
+        if not snapshots:
+            await ctx.respond(f"💾 No backups of `{instance}` yet.", ephemeral=True)
+            return
+        listed = "\n".join(f"`{name}`" for name in snapshots[:10])
+        await ctx.respond(f"💾 Latest backups of `{instance}` ({len(snapshots)} kept):\n{listed}", ephemeral=True)
+        return
+    if snapshot not in snapshots:
+        await ctx.respond(f"❌ No backup `{snapshot}` of `{instance}`.", ephemeral=True)
+        return
+
+    message = await ctx.respond(f"⏳ Restoring `{instance}` from `{snapshot}`...", ephemeral=True)
+    try:
+        result = await backups.restore(server, instance, snapshot)
+    except Exception as e:
+        await message.edit(content=f"❌ Restore failed: {e}")
+        return
+    kept = f"\n📁 The previous world was kept at `{result['previous_world']}`." if result["previous_world"] else ""
+    await message.edit(content=f"✅ Restored `{instance}` from `{snapshot}` ({result['files']} files).{kept}")
+    notifier.post(ctx.channel, f"♻️ {ctx.author.display_name} restored {game} instance `{instance}` from backup `{snapshot}`.")
+
+
+@bot.slash_command(guild_ids=[GUILD_ID], name="console", description="Run a command on a server's console and show its answer.")
+@discord.default_permissions(administrator=True)
+async def console(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Select a game", autocomplete=game_choices),
+    instance: str = Option(str, "Select an instance", autocomplete=instance_choices),
+    command: str = Option(str, "Console command, e.g. list")
+):
+    await ctx.defer(ephemeral=True)
+    server = manager.get_server(game.lower())
+    runtime = server.get_runtime(instance) if server else None
+    if not runtime or not runtime.is_running:
+        await ctx.respond(f"❌ {game} instance `{instance}` isn't running.", ephemeral=True)
+        return
+    if runtime.in_standby:
+        await ctx.respond(f"💤 `{instance}` is in standby; start it first.", ephemeral=True)
+        return
+    if not runtime.console.available:
+        await ctx.respond(f"❌ `{instance}` was started before the bot's last restart, so its console isn't reachable.", ephemeral=True)
+        return
+
+    print(f"[console] {ctx.author} on {server.name}:{instance}: {command}")
+    lines = await runtime.console.run(command)
+    output = "\n".join(lines) or "(no output)"
+    await ctx.respond(f"🖥️ `{instance}` > `{command}`\n```\n{output[-1800:]}\n```", ephemeral=True)
+
+
+logs = bot.create_group(
+    "logs", "Read the servers' console logs.", guild_ids=[GUILD_ID],
+    default_member_permissions=discord.Permissions(administrator=True)
+)
+
+# Results longer than fit in a message go out as attachments of this size, at most LOG_PAGES of them.
+LOG_PAGE_BYTES = 512 * 1024
+LOG_PAGES = 10
+
+
+async def send_log_lines(ctx: discord.ApplicationContext, title: str, lines: list, filename: str, truncated: bool = False):
+    text = "\n".join(lines)
+    note = "\n⚠️ Cut off; narrow the time window or the pattern." if truncated else ""
+    if len(text) <= 1800:
+        await ctx.respond(f"{title}\n```\n{text or '(nothing)'}\n```{note}", ephemeral=True)
+        return
+    pages, page = [], []
+    size = 0
+    for line in lines:
+        encoded = line.encode("utf-8") + b"\n"
+        if page and size + len(encoded) > LOG_PAGE_BYTES:
+            pages.append(b"".join(page))
+            page, size = [], 0
+        page.append(encoded)
+        size += len(encoded)
+    pages.append(b"".join(page))
+    if len(pages) > LOG_PAGES:
+        pages = pages[:LOG_PAGES]
+        note = "\n⚠️ Only the first pages are attached; narrow the time window or the pattern."
+    files = [discord.File(io.BytesIO(data), filename=f"{filename}-p{number}.log") for number, data in enumerate(pages, 1)]
+    await ctx.respond(f"{title} ({len(lines)} lines){note}", files=files, ephemeral=True)
+
+
+@logs.command(name="tail", description="Show the last lines of an instance's log.")
+async def logs_tail(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Select a game", autocomplete=game_choices),
+    instance: str = Option(str, "Select an instance", autocomplete=instance_choices),
+    lines: int = Option(int, "How many lines", min_value=1, max_value=5000, required=False, default=50)
+):
+    await ctx.defer(ephemeral=True)
+    server = manager.get_server(game.lower())
+    if not server or instance not in server.instances:
+        await ctx.respond(f"❌ Unknown instance: {game} {instance}", ephemeral=True)
+        return
+    found = await asyncio.to_thread(log_search.tail, instance_log_dir(server.name, instance), lines)
+    await send_log_lines(ctx, f"📜 Last lines of `{instance}`", found, f"{instance}-tail")
+
+
+@logs.command(name="search", description="Find lines in an instance's log, optionally within a time window.")
+async def logs_search(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Select a game", autocomplete=game_choices),
+    instance: str = Option(str, "Select an instance", autocomplete=instance_choices),
+    pattern: str = Option(str, "Text or regular expression, case-insensitive"),
+    since: str = Option(str, "From, e.g. 21:30, yesterday 21:30, 2026-10-16 21:30 or 2h", required=False, default=None),
+    until: str = Option(str, "Until, in the same forms", required=False, default=None)
+):
+    await ctx.defer(ephemeral=True)
+    server = manager.get_server(game.lower())
+    if not server or instance not in server.instances:
+        await ctx.respond(f"❌ Unknown instance: {game} {instance}", ephemeral=True)
+        return
+    try:
+        start, end = log_search.parse_when(since), log_search.parse_when(until)
+    except ValueError as e:
+        await ctx.respond(f"❌ {e}", ephemeral=True)
+        return
+    found, truncated = await asyncio.to_thread(
+        log_search.search, instance_log_dir(server.name, instance), pattern, start, end
+    )
+    window = "".join([f" since <t:{int(start)}:f>" if start else "", f" until <t:{int(end)}:f>" if end else ""])
+    await send_log_lines(ctx, f"🔎 `{pattern}` in `{instance}`{window}", found, f"{instance}-search", truncated)
+
+
+schedule = bot.create_group(
+    "schedule", "Plan sessions, stop windows and maintenance.", guild_ids=[GUILD_ID],
+    default_member_permissions=discord.Permissions(administrator=True)
+)
+
+SCHEDULE_KIND_NOTES = {
+    "session": "up and ready from {clock} for {duration}",
+    "stop": "kept stopped from {clock} for {duration}",
+    "backup": "backed up at {clock}",
+    "compact": "logs compacted at {clock}",
+}
+
+
+def describe_schedule(entry: dict) -> str:
+    note = SCHEDULE_KIND_NOTES[entry["kind"]].format(clock=entry["clock"], duration=format_duration(entry["duration"]))
+    line = f"`#{entry['id']}` **{entry['game'].capitalize()}** {entry['instance']}: {note}, {format_days(entry['days'])}"
+    line += f" · next <t:{int(planner.next_start(entry))}:R>"
+    if entry["kind"] == SESSION:
+        line += f", started {format_duration(planner.lead(entry))} ahead"
+    return line
+
+
+@schedule.command(name="add", description="Add a recurring session, stop window, backup or log compaction.")
+async def schedule_add(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Select a game", autocomplete=game_choices),
+    instance: str = Option(str, "Select an instance", autocomplete=instance_choices),
+    kind: str = Option(str, "What to schedule", choices=list(KINDS)),
+    at: str = Option(str, "Time of day, HH:MM"),
+    days: str = Option(str, "daily, weekdays, weekends, mon,wed,fri or mon-fri", required=False, default="daily"),
+    duration: str = Option(str, "How long a session or stop window lasts, e.g. 3h or 1h30m", required=False, default=None)
+):
+    try:
+        entry = planner.add(game, instance, kind, days, at, duration)
+    except ValueError as e:
+        await ctx.respond(f"❌ {e}", ephemeral=True)
+        return
+    await ctx.respond(f"📅 Scheduled {describe_schedule(entry)}", ephemeral=True)
+
+
+@schedule.command(name="list", description="List the schedule.")
+async def schedule_list(
+    ctx: discord.ApplicationContext,
+    game: str = Option(str, "Only this game", autocomplete=game_choices, required=False, default=None)
+):
+    entries = planner.entries(game)
+    if not entries:
+        await ctx.respond("📅 Nothing is scheduled.", ephemeral=True)
+        return
+    await ctx.respond("📅 **Schedule**\n" + "\n".join(map(describe_schedule, entries))[:1900], ephemeral=True)
+
+
+@schedule.command(name="remove", description="Remove an entry from the schedule.")
+async def schedule_remove(
+    ctx: discord.ApplicationContext,
+    entry: int = Option(int, "The entry's number, from /schedule list")
+):
+    removed = planner.remove(entry)
+    if removed is None:
+        await ctx.respond(f"❌ There is no schedule entry #{entry}.", ephemeral=True)
+        return
+    await ctx.respond(f"🗑️ Removed schedule entry #{entry} ({removed['kind']} of `{removed['instance']}`).", ephemeral=True)
+
+
 @bot.slash_command(guild_ids=[GUILD_ID], name="info", description="Show info about a game server.")
 async def info(
     ctx: discord.ApplicationContext,
-    game: str = Option(str, "Select a game", choices=[name.capitalize() for name in GAME_CHOICES])
+    game: str = Option(str, "Select a game", autocomplete=game_choices)
 ):
     game_key = game.lower()
     server = manager.get_server(game_key)
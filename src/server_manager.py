@@ -1,18 +1,353 @@
 # server_manager.py
 
-from games.minecraft import MinecraftServer
-from games.valheim import ValheimServer
+import types
+import asyncio
+
+import instance_config
+from games import registry
+from scheduler import scheduler
+from state_store import StateStore
+from log_sink import instance_log_dir
+from sessions import SessionStore, backfill
+from admission import AdmissionController, Decision, HostStats, QUEUE, REJECT, RESUME, MEMORY, process_tree_rss_mb
+from node_client import NodePool
+from notifier import notifier
+
+# Name of the bot's own host in an instance's `nodes` list.
+LOCAL_NODE = "local"
 
 class ServerManager:
-    def __init__(self):
-        self.servers = {
-            "minecraft": MinecraftServer(),
-            "valheim": ValheimServer(),
-        }
+    # How long a queued start waits for resources before giving up, and how often it re-checks.
+    QUEUE_TIMEOUT = 15 * 60
+    QUEUE_RECHECK_INTERVAL = 15
+
+    def __init__(self, admission: AdmissionController = None, config_path: str = None, nodes: NodePool = None):
+        self.config_path = config_path or instance_config.default_path()
+        self._config = {}
+        # Game servers are created, and their modules imported, the first time they're needed.
+        self.servers = {}
+        self.admission = admission or AdmissionController()
+        self.nodes = nodes or NodePool.from_env()
+        self._queued = {}
+        # Instances a request_start is working on right now.
+        self._starting = set()
+        self._restarts = {}
+        self._capacity_changed = asyncio.Event()
+        self._start_listeners = []
+        self._exit_listeners = [self._on_instance_exit]
+        self._stop_listeners = []
+        self._config_listeners = []
+        # Instances that mustn't be started right now, with the reason.
+        self._busy = {}
+        self._start_guards = []
+        self.apply_config(instance_config.load(self.config_path))
+
+    @property
+    def game_names(self) -> list:
+        """Every configured game, whether or not its server has been loaded yet."""
+        return list(self._config)
+
+    def instance_names(self, game: str) -> list:
+        entry = self._config.get(game.lower())
+        return list(entry["instances"]) if entry else []
+
+    def instance_config(self, game: str, instance: str) -> dict:
+        """An instance's config as currently loaded, without loading its game."""
+        entry = self._config.get(game.lower())
+        return (entry["instances"].get(instance) if entry else None) or {}
 
     def get_server(self, name: str):
-        return self.servers.get(name.lower())
-    
+        name = name.lower()
+        server = self.servers.get(name)
+        if server is None and name in self._config:
+            try:
+                server = self._load(name)
+            except Exception as e:
+                print(f"[{name}] ❌ Failed to load game: {e}")
+        return server
+
+    def _load(self, name: str):
+        server = registry.game_class(name)(self._config[name]["instances"])
+        for callback in self._start_listeners:
+            server.add_start_listener(callback)
+        for callback in self._exit_listeners:
+            server.add_exit_listener(callback)
+        for callback in self._stop_listeners:
+            server.add_stop_listener(callback)
+        self.servers[name] = server
+        return server
+
+    def apply_config(self, config: dict):
+        """
+        Switch to new instance definitions. Loaded games get their new instances right away;
+        running instances keep going with the config they were started with.
+        """
+        for game, entry in config.items():
+            if entry["class"]:
+                registry.register(game, entry["class"])
+        games = {}
+        for game, entry in config.items():
+            if registry.is_registered(game):
+                games[game] = entry
+            else:
+                print(f"[config] ⚠️ Ignoring unknown game '{game}'.")
+        self._config = games
+        for name, server in self.servers.items():
+            entry = games.get(name)
+            server.instances = entry["instances"] if entry else {}
+        print(f"[config] Loaded {sum(len(entry['instances']) for entry in games.values())} instances of {len(games)} games.")
+        for callback in self._config_listeners:
+            callback()
+
+    def add_config_listener(self, callback):
+        """Call `callback()` after every reload of the instance config."""
+        self._config_listeners.append(callback)
+
+    def add_start_listener(self, callback):
+        """Register `callback(server, runtime)` on every game, including ones loaded later."""
+        self._start_listeners.append(callback)
+        for server in self.servers.values():
+            server.add_start_listener(callback)
+
+    def add_exit_listener(self, callback):
+        self._exit_listeners.append(callback)
+        for server in self.servers.values():
+            server.add_exit_listener(callback)
+
+    def add_stop_listener(self, callback):
+        self._stop_listeners.append(callback)
+        for server in self.servers.values():
+            server.add_stop_listener(callback)
+
+    def mark_busy(self, game: str, instance: str, reason: str):
+        """Refuse to start an instance until `clear_busy`, e.g. while its world is being restored."""
+        self._busy[(game.lower(), instance)] = reason
+
+    def clear_busy(self, game: str, instance: str):
+        self._busy.pop((game.lower(), instance), None)
+
+    def busy_reason(self, game: str, instance: str):
+        return self._busy.get((game.lower(), instance)) or self._guard_reason(game.lower(), instance)
+
+    def add_start_guard(self, callback):
+        """Consult `callback(game, instance)` before every start; a reason it returns refuses the start."""
+        self._start_guards.append(callback)
+
+    def _guard_reason(self, game: str, instance: str):
+        for guard in self._start_guards:
+            reason = guard(game, instance)
+            if reason:
+                return reason
+        return None
+
     def is_any_server_running(self) -> bool:
         """Check if any server is currently running."""
         return any(server.is_running for server in self.servers.values())
+
+    async def reattach_instances(self, resolve_channel) -> list:
+        """Re-adopt servers a previous bot run left running, loading only the games that have some."""
+        games = {record["game"] for record in StateStore.default().all()}
+        servers = [server for server in map(self.get_server, games) if server is not None]
+        adopted = await asyncio.gather(*(server.reattach(resolve_channel, self.nodes.get) for server in servers))
+        return [runtime for runtimes in adopted for runtime in runtimes]
+
+    async def backfill_sessions(self) -> int:
+        """Record player sessions from the logs instances wrote before session recording began."""
+        sources = []
+        for game in self.game_names:
+            if not registry.game_class(game).LogTimePattern:
+                continue
+            for instance in self.instance_names(game):
+                sources.append((game, instance, registry.GAMES[game], instance_log_dir(game, instance)))
+        return await backfill(SessionStore.default(), sources)
+
+    @property
+    def running_instances(self) -> dict:
+        """Running instances of every game, keyed by (game, instance)."""
+        return {
+            runtime.key: runtime
+            for server in self.servers.values()
+            for runtime in server.runtimes.values()
+            if runtime.is_running
+        }
+
+    def is_queued(self, game: str, instance: str) -> bool:
+        return (game.lower(), instance) in self._queued
+
+    def schedule_restart(self, game: str, instance: str, delay: float, channel):
+        """Start an instance again after `delay` seconds, through the usual admission checks."""
+        key = (game.lower(), instance)
+        self.cancel_restart(*key)
+        self._restarts[key] = scheduler.call_later(
+            delay, lambda: self._restart(key, channel), label=f"restart {game}:{instance}"
+        )
+
+    def cancel_restart(self, game: str, instance: str) -> bool:
+        """Drop a scheduled restart; False if there was none."""
+        timer = self._restarts.pop((game.lower(), instance), None)
+        if timer is None:
+            return False
+        timer.cancel()
+        return True
+
+    def restart_pending(self, game: str, instance: str) -> bool:
+        return (game.lower(), instance) in self._restarts
+
+    async def _restart(self, key: tuple, channel):
+        game, instance = key
+        self._restarts.pop(key, None)
+        if self.get_server(game).is_instance_running(instance):
+            return
+        decision = await self.request_start(game, instance, types.SimpleNamespace(channel=channel))
+        # An accepted start announces itself through the boot status message.
+        if channel is not None and not decision.accepted:
+            notifier.post(channel, decision.message(game, f"`{instance}`"))
+
+    async def evaluate(self, game: str, instance: str) -> Decision:
+        server = self.get_server(game)
+        host = await HostStats.local()
+        return self.admission.evaluate(server.footprint(instance), host, reserved_mb=self._booting_reservation_mb())
+
+    async def request_start(self, game: str, instance: str, ctx) -> Decision:
+        """Start an instance if the host has room for it, otherwise queue or reject the request."""
+        game = game.lower()
+        key = (game, instance)
+        # Claimed before the first await: players, the schedule and crash restarts can all ask at once.
+        if key in self._starting:
+            return Decision(REJECT, "it is already starting")
+        self._starting.add(key)
+        try:
+            return await self._request_start(game, instance, ctx)
+        finally:
+            self._starting.discard(key)
+
+    async def _request_start(self, game: str, instance: str, ctx) -> Decision:
+        server = self.get_server(game)
+        # Starting by hand supersedes an automatic restart after a crash.
+        self.cancel_restart(game, instance)
+        if server.is_instance_in_standby(instance):
+            latency = await server.resume_instance(instance, ctx.channel)
+            return Decision(RESUME, f"resumed from standby in {latency:.1f}s")
+        if server.is_instance_running(instance):
+            return Decision(REJECT, "it is already running")
+        reason = self.busy_reason(game, instance)
+        if reason:
+            return Decision(REJECT, reason)
+        if (game, instance) in self._queued:
+            return Decision(QUEUE, "it is already waiting for resources")
+
+        decision, node = await self._place(game, instance)
+        if decision.accepted:
+            await server.start_instance(instance, ctx, node=node)
+        elif decision.verdict == QUEUE:
+            self._queued[(game, instance)] = asyncio.create_task(self._start_when_admitted(game, instance, ctx))
+        return decision
+
+    async def _start_when_admitted(self, game: str, instance: str, ctx):
+        server = self.get_server(game)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.QUEUE_TIMEOUT
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._capacity_changed.wait(), timeout=self.QUEUE_RECHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+                if self.busy_reason(game, instance):
+                    continue
+                decision, node = await self._place(game, instance)
+                if decision.accepted:
+                    where = f" on node {decision.node}" if decision.node else ""
+                    notifier.post(ctx.channel, f"▶️ Resources are free, starting queued {game} instance {instance}{where}.")
+                    await server.start_instance(instance, ctx, node=node)
+                    return
+                if decision.verdict == REJECT or loop.time() >= deadline:
+                    notifier.post(ctx.channel, f"❌ Gave up on queued {game} instance {instance}: {decision.reason}.")
+                    return
+        finally:
+            self._queued.pop((game, instance), None)
+
+    async def _place(self, game: str, instance: str) -> tuple:
+        """
+        Choose where to start an instance: of the hosts its `nodes` list allows ("local" is
+        this one, and the default), the one admitting it with the most memory to spare.
+        Returns the decision and the node agent client, None for this host. Standbys here are
+        only evicted when no host has room as things stand.
+        """
+        server = self.get_server(game)
+        allowed = (server.get_instance(instance) or {}).get("nodes") or [LOCAL_NODE]
+        if allowed == [LOCAL_NODE]:
+            return await self._evict_standbys_for(game, instance), None
+
+        footprint = server.footprint(instance)
+        decisions = []
+        best = None
+        for name in allowed:
+            node = None
+            if name == LOCAL_NODE:
+                host = await HostStats.local()
+            else:
+                node = self.nodes.get(name)
+                if node is None:
+                    decisions.append(Decision(REJECT, f"node {name} isn't configured in NODE_AGENTS"))
+                    continue
+                try:
+                    host = await node.host_stats()
+                except Exception as e:
+                    decisions.append(Decision(QUEUE, f"node {name} is unreachable ({e})"))
+                    continue
+            reserved_mb = self._booting_reservation_mb(node)
+            decision = self.admission.evaluate(footprint, host, reserved_mb=reserved_mb)
+            decisions.append(decision)
+            spare_mb = host.available_mb - reserved_mb
+            if decision.accepted and (best is None or spare_mb > best[0]):
+                best = (spare_mb, node, Decision(decision.verdict, decision.reason, decision.resource, node.name if node else None))
+        if best is not None:
+            return best[2], best[1]
+
+        if LOCAL_NODE in allowed:
+            decision = await self._evict_standbys_for(game, instance)
+            if decision.accepted:
+                return decision, None
+        # Queue if waiting for resources could help anywhere, otherwise pass on the first refusal.
+        queued = [decision for decision in decisions if decision.verdict == QUEUE]
+        return (queued or decisions)[0], None
+
+    @property
+    def standby_instances(self) -> list:
+        """Instances in warm standby on this host, longest suspended first."""
+        standbys = [runtime for runtime in self.running_instances.values() if runtime.in_standby and runtime.node is None]
+        return sorted(standbys, key=lambda runtime: runtime.standby_since)
+
+    async def _evict_standbys_for(self, game: str, instance: str) -> Decision:
+        """
+        Evaluate a start, stopping suspended instances (oldest first) while the only thing
+        in its way is memory. Standbys hold RAM for a faster restart, so they yield first.
+        """
+        decision = await self.evaluate(game, instance)
+        for runtime in self.standby_instances:
+            if decision.accepted or decision.resource != MEMORY:
+                break
+            if runtime.channel is not None:
+                notifier.post(runtime.channel, f"♻️ Stopping `{runtime.name}` in standby to make room for {game} instance `{instance}`.")
+            await self.get_server(runtime.game).stop_instance(runtime.name)
+            decision = await self.evaluate(game, instance)
+        return decision
+
+    def _on_instance_exit(self, server, runtime):
+        # Wake every queued start; replacing the event avoids one waiter clearing it for the others.
+        self._capacity_changed.set()
+        self._capacity_changed = asyncio.Event()
+
+    def _booting_reservation_mb(self, node=None) -> float:
+        """Memory promised to instances still booting on `node` (None for this host)."""
+        reserved = 0.0
+        for (game, instance), runtime in self.running_instances.items():
+            if runtime.ready or runtime.node is not node:
+                continue
+            footprint = self.get_server(game).footprint(instance)["memory_mb"]
+            # A remote tree's usage isn't visible here; keep its whole footprint until it's ready.
+            used_mb = process_tree_rss_mb(runtime.pid) if node is None else 0.0
+            reserved += max(0.0, footprint - used_mb)
+        return reserved
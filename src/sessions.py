@@ -0,0 +1,415 @@
+# sessions.py
+
+import os
+import re
+import gzip
+import time
+import sqlite3
+import asyncio
+import datetime
+import importlib
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from state_store import STATE_DIR
+from log_sink import segment_name, segment_started_at
+
+HOUR = 3600
+WEEK_HOURS = 7 * 24
+# Events recorded per transaction when backfilling, so the event loop is never held for long.
+REPLAY_BATCH_EVENTS = 2000
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+class _Occupancy:
+    """What is known about who is on an instance right now, while recording or replaying."""
+
+    def __init__(self, players: dict = None, count: int = 0, since: float = None, last_seen: float = None):
+        # Player name -> join time, players online, when that count began and when anything
+        # was last heard from the instance.
+        self.players = players or {}
+        self.count = count
+        self.since = since
+        self.last_seen = last_seen
+        # Replaying only: whether the current run of the server has logged its ready line.
+        self.ready_seen = False
+
+
+class SessionStore:
+    """
+    Player sessions of every instance, recorded from join and leave lines as they happen and
+    backfilled from old console logs. Finished sessions are only ever appended; sessions still
+    open live in their own small table until the player leaves. Alongside them the store keeps
+    every change of the number of players online, and the player-seconds spent on each
+    instance per hour, so /stats answers from indexed ranges and a few thousand hourly rows
+    however many years of sessions there are.
+    """
+
+    # Time from the last player leaving to the next one joining, counted as "coming back"
+    # when suggesting an idle shutdown timeout, and the gaps needed before suggesting one.
+    ReturnWindow = 30 * 60
+    MinReturns = 10
+    ReturnPercentile = 0.8
+
+    DEFAULT_PATH = os.path.join(STATE_DIR, "sessions.db")
+
+    _shared = {}
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " game TEXT NOT NULL, instance TEXT NOT NULL, player TEXT NOT NULL,"
+            " joined_at REAL NOT NULL, left_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS sessions_by_end ON sessions (left_at);"
+            "CREATE INDEX IF NOT EXISTS sessions_by_player ON sessions (player, left_at);"
+            "CREATE TABLE IF NOT EXISTS open_sessions ("
+            " game TEXT NOT NULL, instance TEXT NOT NULL, player TEXT NOT NULL, joined_at REAL NOT NULL,"
+            " PRIMARY KEY (game, instance, player));"
+            # One row per change of the player count; `event` is join, leave, check or reset.
+            "CREATE TABLE IF NOT EXISTS occupancy ("
+            " game TEXT NOT NULL, instance TEXT NOT NULL, at REAL NOT NULL, players INTEGER NOT NULL, event TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS occupancy_by_instance ON occupancy (game, instance, at);"
+            "CREATE TABLE IF NOT EXISTS hourly ("
+            " game TEXT NOT NULL, instance TEXT NOT NULL, hour INTEGER NOT NULL, player_seconds REAL NOT NULL,"
+            " PRIMARY KEY (game, instance, hour));"
+            "CREATE TABLE IF NOT EXISTS backfilled ("
+            " game TEXT NOT NULL, instance TEXT NOT NULL, segment TEXT NOT NULL, PRIMARY KEY (game, instance, segment));"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL);"
+        )
+        # Live recording began here; older history can only come from backfilling logs.
+        self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('recording_since', ?)", (time.time(),))
+        self.recording_since = self._db.execute("SELECT value FROM meta WHERE key = 'recording_since'").fetchone()[0]
+        self._live = {}
+
+    @classmethod
+    def shared(cls, path: str):
+        store = cls._shared.get(path)
+        if store is None:
+            store = cls._shared[path] = cls(path)
+        return store
+
+    @classmethod
+    def default(cls):
+        return cls.shared(cls.DEFAULT_PATH)
+
+    # Recording
+
+    def _state(self, game: str, instance: str) -> _Occupancy:
+        state = self._live.get((game, instance))
+        if state is None:
+            players = dict(self._db.execute(
+                "SELECT player, joined_at FROM open_sessions WHERE game = ? AND instance = ?", (game, instance)
+            ).fetchall())
+            last = self._db.execute(
+                "SELECT at, players FROM occupancy WHERE game = ? AND instance = ? ORDER BY at DESC LIMIT 1", (game, instance)
+            ).fetchone()
+            state = _Occupancy(players, last[1] if last else 0, last[0] if last else None, last[0] if last else None)
+            self._live[(game, instance)] = state
+        return state
+
+    def joined(self, game: str, instance: str, player: str, count: int, at: float = None):
+        at = at or time.time()
+        state = self._state(game, instance)
+        if player:
+            self._open(game, instance, state, player, at, persist=True)
+        self._set_count(game, instance, state, count, at, "join")
+
+    def left(self, game: str, instance: str, player: str, count: int, at: float = None):
+        at = at or time.time()
+        state = self._state(game, instance)
+        if player:
+            self._close(game, instance, state, player, at, persist=True)
+        self._set_count(game, instance, state, count, at, "leave")
+
+    def checked(self, game: str, instance: str, count: int, names: set = None, at: float = None):
+        """The server's own list of who is online, correcting what join and leave lines said."""
+        at = at or time.time()
+        state = self._state(game, instance)
+        if names is not None:
+            for player in set(state.players) - names:
+                self._close(game, instance, state, player, at, persist=True)
+            for player in names - set(state.players):
+                self._open(game, instance, state, player, at, persist=True)
+        if count != state.count:
+            self._set_count(game, instance, state, count, at, "check")
+
+    def started(self, game: str, instance: str):
+        """
+        The instance is up with nobody on it yet. If its last exit went unseen (the bot was
+        down), whoever was still on it is taken to have left when it was last heard from.
+        """
+        state = self._state(game, instance)
+        self._reset(game, instance, state, state.last_seen or time.time(), persist=True)
+
+    def stopped(self, game: str, instance: str, at: float = None):
+        """The instance's process is gone, and with it whoever was still on it."""
+        self._reset(game, instance, self._state(game, instance), at or time.time(), persist=True)
+
+    def _open(self, game, instance, state, player, at, persist):
+        if player in state.players:
+            return
+        state.players[player] = at
+        if persist:
+            self._db.execute(
+                "INSERT OR REPLACE INTO open_sessions (game, instance, player, joined_at) VALUES (?, ?, ?, ?)",
+                (game, instance, player, at),
+            )
+
+    def _close(self, game, instance, state, player, at, persist):
+        joined_at = state.players.pop(player, None)
+        if joined_at is None:
+            return
+        self._db.execute(
+            "INSERT INTO sessions (game, instance, player, joined_at, left_at) VALUES (?, ?, ?, ?, ?)",
+            (game, instance, player, joined_at, max(at, joined_at)),
+        )
+        if persist:
+            self._db.execute(
+                "DELETE FROM open_sessions WHERE game = ? AND instance = ? AND player = ?", (game, instance, player)
+            )
+
+    def _reset(self, game, instance, state, at, persist):
+        for player in list(state.players):
+            self._close(game, instance, state, player, at, persist)
+        if state.count:
+            self._set_count(game, instance, state, 0, at, "reset")
+
+    def _set_count(self, game, instance, state, count, at, event):
+        count = max(0, count)
+        if state.since is not None and state.count and at > state.since:
+            self._add_player_seconds(game, instance, state.since, at, state.count)
+        state.count = count
+        state.since = at
+        state.last_seen = at
+        self._db.execute(
+            "INSERT INTO occupancy (game, instance, at, players, event) VALUES (?, ?, ?, ?, ?)",
+            (game, instance, at, count, event),
+        )
+
+    def _add_player_seconds(self, game, instance, begin: float, end: float, players: int):
+        rows = []
+        hour = int(begin // HOUR)
+        while hour * HOUR < end:
+            overlap = min(end, (hour + 1) * HOUR) - max(begin, hour * HOUR)
+            rows.append((game, instance, hour, overlap * players))
+            hour += 1
+        self._db.executemany(
+            "INSERT INTO hourly (game, instance, hour, player_seconds) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (game, instance, hour) DO UPDATE SET player_seconds = player_seconds + excluded.player_seconds",
+            rows,
+        )
+
+    # Queries
+
+    def hours_by_player(self, since: float, until: float = None, game: str = None, limit: int = 10) -> list:
+        """(player, hours) of the players who played the most between `since` and `until`."""
+        until = until or time.time()
+        where, args = "left_at > ? AND joined_at < ?", [since, until]
+        if game:
+            where += " AND game = ?"
+            args.append(game)
+        totals = dict(self._db.execute(
+            f"SELECT player, SUM(MIN(left_at, ?) - MAX(joined_at, ?)) FROM sessions WHERE {where} GROUP BY player",
+            (until, since, *args),
+        ).fetchall())
+        for player, joined_at in self._db.execute(
+            "SELECT player, joined_at FROM open_sessions WHERE joined_at < ?" + (" AND game = ?" if game else ""),
+            (until, game) if game else (until,),
+        ):
+            totals[player] = totals.get(player, 0.0) + until - max(joined_at, since)
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        return [(player, seconds / HOUR) for player, seconds in ranked[:limit]]
+
+    def peak(self, game: str, instance: str, since: float = 0):
+        """(players, when) of the most players online at once since `since`, or None."""
+        row = self._db.execute(
+            "SELECT players, at FROM occupancy WHERE game = ? AND instance = ? AND at >= ?"
+            " ORDER BY players DESC, at DESC LIMIT 1",
+            (game, instance, since),
+        ).fetchone()
+        return tuple(row) if row and row[0] else None
+
+    def busiest_hours(self, since: float = 0, game: str = None, limit: int = 3) -> list:
+        """
+        (weekday, hour, average players) of the busiest hours of the week in local time,
+        weekday 0 being Monday. Daylight saving shifts are ignored.
+        """
+        offset = time.localtime().tm_gmtoff // HOUR
+        where, args = "hour >= ?", [int(since // HOUR)]
+        if game:
+            where += " AND game = ?"
+            args.append(game)
+        # The epoch began on a Thursday, the fourth day of the week.
+        rows = self._db.execute(
+            f"SELECT (hour + ? + 72) % {WEEK_HOURS} AS slot, SUM(player_seconds), MIN(hour), MAX(hour)"
+            f" FROM hourly WHERE {where} GROUP BY slot ORDER BY 2 DESC LIMIT ?",
+            (offset, *args, limit),
+        ).fetchall()
+        busiest = []
+        for slot, seconds, first, last in rows:
+            weeks = max(1, (last - first) // WEEK_HOURS + 1)
+            busiest.append((slot // 24, slot % 24, seconds / HOUR / weeks))
+        return busiest
+
+    def suggest_idle_timeout(self, game: str, instance: str, floor: float, since: float = 0):
+        """
+        Seconds an empty instance should stay up so that most players who come back find it
+        running: a high percentile of the gaps between the last player leaving and the next
+        one joining, over gaps shorter than ReturnWindow. None until there are enough of them.
+        """
+        gaps = []
+        emptied_at = None
+        for at, players, event in self._db.execute(
+            "SELECT at, players, event FROM occupancy WHERE game = ? AND instance = ? AND at >= ? ORDER BY at",
+            (game, instance, since),
+        ):
+            if event == "leave" and players == 0:
+                emptied_at = at
+            elif event == "join" and emptied_at is not None:
+                if at - emptied_at <= self.ReturnWindow:
+                    gaps.append(at - emptied_at)
+                emptied_at = None
+        if len(gaps) < self.MinReturns:
+            return None
+        gaps.sort()
+        return max(floor, gaps[min(len(gaps) - 1, int(len(gaps) * self.ReturnPercentile))])
+
+    # Backfill
+
+    def backfilled_segments(self, game: str, instance: str) -> set:
+        return {row[0] for row in self._db.execute(
+            "SELECT segment FROM backfilled WHERE game = ? AND instance = ?", (game, instance)
+        )}
+
+    def replay(self, game: str, instance: str, segments: list, state: _Occupancy = None, final: bool = True) -> _Occupancy:
+        """
+        Record the sessions found in old log segments, given in order as (name, events) pairs,
+        in one transaction. Anything from after live recording began is left out. A long
+        history goes in batches: pass the returned state on to the next call, and `final` only
+        with the last one, which closes whatever was still open.
+        """
+        state = state or _Occupancy()
+        self._db.execute("BEGIN")
+        try:
+            for name, events in segments:
+                for at, kind, player, count in events:
+                    if at >= self.recording_since:
+                        break
+                    if kind == "ready":
+                        # Some games repeat their ready line; only the first one of a run starts
+                        # it. A run that ended without a stopping line ended when last heard from.
+                        if not state.ready_seen:
+                            self._reset(game, instance, state, state.last_seen or at, persist=False)
+                        state.ready_seen = True
+                    elif kind == "stopping":
+                        self._reset(game, instance, state, at, persist=False)
+                        state.ready_seen = False
+                    elif kind == "joined":
+                        if player:
+                            self._open(game, instance, state, player, at, persist=False)
+                        self._set_count(game, instance, state, state.count + 1 if count is None else count, at, "join")
+                    elif kind == "left":
+                        if player:
+                            self._close(game, instance, state, player, at, persist=False)
+                        self._set_count(game, instance, state, state.count - 1 if count is None else count, at, "leave")
+                    state.last_seen = at
+                self._db.execute(
+                    "INSERT OR IGNORE INTO backfilled (game, instance, segment) VALUES (?, ?, ?)", (game, instance, name)
+                )
+            if final:
+                self._reset(game, instance, state, state.last_seen or 0, persist=False)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return state
+
+
+def _line_time(found: re.Match, previous: datetime.datetime) -> datetime.datetime:
+    fields = found.groupdict()
+    clock = {"hour": int(fields["hour"]), "minute": int(fields["minute"]), "second": int(fields["second"])}
+    if fields.get("year"):
+        month = fields["month"]
+        month = int(month) if month.isdigit() else _MONTHS.index(month[:3].title()) + 1
+        return datetime.datetime(int(fields["year"]), month, int(fields["day"]), **clock)
+    at = previous.replace(microsecond=0, **clock)
+    # Time of day only: going back means the log crossed midnight.
+    if at < previous - datetime.timedelta(hours=1):
+        at += datetime.timedelta(days=1)
+    return at
+
+
+def scan_segment(path: str, target: str, started_at: float) -> list:
+    """
+    Session events of one log segment as (time, kind, player, count) tuples, kind being
+    ready, joined, left or stopping. Runs in a worker process; `target` is the game's
+    "module:Class" from games.registry.
+    """
+    from games.rules import RuleEngine, ServerReady, PlayerJoined, PlayerLeft, ServerStopping
+    module_name, _, class_name = target.partition(":")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    engine = RuleEngine(cls.Rules)
+    clock = re.compile(cls.LogTimePattern.encode("utf-8"))
+    kinds = {ServerReady: "ready", PlayerJoined: "joined", PlayerLeft: "left", ServerStopping: "stopping"}
+
+    events = []
+    now = datetime.datetime.fromtimestamp(started_at)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as log:
+        for raw in log:
+            raw = raw.strip()
+            event = engine.match(raw)
+            kind = kinds.get(type(event))
+            if kind is None:
+                continue
+            found = clock.search(raw)
+            if found:
+                now = _line_time(found, now)
+            fields = vars(event)
+            events.append((now.timestamp(), kind, fields.get("player"), fields.get("count")))
+    return events
+
+
+async def backfill(store: SessionStore, instances: list, workers: int = None) -> int:
+    """
+    Scan the old log segments of `instances`, (game, instance, "module:Class", log directory)
+    tuples, in a process pool and record what they show. Segments already backfilled, and
+    those written since live recording began, are skipped. Returns the segments scanned.
+    """
+    loop = asyncio.get_running_loop()
+    scanned = 0
+    # forkserver: forking the bot itself would copy its threads and event loop state.
+    with ProcessPoolExecutor(workers or min(4, os.cpu_count() or 1), mp_context=multiprocessing.get_context("forkserver")) as pool:
+        for game, instance, target, directory in instances:
+            done = store.backfilled_segments(game, instance)
+            try:
+                paths = [entry.path for entry in os.scandir(directory) if entry.name.endswith((".log", ".log.gz"))]
+            except FileNotFoundError:
+                continue
+            todo = []
+            for path in sorted(paths, key=segment_name):
+                started_at = segment_started_at(path)
+                if started_at is not None and started_at < store.recording_since and segment_name(path) not in done:
+                    todo.append((path, started_at))
+            if not todo:
+                continue
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, scan_segment, path, target, started_at) for path, started_at in todo
+            ))
+            # Recorded in batches, yielding to the event loop between their transactions.
+            state, batch, size = None, [], 0
+            for number, ((path, _), events) in enumerate(zip(todo, results), 1):
+                batch.append((segment_name(path), events))
+                size += len(events)
+                if size >= REPLAY_BATCH_EVENTS or number == len(todo):
+                    state = store.replay(game, instance, batch, state, final=number == len(todo))
+                    batch, size = [], 0
+                    await asyncio.sleep(0)
+            scanned += len(todo)
+            print(f"[sessions] Backfilled {game}:{instance} from {len(todo)} log segments.")
+    return scanned
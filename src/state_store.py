@@ -0,0 +1,124 @@
+# state_store.py
+
+import os
+import sqlite3
+
+
+# Where the bot keeps its state; the STATE_DIR environment variable moves it elsewhere.
+STATE_DIR = os.getenv("STATE_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "state"))
+
+
+class StateStore:
+    """
+    Persistent record of running instances, so a restarted bot can find and re-adopt the
+    servers the previous run left behind. Backed by SQLite in WAL mode; every write is a
+    single small autocommitted statement.
+    """
+
+    COLUMNS = (
+        "pid",             # process id of the server's launch script
+        "create_time",     # psutil create_time of that process, guards against pid reuse
+        "started_at",      # wall-clock start time, for uptime
+        "spool_path",      # file the server writes its console output to
+        "log_offset",      # byte offset in the spool up to which lines have been processed
+        "log_path",        # current log sink segment
+        "channel_id",      # Discord channel notifications go to
+        "player_count",
+        "ready",
+        "timer_deadline",  # wall-clock time the pending shutdown timer fires, or NULL
+        "standby_since",   # wall-clock time the instance was suspended, or NULL when it isn't
+        "node",            # node agent the instance runs on, NULL for this host
+    )
+
+    # Columns added after the table was first created, with their SQL types.
+    ADDED_COLUMNS = {
+        "standby_since": "REAL",
+        "node": "TEXT",
+    }
+
+    DEFAULT_PATH = os.path.join(STATE_DIR, "bot.db")
+
+    _shared = {}
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._path = path
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS instances ("
+            " game TEXT NOT NULL,"
+            " instance TEXT NOT NULL,"
+            " pid INTEGER NOT NULL,"
+            " create_time REAL NOT NULL,"
+            " started_at REAL NOT NULL,"
+            " spool_path TEXT NOT NULL,"
+            " log_offset INTEGER NOT NULL DEFAULT 0,"
+            " log_path TEXT,"
+            " channel_id INTEGER,"
+            " player_count INTEGER NOT NULL DEFAULT 0,"
+            " ready INTEGER NOT NULL DEFAULT 0,"
+            " timer_deadline REAL,"
+            " PRIMARY KEY (game, instance))"
+        )
+        existing = {row["name"] for row in self._db.execute("PRAGMA table_info(instances)")}
+        for column, sql_type in self.ADDED_COLUMNS.items():
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE instances ADD COLUMN {column} {sql_type}")
+
+    @classmethod
+    def shared(cls, path: str):
+        """One store per database file, shared by every game."""
+        store = cls._shared.get(path)
+        if store is None:
+            store = cls._shared[path] = cls(path)
+        return store
+
+    @classmethod
+    def default(cls):
+        """The store the bot keeps its instances in."""
+        return cls.shared(cls.DEFAULT_PATH)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def put(self, game: str, instance: str, **fields):
+        self._check_fields(fields)
+        columns = ["game", "instance", *fields]
+        placeholders = ", ".join("?" for _ in columns)
+        self._db.execute(
+            f"INSERT OR REPLACE INTO instances ({', '.join(columns)}) VALUES ({placeholders})",
+            (game, instance, *fields.values()),
+        )
+
+    def update(self, game: str, instance: str, **fields):
+        self._check_fields(fields)
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        self._db.execute(
+            f"UPDATE instances SET {assignments} WHERE game = ? AND instance = ?",
+            (*fields.values(), game, instance),
+        )
+
+    def get(self, game: str, instance: str):
+        row = self._db.execute(
+            "SELECT * FROM instances WHERE game = ? AND instance = ?", (game, instance)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def remove(self, game: str, instance: str):
+        self._db.execute("DELETE FROM instances WHERE game = ? AND instance = ?", (game, instance))
+
+    def all(self, game: str = None) -> list:
+        if game is None:
+            rows = self._db.execute("SELECT * FROM instances").fetchall()
+        else:
+            rows = self._db.execute("SELECT * FROM instances WHERE game = ?", (game,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def _check_fields(self, fields: dict):
+        unknown = set(fields) - set(self.COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown state fields: {', '.join(sorted(unknown))}")
@@ -0,0 +1,261 @@
+# telemetry.py
+
+import time
+import asyncio
+
+from array import array
+from aiohttp import web
+
+from process_tree import TreeSampler
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class RingBuffer:
+    """Fixed-size history of samples, one preallocated array per field."""
+
+    FIELDS = ("time", "rss", "cpu", "threads", "fds", "read_bytes", "write_bytes")
+
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._columns = {field: array("d", bytes(8 * capacity)) for field in self.FIELDS}
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, sample: dict):
+        for field, column in self._columns.items():
+            column[self._next] = sample[field]
+        self._next = (self._next + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+    def column(self, field: str, last: int = None) -> list:
+        """Values of one field, oldest first."""
+        column = self._columns[field]
+        count = self._size if last is None else min(last, self._size)
+        start = (self._next - count) % self._capacity
+        if start + count <= self._capacity:
+            return column[start:start + count].tolist()
+        return column[start:].tolist() + column[:self._next].tolist()
+
+    def latest(self) -> dict:
+        if not self._size:
+            return None
+        index = (self._next - 1) % self._capacity
+        return {field: column[index] for field, column in self._columns.items()}
+
+
+class TelemetrySampler:
+    """
+    Samples the process tree of every running instance at a fixed interval: total RSS, CPU%,
+    threads, open file descriptors and disk I/O bytes. Each instance keeps a RingBuffer of
+    its history. While nothing is running the sampler sleeps until an instance starts.
+    """
+
+    def __init__(self, manager, interval: float = 5.0, capacity: int = 720):
+        self._manager = manager
+        self._interval = interval
+        self._capacity = capacity
+        self._history = {}
+        self._sampler = TreeSampler()
+        self._wake = asyncio.Event()
+        self._task = None
+        manager.add_start_listener(self._on_instance_start)
+
+    @property
+    def history(self) -> dict:
+        """Sample history, keyed by (game, instance)."""
+        return self._history
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _on_instance_start(self, server, runtime):
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            running = self._manager.running_instances
+            if not running:
+                self._sampler.forget_others()
+                await self._wake.wait()
+                continue
+
+            targets = {key: runtime.pid for key, runtime in running.items() if runtime.node is None}
+            try:
+                samples = await asyncio.to_thread(self._sample, targets)
+            except Exception as e:
+                print(f"[telemetry] ⚠️ Sampling failed: {e}")
+                samples = {}
+            samples.update(await self._sample_remote({key: runtime for key, runtime in running.items() if runtime.node is not None}))
+            for key, sample in samples.items():
+                buffer = self._history.get(key)
+                if buffer is None:
+                    buffer = self._history[key] = RingBuffer(self._capacity)
+                buffer.append(sample)
+            await asyncio.sleep(self._interval)
+
+    def _sample(self, targets: dict) -> dict:
+        samples = {}
+        now = time.time()
+        for key, pid in targets.items():
+            sample = self._sampler.sample(pid)
+            if sample:
+                sample["time"] = now
+                samples[key] = sample
+        self._sampler.forget_others()
+        return samples
+
+    async def _sample_remote(self, runtimes: dict) -> dict:
+        """Samples of instances running on node agents, one request per node."""
+        by_node = {}
+        for key, runtime in runtimes.items():
+            by_node.setdefault(runtime.node, {})[key] = runtime.pid
+        samples = {}
+        now = time.time()
+        for node, targets in by_node.items():
+            try:
+                result = await node.sample(list(targets.values()))
+            except Exception as e:
+                print(f"[telemetry] ⚠️ Sampling node {node.name} failed: {e}")
+                continue
+            for key, pid in targets.items():
+                sample = result.get(str(pid))
+                if sample:
+                    sample["time"] = now
+                    samples[key] = sample
+        return samples
+
+    def summary(self, points: int = 24) -> str:
+        lines = []
+        running = self._manager.running_instances
+        for key, buffer in self._history.items():
+            if key not in running:
+                continue
+            latest = buffer.latest()
+            rss = buffer.column("rss", points)
+            cpu = buffer.column("cpu", points)
+            section = (
+                f"📈 **{key[0].capitalize()}** {key[1]}\n"
+                f"🧠 RAM {_format_bytes(latest['rss'])} `{sparkline(rss)}`\n"
+                f"⚙️ CPU {latest['cpu']:.0f}% `{sparkline(cpu)}`\n"
+                f"🧵 Threads {latest['threads']:.0f} · 📂 Open files {latest['fds']:.0f}\n"
+                f"💾 Disk read {_format_bytes(latest['read_bytes'])} · written {_format_bytes(latest['write_bytes'])}"
+            )
+            pipeline = running[key].pipeline
+            if pipeline:
+                section += (
+                    f"\n📜 Output {pipeline.stats.read:,} lines · {pipeline.event_queue_depth} batches waiting · "
+                    f"{pipeline.stats.dropped:,} dropped"
+                )
+            lines.append(section)
+        return "\n\n".join(lines)
+
+    def prometheus(self, notifier=None) -> str:
+        metrics = {
+            "rss": ("gameserver_rss_bytes", "gauge", "Resident memory of the instance's process tree."),
+            "cpu": ("gameserver_cpu_percent", "gauge", "CPU usage of the instance's process tree, 100 per core."),
+            "threads": ("gameserver_threads", "gauge", "Threads in the instance's process tree."),
+            "fds": ("gameserver_open_fds", "gauge", "Open file descriptors in the instance's process tree."),
+            "read_bytes": ("gameserver_disk_read_bytes_total", "counter", "Bytes read from disk by the instance's process tree, including children that have exited."),
+            "write_bytes": ("gameserver_disk_written_bytes_total", "counter", "Bytes written to disk by the instance's process tree, including children that have exited."),
+        }
+        running = self._manager.running_instances
+        out = []
+        for field, (name, kind, help_text) in metrics.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for (game, instance), buffer in self._history.items():
+                latest = buffer.latest()
+                if latest and (game, instance) in running:
+                    out.append(f'{name}{{game="{game}",instance="{_escape_label(instance)}"}} {latest[field]:.15g}')
+
+        out.append("# HELP gameserver_output_lines_total Console lines that went through each output pipeline stage.")
+        out.append("# TYPE gameserver_output_lines_total counter")
+        out.append("# HELP gameserver_output_lines_dropped_total Console lines dropped because the interpret stage fell behind.")
+        out.append("# TYPE gameserver_output_lines_dropped_total counter")
+        for (game, instance), runtime in running.items():
+            if runtime.pipeline is None:
+                continue
+            labels = f'game="{game}",instance="{_escape_label(instance)}"'
+            stats = runtime.pipeline.stats
+            for stage in ("read", "persisted", "interpreted"):
+                out.append(f'gameserver_output_lines_total{{{labels},stage="{stage}"}} {getattr(stats, stage)}')
+            out.append(f"gameserver_output_lines_dropped_total{{{labels}}} {stats.dropped}")
+
+        out.append("# HELP gameserver_start_to_ready_seconds Median start-to-ready time of recent cold and warm starts.")
+        out.append("# TYPE gameserver_start_to_ready_seconds gauge")
+        for game, server in self._manager.servers.items():
+            for instance in server.instances:
+                for kind, latency in server.start_latencies(instance).items():
+                    out.append(
+                        f'gameserver_start_to_ready_seconds{{game="{game}",instance="{_escape_label(instance)}",start="{kind}"}} '
+                        f'{latency["median"]:.15g}'
+                    )
+
+        if notifier is not None:
+            stats = notifier.metrics()
+            out.append("# HELP discord_notifier_queue_depth Messages waiting to be sent to Discord.")
+            out.append("# TYPE discord_notifier_queue_depth gauge")
+            out.append(f"discord_notifier_queue_depth {stats['queue_depth']}")
+            out.append("# HELP discord_notifier_send_latency_seconds Time from queueing a message to sending it.")
+            out.append("# TYPE discord_notifier_send_latency_seconds summary")
+            out.append(f'discord_notifier_send_latency_seconds{{quantile="0.5"}} {stats["latency_p50"]:g}')
+            out.append(f'discord_notifier_send_latency_seconds{{quantile="0.95"}} {stats["latency_p95"]:g}')
+            counters = {
+                "sent": "Messages sent to Discord.",
+                "dropped": "Messages dropped because a channel's queue was full.",
+                "failed": "Messages that could not be sent to Discord.",
+            }
+            for counter, help_text in counters.items():
+                out.append(f"# HELP discord_notifier_{counter}_total {help_text}")
+                out.append(f"# TYPE discord_notifier_{counter}_total counter")
+                out.append(f"discord_notifier_{counter}_total {stats[counter]}")
+        return "\n".join(out) + "\n"
+
+
+async def start_metrics_server(sampler: TelemetrySampler, port: int, notifier=None, host: str = "127.0.0.1"):
+    """Serve the sampler's latest values in Prometheus text format on http://host:port/metrics."""
+
+    async def handle(request):
+        return web.Response(text=sampler.prometheus(notifier), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    print(f"📊 Metrics available on http://{host}:{port}/metrics")
+    return runner
+
+
+def sparkline(values: list) -> str:
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return "".join(SPARK_CHARS[int((value - low) * scale)] for value in values)
+
+
+def _format_bytes(value: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
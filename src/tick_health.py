@@ -0,0 +1,90 @@
+# tick_health.py
+
+import time
+
+from collections import deque, defaultdict
+
+# Kinds of samples in a TickHealth series.
+LAG = "lag"
+SAVE = "save"
+
+
+class TickHealth:
+    """
+    Time series of one instance's lag warnings and save pauses, as parsed from its console, and
+    how long it has spent at each player count, so lag can be put next to the load that caused it.
+    Kept across restarts of the instance; only the newest `capacity` samples are retained.
+    """
+
+    def __init__(self, capacity: int = 2000):
+        # (time, kind, milliseconds, ticks skipped, players online)
+        self.samples = deque(maxlen=capacity)
+        self._players = None
+        self._players_since = None
+        self._seconds_at = defaultdict(float)
+        self._lag_ms_at = defaultdict(float)
+        self._alerted_at = None
+
+    def set_players(self, count, now: float = None):
+        """Note the player count changing; None while the instance isn't running."""
+        now = now or time.time()
+        if self._players is not None:
+            self._seconds_at[self._players] += now - self._players_since
+        self._players, self._players_since = count, now
+
+    def record_lag(self, ms: int, ticks: int, now: float = None):
+        self.samples.append((now or time.time(), LAG, ms, ticks, self._players or 0))
+        self._lag_ms_at[self._players or 0] += ms
+
+    def record_save(self, ms: float, now: float = None):
+        self.samples.append((now or time.time(), SAVE, ms, 0, self._players or 0))
+
+    def window(self, seconds: float, now: float = None) -> dict:
+        """Totals over the last `seconds`."""
+        since = (now or time.time()) - seconds
+        lag = [sample for sample in self.samples if sample[0] >= since and sample[1] == LAG]
+        saves = [sample[2] for sample in self.samples if sample[0] >= since and sample[1] == SAVE]
+        return {
+            "seconds": seconds,
+            "lag_events": len(lag),
+            "lag_ms": sum(sample[2] for sample in lag),
+            "ticks_skipped": sum(sample[3] for sample in lag),
+            "worst_lag_ms": max((sample[2] for sample in lag), default=0),
+            "saves": len(saves),
+            "save_max_ms": max(saves, default=0),
+            "save_avg_ms": sum(saves) / len(saves) if saves else 0,
+        }
+
+    def lag_by_players(self, now: float = None, min_seconds: float = 300) -> list:
+        """(players, seconds behind per hour at that count) for counts seen for at least `min_seconds`."""
+        seconds_at = dict(self._seconds_at)
+        if self._players is not None:
+            seconds_at[self._players] = seconds_at.get(self._players, 0) + (now or time.time()) - self._players_since
+        return [
+            (players, self._lag_ms_at.get(players, 0) / 1000 / seconds * 3600)
+            for players, seconds in sorted(seconds_at.items())
+            if seconds >= min_seconds
+        ]
+
+    def check_overload(self, window: float, threshold: float, min_events: int, cooldown: float, now: float = None):
+        """
+        The window totals if the instance has been behind for more than `threshold` of the last
+        `window` seconds across at least `min_events` warnings, and hasn't been alerted about
+        within `cooldown`; otherwise None. A single long pause (a GC, a save) isn't sustained.
+        """
+        now = now or time.time()
+        totals = self.window(window, now)
+        if totals["lag_events"] < min_events or totals["lag_ms"] / 1000 < window * threshold:
+            return None
+        if self._alerted_at is not None and now - self._alerted_at < cooldown:
+            return None
+        self._alerted_at = now
+        return totals
+
+
+def estimated_tps(totals: dict, target: float) -> float:
+    """Average ticks per second over a window, from the time the server reported being behind."""
+    if totals["seconds"] <= 0:
+        return target
+    behind = min(totals["lag_ms"] / 1000, totals["seconds"])
+    return target * (1 - behind / totals["seconds"])
@@ -0,0 +1,155 @@
+# wake_listener.py
+
+import types
+import asyncio
+
+from boot_profile import format_duration
+from notifier import notifier
+from server_manager import LOCAL_NODE
+
+
+class WakeListener:
+    """
+    Wake-on-connect: while an instance with `wake_on_connect = true` is stopped, the bot listens
+    on its game port and answers in the game's own protocol (see BaseGameServer.answer_wake).
+    The server list shows it as asleep with how long it usually takes to boot. Trying to join
+    starts it through the manager, admission checks and all, and the player is told when to
+    reconnect. The port is given up as soon as the instance's process is spawned, long before
+    the server gets to bind it, and taken back once it exits. Only instances that run on this
+    host can be woken this way.
+    """
+
+    # Seconds a client gets to say what it wants before it is hung up on.
+    ClientTimeout = 10
+
+    def __init__(self, manager, resolve_channel=None, host: str = "0.0.0.0"):
+        self._manager = manager
+        self._resolve_channel = resolve_channel or (lambda: None)
+        self._host = host
+        self._listeners = {}
+        self._etas = {}
+        self._waking = set()
+        self._unsupported = set()
+        self._started = False
+        manager.add_start_listener(self._on_instance_start)
+        manager.add_exit_listener(self._on_instance_exit)
+        manager.add_config_listener(self._on_config_change)
+
+    @property
+    def listening(self) -> dict:
+        """Ports being listened on, keyed by (game, instance)."""
+        return {key: port for key, (port, _) in self._listeners.items()}
+
+    async def start(self):
+        self._started = True
+        await self.sync()
+
+    def stop(self):
+        self._started = False
+        for key in list(self._listeners):
+            self._close(key)
+
+    async def sync(self):
+        """Listen for every instance that should be woken on connect and isn't running, and no others."""
+        wanted = self._wanted()
+        for key, (port, _) in list(self._listeners.items()):
+            if wanted.get(key) != port:
+                self._close(key)
+        for key, port in wanted.items():
+            if key not in self._listeners:
+                await self._open(key, port)
+
+    def _wanted(self) -> dict:
+        wanted = {}
+        for game in self._manager.game_names:
+            for instance in self._manager.instance_names(game):
+                config = self._manager.instance_config(game, instance)
+                if not config.get("wake_on_connect") or (config.get("nodes") or [LOCAL_NODE]) != [LOCAL_NODE]:
+                    continue
+                server = self._manager.get_server(game)
+                if server is None or server.is_instance_running(instance):
+                    continue
+                if not server.supports_wake or server.port(instance) is None:
+                    # Sync runs on every exit and config change; say so once, not every time.
+                    if (game, instance) not in self._unsupported:
+                        self._unsupported.add((game, instance))
+                        print(f"[wake:{game}:{instance}] ⚠️ {game} servers can't be woken on connect.")
+                    continue
+                self._unsupported.discard((game, instance))
+                wanted[(game, instance)] = server.port(instance)
+        return wanted
+
+    async def _open(self, key: tuple, port: int):
+        try:
+            listener = await asyncio.start_server(
+                lambda reader, writer: self._serve(key, reader, writer), self._host, port
+            )
+        except OSError as e:
+            print(f"[wake:{key[0]}:{key[1]}] ⚠️ Can't listen on port {port}: {e}")
+            return
+        if self._manager.get_server(key[0]).is_instance_running(key[1]):
+            # It was started while the port was being opened.
+            listener.close()
+            return
+        self._listeners[key] = (port, listener)
+        # Worked out once per sleep rather than for every ping.
+        prediction = self._manager.get_server(key[0]).boot_history.predict(*key)
+        self._etas[key] = f"about {format_duration(prediction['median'])}" if prediction else "a few minutes"
+        print(f"[wake:{key[0]}:{key[1]}] 💤 Listening for players on port {port}.")
+
+    def _close(self, key: tuple):
+        entry = self._listeners.pop(key, None)
+        if entry is not None:
+            # Closing the listening socket happens right away; connections being answered finish on their own.
+            entry[1].close()
+
+    def _on_instance_start(self, server, runtime):
+        self._close(runtime.key)
+
+    def _on_instance_exit(self, server, runtime):
+        if self._started:
+            asyncio.create_task(self.sync())
+
+    def _on_config_change(self):
+        if self._started:
+            asyncio.create_task(self.sync())
+
+    def _status(self, key: tuple) -> tuple:
+        """What the server list shows for an instance, and what a player trying to join is told."""
+        game, instance = key
+        eta = self._etas.get(key, "a few minutes")
+        if self._manager.is_queued(game, instance):
+            status = "Waiting for resources to start..."
+            return status, f"{instance} is waiting for resources to start. Try again in a few minutes."
+        if key in self._waking:
+            return f"Starting, ready in {eta}...", f"{instance} is starting, ready in {eta}. Reconnect then!"
+        return f"Asleep - join to wake it up ({eta})", f"Waking {instance} up, ready in {eta}. Reconnect then!"
+
+    async def _serve(self, key: tuple, reader, writer):
+        game, instance = key
+        status, reply = self._status(key)
+        try:
+            player = await asyncio.wait_for(
+                self._manager.get_server(game).answer_wake(reader, writer, instance, status, reply), self.ClientTimeout
+            )
+        except Exception:
+            player = None
+        finally:
+            writer.close()
+        if player and key not in self._waking and not self._manager.is_queued(game, instance):
+            self._waking.add(key)
+            asyncio.create_task(self._wake(key, player))
+
+    async def _wake(self, key: tuple, player: str):
+        game, instance = key
+        channel = self._resolve_channel()
+        print(f"[wake:{game}:{instance}] 🔔 {player} tried to join, starting it.")
+        try:
+            decision = await self._manager.request_start(game, instance, types.SimpleNamespace(channel=channel))
+        except Exception as e:
+            print(f"[wake:{game}:{instance}] ❌ Failed to start: {e}")
+            return
+        finally:
+            self._waking.discard(key)
+        if channel is not None:
+            notifier.post(channel, f"🔔 {player} tried to join. {decision.message(game.capitalize(), f'`{instance}`')}")
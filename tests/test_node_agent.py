@@ -0,0 +1,119 @@
+import os
+import sys
+import signal
+import asyncio
+import subprocess
+
+from node_client import NodeClient
+from process_tree import AdoptedProcess
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# A stand-in game server: numbered lines on a steady beat, and an echo of its console input.
+SERVER = r"""
+import sys, threading, time
+def echo():
+    for line in sys.stdin:
+        print("got " + line.strip(), flush=True)
+threading.Thread(target=echo, daemon=True).start()
+tick = 0
+while True:
+    print(f"tick {tick}", flush=True)
+    tick += 1
+    time.sleep(0.02)
+"""
+
+
+def start_agent(name: str, tmp_path) -> tuple:
+    address = f"unix:{tmp_path / f'{name}.sock'}"
+    agent = subprocess.Popen(
+        [sys.executable, "-m", "node_agent", "--name", name, "--listen", address, "--state-dir", str(tmp_path / name)],
+        cwd=SRC,
+    )
+    return agent, address
+
+
+async def connect(client: NodeClient):
+    for _ in range(100):
+        try:
+            return await client.request("host")
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise TimeoutError(f"node {client.name} didn't come up")
+
+
+async def wait_for_output(path: str, text: str, timeout: float = 10):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        with open(path) as f:
+            if text in f.read():
+                return
+        await asyncio.sleep(0.02)
+    raise TimeoutError(f"{text!r} never showed up in {path}")
+
+
+def ticks(path: str) -> list:
+    with open(path) as f:
+        return [int(line.split()[1]) for line in f if line.startswith("tick ")]
+
+
+def test_place_stream_stop_and_readopt_across_an_agent_restart(tmp_path):
+    agents = {}
+    spool_path = str(tmp_path / "console.out")
+
+    async def scenario():
+        clients = {}
+        for name in ("a", "b"):
+            agents[name], address = start_agent(name, tmp_path)
+            clients[name] = NodeClient(name, address)
+            clients[name].RECONNECT_INTERVAL = 0.1
+            await connect(clients[name])
+
+        # Placed where the most memory is free, as ServerManager does; both agents share this host.
+        stats = {name: await client.host_stats() for name, client in clients.items()}
+        placed = max(stats, key=lambda name: stats[name].available_mb)
+        other = "b" if placed == "a" else "a"
+        node = clients[placed]
+        process = await node.spawn("minecraft/test", [sys.executable, "-u", "-c", SERVER])
+        elsewhere = await clients[other].request("find", key="minecraft/test", pid=process.pid, create_time=process.create_time)
+        assert not elsewhere["alive"]
+
+        await process.follow(spool_path)
+        process.stdin.write(b"hello\n")
+        await process.stdin.drain()
+        await wait_for_output(spool_path, "got hello")
+
+        # The agent dies; the server, in a session of its own, keeps running.
+        agents[placed].kill()
+        agents[placed].wait()
+        before = len(ticks(spool_path))
+        agents[placed], _ = start_agent(placed, tmp_path)
+        # The client reconnects on its own and the new agent re-adopts the process.
+        for _ in range(200):
+            if node.connected and len(ticks(spool_path)) > before + 20:
+                break
+            await asyncio.sleep(0.05)
+        assert node.connected
+        # A re-adopted process has no console input; it mustn't look like it still does.
+        assert process.stdin is None
+
+        await process.tree.signal(signal.SIGTERM)
+        returncode = await asyncio.wait_for(process.wait(), 10)
+        for client in clients.values():
+            if client._writer:
+                client._writer.close()
+        return returncode, before
+
+    try:
+        returncode, before = asyncio.run(scenario())
+    finally:
+        for agent in agents.values():
+            agent.kill()
+            agent.wait()
+
+    # Its exit status went with the agent that spawned it.
+    assert returncode == AdoptedProcess.UNKNOWN_EXIT_STATUS
+    # Output streamed again from where it stopped: every line once, in order, across the restart.
+    streamed = ticks(spool_path)
+    assert len(streamed) > before + 20
+    assert streamed == list(range(len(streamed)))
@@ -0,0 +1,164 @@
+import types
+import asyncio
+
+import discord
+
+from notifier import Notifier
+
+
+class FakeClock:
+    """A monotonic clock whose sleeps advance it at once instead of waiting."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class FakeChannel:
+    """Records what would be sent to Discord; raises each error in `failures` on a send first."""
+
+    id = 1
+
+    def __init__(self, clock: FakeClock, failures=()):
+        self.sent = []
+        self.attempts = []
+        self._clock = clock
+        self._failures = list(failures)
+
+    async def send(self, content: str):
+        self.attempts.append(self._clock())
+        if self._failures:
+            raise self._failures.pop(0)
+        message = FakeMessage(content)
+        self.sent.append(message)
+        return message
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+        self.edits = []
+
+    async def edit(self, content: str):
+        self.edits.append(content)
+        self.content = content
+
+
+def rate_limited(retry_after: float) -> discord.HTTPException:
+    response = types.SimpleNamespace(status=429, reason="Too Many Requests", headers={"Retry-After": str(retry_after)})
+    return discord.HTTPException(response, "You are being rate limited.")
+
+
+def fake_notifier(**options):
+    clock = FakeClock()
+    return Notifier(clock=clock, sleep=clock.sleep, **options), clock
+
+
+def test_posts_in_one_burst_are_sent_as_one_message():
+    async def scenario():
+        notifier, clock = fake_notifier(coalesce_window=0.1)
+        channel = FakeChannel(clock)
+        for number in range(3):
+            notifier.post(channel, f"line {number}")
+        await notifier.join()
+        return notifier, channel
+
+    notifier, channel = asyncio.run(scenario())
+    assert [message.content for message in channel.sent] == ["line 0\nline 1\nline 2"]
+    assert notifier.metrics()["sent"] == 1
+
+
+def test_grouped_posts_collapse_into_a_summary():
+    async def scenario():
+        notifier, clock = fake_notifier(coalesce_window=0.1)
+        channel = FakeChannel(clock)
+        notifier.post(channel, "starting")
+        for name in ("a", "b", "c"):
+            notifier.post(channel, f"{name} joined", group="join", summarize=lambda count: f"{count} players joined")
+        await notifier.join()
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert [message.content for message in channel.sent] == ["starting\n3 players joined"]
+
+
+def test_rate_limit_waits_retry_after_then_sends_once():
+    async def scenario():
+        notifier, clock = fake_notifier(coalesce_window=0.01)
+        channel = FakeChannel(clock, failures=[rate_limited(0.3)])
+        notifier.post(channel, "hello")
+        await notifier.join()
+        return notifier, channel
+
+    notifier, channel = asyncio.run(scenario())
+    assert [message.content for message in channel.sent] == ["hello"]
+    assert len(channel.attempts) == 2
+    # The 429 empties the token bucket, so the retry waits for a token after the advertised delay.
+    assert channel.attempts[1] - channel.attempts[0] >= 1.0
+    assert notifier.metrics()["failed"] == 0
+
+
+def test_sends_are_paced_by_the_token_bucket():
+    async def scenario():
+        notifier, clock = fake_notifier(coalesce_window=0.0, rate=1.0, burst=2)
+        channel = FakeChannel(clock)
+        for number in range(4):
+            notifier.post(channel, f"line {number}")
+            await notifier.join()
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert len(channel.sent) == 4
+    # Two go out at once on the initial burst, the rest one per second.
+    assert channel.attempts == [0.0, 0.0, 1.0, 2.0]
+
+
+def test_full_queue_drops_the_oldest_unimportant_message():
+    async def scenario():
+        notifier, clock = fake_notifier(coalesce_window=0.1, max_depth=3)
+        channel = FakeChannel(clock)
+        notifier.post(channel, "crashed", important=True)
+        notifier.post(channel, "a joined")
+        notifier.post(channel, "b joined")
+        notifier.post(channel, "c joined")
+        notifier.post(channel, "stopping", important=True)
+        notifier.post(channel, "ready", important=True)
+        notifier.post(channel, "d joined")
+        await notifier.join()
+        return notifier, channel
+
+    notifier, channel = asyncio.run(scenario())
+    # Important messages are never dropped, even past the limit; chatter makes room for them.
+    assert [message.content for message in channel.sent] == ["crashed\nstopping\nready"]
+    assert notifier.metrics()["dropped"] == 4
+
+
+def test_status_updates_edit_one_message_in_place():
+    async def scenario():
+        notifier, clock = fake_notifier()
+        channel = FakeChannel(clock)
+        notifier.update(channel, "boot", "booting 10%")
+        await notifier.join()
+        notifier.update(channel, "boot", "booting 50%")
+        notifier.update(channel, "boot", "booting 90%")
+        await notifier.join()
+        notifier.update(channel, "boot", "ready", final=True)
+        await notifier.join()
+        notifier.update(channel, "boot", "booting again")
+        await notifier.join()
+        return notifier, channel
+
+    notifier, channel = asyncio.run(scenario())
+    first, second = channel.sent
+    # Updates that arrive before the worker runs collapse into the latest.
+    assert first.edits == ["booting 90%", "ready"]
+    assert first.content == "ready"
+    # After a final update the next one starts a new message.
+    assert second.content == "booting again"
+    assert notifier.metrics()["edited"] == 2
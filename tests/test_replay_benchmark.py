@@ -0,0 +1,56 @@
+# Replays the synthetic boot logs through the real output pipeline. Timings are only compared
+# within the run, so the test holds on any hardware; set REPLAY_BASELINE_CHECK=1 to also compare
+# against benchmarks/replay_baselines.json, like `python -m benchmarks.replay --check`.
+
+import os
+import shutil
+import asyncio
+
+import pytest
+
+from benchmarks import replay
+from benchmarks.rules_bench import NaiveRuleEngine, measure, synthetic_minecraft_boot, synthetic_valheim_boot
+from games.minecraft import MinecraftServer
+from games.rules import RuleEngine
+from games.valheim import ValheimServer
+
+GAMES = {"minecraft": (MinecraftServer, synthetic_minecraft_boot), "valheim": (ValheimServer, synthetic_valheim_boot)}
+
+
+@pytest.fixture(scope="module")
+def results():
+    logs = {game: boot() * 3 for game, (_, boot) in GAMES.items()}
+    try:
+        results = asyncio.run(replay.measure(logs, runs=3, timeout=120))
+    finally:
+        shutil.rmtree(replay.WORK_DIR, ignore_errors=True)
+    for game, result in results.items():
+        replay.report(game, result)
+    return results
+
+
+def test_replay_reads_every_line(results):
+    for game, (_, boot) in GAMES.items():
+        assert results[game]["lines"] == len(boot()) * 3
+        assert results[game]["dropped"] == 0
+        assert results[game]["events"]
+
+
+@pytest.mark.parametrize("game", GAMES)
+def test_prefilter_beats_naive_matching(game):
+    server, boot = GAMES[game]
+    lines = boot()
+    engine, naive = RuleEngine(server.Rules), NaiveRuleEngine(server.Rules)
+    # Interleave the runs and keep the best of each, so load on the machine hits both alike.
+    rate, naive_rate = 0.0, 0.0
+    for _ in range(3):
+        fast, events = measure(engine, lines, 2)
+        slow, naive_events = measure(naive, lines, 2)
+        rate, naive_rate = max(rate, fast), max(naive_rate, slow)
+    assert events == naive_events
+    assert rate > naive_rate
+
+
+@pytest.mark.skipif(not os.getenv("REPLAY_BASELINE_CHECK"), reason="absolute baselines are machine-specific")
+def test_replay_within_baseline(results):
+    assert replay.check(results, tolerance=0.3) == []
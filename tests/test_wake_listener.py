@@ -0,0 +1,148 @@
+import socket
+import asyncio
+
+from admission import ACCEPT, Decision
+from games import minecraft_protocol
+from wake_listener import WakeListener
+
+GAME, INSTANCE = "minecraft", "survival"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeServer:
+    """A stopped Minecraft instance that answers wake connections with the real protocol code."""
+
+    supports_wake = True
+
+    def __init__(self, port: int):
+        self._port = port
+        self.boot_history = self
+
+    def predict(self, game: str, instance: str):
+        return None
+
+    def port(self, instance: str) -> int:
+        return self._port
+
+    def is_instance_running(self, instance: str) -> bool:
+        return False
+
+    async def answer_wake(self, reader, writer, instance: str, status: str, reply: str):
+        return await minecraft_protocol.answer(reader, writer, status, "Asleep", reply)
+
+
+class FakeManager:
+    """Records start requests; each one is held until `release` is set, so the instance stays "starting"."""
+
+    game_names = [GAME]
+
+    def __init__(self, port: int):
+        self.server = FakeServer(port)
+        self.starts = []
+        self.requested = asyncio.Event()
+        self.release = asyncio.Event()
+
+    def add_start_listener(self, listener):
+        pass
+
+    add_exit_listener = add_config_listener = add_start_listener
+
+    def instance_names(self, game: str) -> list:
+        return [INSTANCE]
+
+    def instance_config(self, game: str, instance: str) -> dict:
+        return {"wake_on_connect": True}
+
+    def get_server(self, game: str):
+        return self.server
+
+    def is_queued(self, game: str, instance: str) -> bool:
+        return False
+
+    async def request_start(self, game: str, instance: str, ctx) -> Decision:
+        self.starts.append((game, instance))
+        self.requested.set()
+        await self.release.wait()
+        return Decision(ACCEPT)
+
+
+async def listening():
+    port = free_port()
+    manager = FakeManager(port)
+    listener = WakeListener(manager, host="127.0.0.1")
+    await listener.start()
+    assert listener.listening == {(GAME, INSTANCE): port}
+    return listener, manager, port
+
+
+async def send_raw(port: int, data: bytes) -> bytes:
+    """Send `data` and return everything the listener answers before hanging up."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(data)
+        await writer.drain()
+        return await asyncio.wait_for(reader.read(), 5)
+    finally:
+        writer.close()
+
+
+def test_status_ping_shows_the_instance_asleep():
+    async def scenario():
+        listener, manager, port = await listening()
+        try:
+            return await minecraft_protocol.query_status("127.0.0.1", port, protocol=765), manager
+        finally:
+            listener.stop()
+
+    status, manager = asyncio.run(scenario())
+    assert status["description"]["text"] == "Asleep - join to wake it up (a few minutes)"
+    # The client's own protocol is echoed back so the server list doesn't call it incompatible.
+    assert status["version"] == {"name": "Asleep", "protocol": 765}
+    assert manager.starts == []
+
+
+def test_login_starts_the_instance_once():
+    async def scenario():
+        listener, manager, port = await listening()
+        try:
+            first = await minecraft_protocol.attempt_login("127.0.0.1", port, "Steve")
+            await asyncio.wait_for(manager.requested.wait(), 5)
+            # While the start is under way, another login is told it's starting instead of starting it again.
+            second = await minecraft_protocol.attempt_login("127.0.0.1", port, "Alex")
+            manager.release.set()
+            await asyncio.sleep(0)
+            return first, second, manager
+        finally:
+            listener.stop()
+
+    first, second, manager = asyncio.run(scenario())
+    assert first == f"Waking {INSTANCE} up, ready in a few minutes. Reconnect then!"
+    assert second == f"{INSTANCE} is starting, ready in a few minutes. Reconnect then!"
+    assert manager.starts == [(GAME, INSTANCE)]
+
+
+def test_malformed_packets_are_hung_up_on():
+    handshake_ids = minecraft_protocol.packet(0x05, b"\x00")
+    truncated = minecraft_protocol.packet(0x00, minecraft_protocol.varint(767) + minecraft_protocol.varint(40) + b"abc")
+    oversized_varint = b"\xff" * 6
+    oversized_packet = minecraft_protocol.varint(minecraft_protocol.MAX_PACKET + 1) + b"\x00"
+
+    async def scenario():
+        listener, manager, port = await listening()
+        try:
+            answers = [await send_raw(port, data) for data in (handshake_ids, truncated, oversized_varint, oversized_packet)]
+            # The listener is still there for a well-behaved client afterwards.
+            status = await minecraft_protocol.query_status("127.0.0.1", port)
+            return answers, status, manager
+        finally:
+            listener.stop()
+
+    answers, status, manager = asyncio.run(scenario())
+    assert answers == [b"", b"", b"", b""]
+    assert status["version"]["name"] == "Asleep"
+    assert manager.starts == []